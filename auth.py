@@ -1,17 +1,28 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+import asyncio
+import hashlib
+import hmac
 import os
+import sys
+import threading
+import time
 
 # Configuration de la sécurité
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # À changer en production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Cache des JWT déjà validés (évite de re-décoder les jetons fréquents)
+AUTH_TOKEN_CACHE_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_SECONDS", "60"))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
+
 # Configuration du hachage des mots de passe
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 bearer_scheme = HTTPBearer()
@@ -29,16 +40,100 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# Empreinte bcrypt du mot de passe admin : ADMIN_PASSWORD_HASH si fournie,
+# sinon calculée une seule fois (au démarrage via prepare_auth)
+_ADMIN_PASSWORD_HASH: Optional[str] = os.getenv("ADMIN_PASSWORD_HASH") or None
+_ADMIN_HASH_LOCK = threading.Lock()
+
+def admin_password_hash() -> str:
+    global _ADMIN_PASSWORD_HASH
+    if _ADMIN_PASSWORD_HASH is None:
+        with _ADMIN_HASH_LOCK:
+            if _ADMIN_PASSWORD_HASH is None:
+                _ADMIN_PASSWORD_HASH = get_password_hash(os.getenv("ADMIN_PASSWORD", "changeme"))
+    return _ADMIN_PASSWORD_HASH
+
 def authenticate_user(username: str, password: str) -> bool:
     admin_username = os.getenv("ADMIN_USERNAME", "admin")
-    admin_password_hash = get_password_hash(os.getenv("ADMIN_PASSWORD", "changeme"))
-    
-    if username != admin_username:
+
+    if not hmac.compare_digest(username.encode(), admin_username.encode()):
         return False
-    if not verify_password(password, admin_password_hash):
+    if not verify_password(password, admin_password_hash()):
         return False
     return True
 
+async def authenticate_user_async(username: str, password: str) -> bool:
+    """authenticate_user hors de la boucle asyncio (bcrypt coûte ~100 ms de CPU)."""
+    return await asyncio.to_thread(authenticate_user, username, password)
+
+
+class APIKeyStore:
+    """Clés API indexées par HMAC-SHA256 : recherche O(1), aucune clé en clair en mémoire."""
+
+    def __init__(self, pepper: bytes):
+        self._pepper = pepper
+        self._keys: Dict[bytes, str] = {}
+
+    def digest(self, key: str) -> bytes:
+        return hmac.new(self._pepper, key.encode(), hashlib.sha256).digest()
+
+    def add(self, name: str, key: str) -> None:
+        self._keys[self.digest(key)] = name
+
+    def add_digest(self, name: str, hex_digest: str) -> None:
+        self._keys[bytes.fromhex(hex_digest)] = name
+
+    def lookup(self, key: Optional[str]) -> Optional[str]:
+        """Nom associé à la clé, ou None si elle est inconnue."""
+        if not key:
+            return None
+        return self._keys.get(self.digest(key))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def load_api_keys() -> APIKeyStore:
+    """SECRET_KEY (nom `default`), API_KEYS="nom:clé,..." et API_KEYS_FILE.
+
+    API_KEYS_FILE contient une ligne `nom:empreinte` par clé ; l'empreinte
+    s'obtient avec `python auth.py hash-key <clé>` (même API_KEY_PEPPER)."""
+    store = APIKeyStore(os.getenv("API_KEY_PEPPER", SECRET_KEY).encode())
+    store.add("default", SECRET_KEY)
+    for item in os.getenv("API_KEYS", "").split(","):
+        name, sep, key = item.strip().partition(":")
+        if sep and key:
+            store.add(name, key)
+    keys_file = os.getenv("API_KEYS_FILE")
+    if keys_file and os.path.exists(keys_file):
+        with open(keys_file) as f:
+            for line in f:
+                name, sep, hex_digest = line.strip().partition(":")
+                if sep and not name.startswith("#"):
+                    store.add_digest(name, hex_digest)
+    return store
+
+api_keys = load_api_keys()
+
+def prepare_auth() -> None:
+    """Précalcule les empreintes (appelé une fois au démarrage, hors boucle asyncio)."""
+    admin_password_hash()
+    print(f"[AUTH] Empreintes prêtes ({len(api_keys)} clé(s) API)")
+
+def check_api_key(authorization: Optional[str], x_api_key: Optional[str]) -> str:
+    """Vérifie une clé API (Bearer ou X-API-KEY) et renvoie son nom, sinon 401."""
+    provided_token = None
+    if authorization and authorization.lower().startswith("bearer "):
+        provided_token = authorization.split(" ", 1)[1]
+    elif x_api_key:
+        provided_token = x_api_key
+
+    name = api_keys.lookup(provided_token)
+    if name is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return name
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -49,8 +144,19 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
-    token = credentials.credentials
+# jeton -> (valide jusqu'à, données) ; ordre LRU
+_TOKEN_CACHE: "OrderedDict[str, Tuple[float, TokenData]]" = OrderedDict()
+
+def decode_access_token(token: str) -> TokenData:
+    """Valide un JWT et renvoie ses données ; lève HTTPException 401 sinon."""
+    now = time.time()
+    cached = _TOKEN_CACHE.get(token)
+    if cached is not None:
+        if cached[0] > now:
+            _TOKEN_CACHE.move_to_end(token)
+            return cached[1]
+        del _TOKEN_CACHE[token]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -68,4 +174,22 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(b
     admin_username = os.getenv("ADMIN_USERNAME", "admin")
     if token_data.username != admin_username:
         raise credentials_exception
-    return token_data 
\ No newline at end of file
+
+    if AUTH_TOKEN_CACHE_SECONDS > 0:
+        # Jamais au-delà de l'expiration du jeton lui-même
+        valid_until = min(now + AUTH_TOKEN_CACHE_SECONDS, float(payload.get("exp", now)))
+        _TOKEN_CACHE[token] = (valid_until, token_data)
+        while len(_TOKEN_CACHE) > AUTH_TOKEN_CACHE_SIZE:
+            _TOKEN_CACHE.popitem(last=False)
+    return token_data
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)):
+    return decode_access_token(credentials.credentials)
+
+
+if __name__ == "__main__":
+    # python auth.py hash-key <clé>  → ligne à ajouter dans API_KEYS_FILE
+    if len(sys.argv) == 3 and sys.argv[1] == "hash-key":
+        print(APIKeyStore(os.getenv("API_KEY_PEPPER", SECRET_KEY).encode()).digest(sys.argv[2]).hex())
+    else:
+        print("usage : python auth.py hash-key <clé>")
@@ -0,0 +1,226 @@
+"""Encodage / décodage base64 en flux, à mémoire constante.
+
+Les données sont traitées par blocs alignés (multiples de 3 octets à
+l'encodage, de 4 caractères au décodage) et chaque bloc passe en une fois
+par binascii : le débit reste proche de base64.b64encode / b64decode, la
+mémoire ne dépend que de la taille des blocs.
+
+• Encoder / Decoder : état incrémental (`feed` puis `finish`) ;
+• encode_chunks / decode_chunks : itérateurs sur des blocs ;
+• aencode_chunks / adecode_chunks : variantes pour itérables asynchrones
+  (corps de requête, StreamingResponse) ;
+• retour à la ligne RFC 2045 (76 caractères) et préfixe `data:...;base64,`
+  à l'encodage ; au décodage, préfixe data URI et blancs sont ignorés.
+
+CLI :
+    python base64_stream.py encode -i voix.wav -o voix.txt [--wrap] [--data-uri audio/wav]
+    python base64_stream.py decode -i voix.txt -o voix.wav
+"""
+import argparse
+import binascii
+import sys
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Iterable, Iterator, Optional, Union
+
+# 76 caractères par ligne = 57 octets ; un bloc d'encodage en est un multiple
+LINE_BYTES = 57
+LINE_CHARS = 76
+ENCODE_BLOCK = LINE_BYTES * 16384    # ≈ 0,9 Mo lus par bloc
+DECODE_BLOCK = LINE_CHARS * 16384    # ≈ 1,2 Mo de texte par bloc
+
+_WHITESPACE = b" \t\r\n\v\f"
+_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+
+
+class Encoder:
+    """Encodeur incrémental : `feed(octets)` renvoie le texte base64 prêt."""
+
+    def __init__(self, wrap: bool = False, line_sep: bytes = b"\n", data_uri: Optional[str] = None):
+        self.wrap = wrap
+        self.line_sep = line_sep
+        self._pending = b""
+        self._started = False
+        self._prefix = f"data:{data_uri};base64,".encode() if data_uri else b""
+
+    def _encode(self, block: bytes) -> bytes:
+        text = binascii.b2a_base64(block, newline=False)
+        if self.wrap:
+            text = self.line_sep.join([text[i:i + LINE_CHARS] for i in range(0, len(text), LINE_CHARS)])
+        out = self._prefix if not self._started else (self.line_sep if self.wrap and text else b"")
+        self._started = True
+        return out + text
+
+    def feed(self, data: bytes) -> bytes:
+        if self._pending:
+            data = self._pending + data
+        usable = len(data) - len(data) % LINE_BYTES
+        self._pending = bytes(data[usable:])
+        return self._encode(data[:usable]) if usable else b""
+
+    def finish(self) -> bytes:
+        block, self._pending = self._pending, b""
+        if not block and self._started:
+            return b""
+        return self._encode(block)
+
+
+class Decoder:
+    """Décodeur incrémental : accepte du texte (str ou bytes) par morceaux."""
+
+    def __init__(self):
+        self._pending = b""
+        self._head: Optional[bytes] = b""   # début du flux, tant que le préfixe data URI est possible
+        self._closed = False                # quantum final (avec « = ») déjà décodé
+
+    def _strip_prefix(self, data: bytes) -> bytes:
+        # `data:audio/wav;base64,` : tout ce qui précède la virgule est ignoré
+        head = (self._head + data).lstrip()
+        if not b"data:".startswith(head[:5]):
+            self._head = None
+            return head
+        if b"," not in head:
+            if len(head) > 256:
+                raise ValueError("Préfixe data URI invalide")
+            self._head = head
+            return b""
+        self._head = None
+        return head.split(b",", 1)[1]
+
+    def feed(self, data: Union[bytes, str]) -> bytes:
+        if isinstance(data, str):
+            data = data.encode("ascii")
+        if self._head is not None:
+            data = self._strip_prefix(data)
+        data = data.translate(None, _WHITESPACE)
+        if data.translate(None, _ALPHABET):
+            raise ValueError("Caractère hors de l'alphabet base64")
+        if self._pending:
+            data = self._pending + data
+        if self._closed and data:
+            raise ValueError("Données base64 après le remplissage final « = »")
+        # « = » n'est admis que dans le dernier quantum, quel que soit le
+        # découpage en morceaux (a2b_base64 tronquerait sans erreur)
+        pad = data.find(b"=")
+        if pad != -1:
+            end = pad - pad % 4 + 4
+            if pad % 4 < 2 or len(data) > end or data[pad:].strip(b"="):
+                raise ValueError("Remplissage « = » au milieu du flux base64")
+            self._closed = len(data) == end
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return binascii.a2b_base64(data[:usable]) if usable else b""
+
+    def finish(self) -> bytes:
+        if self._head:
+            self._pending, self._head = self._head, None
+        block, self._pending = self._pending, b""
+        if not block:
+            return b""
+        # Texte sans remplissage final (« = ») : on le complète
+        return binascii.a2b_base64(block + b"=" * (-len(block) % 4))
+
+
+def encode_chunks(chunks: Iterable[bytes], wrap: bool = False, line_sep: bytes = b"\n",
+                  data_uri: Optional[str] = None) -> Iterator[bytes]:
+    encoder = Encoder(wrap, line_sep, data_uri)
+    for chunk in chunks:
+        out = encoder.feed(chunk)
+        if out:
+            yield out
+    out = encoder.finish()
+    if out:
+        yield out
+
+
+def decode_chunks(chunks: Iterable[Union[bytes, str]]) -> Iterator[bytes]:
+    decoder = Decoder()
+    for chunk in chunks:
+        out = decoder.feed(chunk)
+        if out:
+            yield out
+    out = decoder.finish()
+    if out:
+        yield out
+
+
+async def aencode_chunks(chunks: AsyncIterable[bytes], wrap: bool = False, line_sep: bytes = b"\n",
+                         data_uri: Optional[str] = None) -> AsyncIterator[bytes]:
+    encoder = Encoder(wrap, line_sep, data_uri)
+    async for chunk in chunks:
+        out = encoder.feed(chunk)
+        if out:
+            yield out
+    out = encoder.finish()
+    if out:
+        yield out
+
+
+async def adecode_chunks(chunks: AsyncIterable[Union[bytes, str]]) -> AsyncIterator[bytes]:
+    decoder = Decoder()
+    async for chunk in chunks:
+        out = decoder.feed(chunk)
+        if out:
+            yield out
+    out = decoder.finish()
+    if out:
+        yield out
+
+
+def read_blocks(fileobj: BinaryIO, size: int) -> Iterator[bytes]:
+    """Blocs successifs d'un fichier binaire."""
+    return iter(lambda: fileobj.read(size), b"")
+
+
+def slices(text: Union[str, bytes], size: int = DECODE_BLOCK) -> Iterator[Union[str, bytes]]:
+    """Découpe une chaîne déjà en mémoire, pour la décoder sans copie intégrale."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def encode_file(src: BinaryIO, dst: BinaryIO, wrap: bool = False, line_sep: bytes = b"\n",
+                data_uri: Optional[str] = None) -> int:
+    """Encode *src* vers *dst* ; renvoie le nombre de caractères écrits."""
+    written = 0
+    for out in encode_chunks(read_blocks(src, ENCODE_BLOCK), wrap, line_sep, data_uri):
+        dst.write(out)
+        written += len(out)
+    return written
+
+
+def decode_file(src: BinaryIO, dst: BinaryIO) -> int:
+    """Décode *src* (texte base64, data URI accepté) vers *dst* ; renvoie le nombre d'octets."""
+    written = 0
+    for out in decode_chunks(read_blocks(src, DECODE_BLOCK)):
+        dst.write(out)
+        written += len(out)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encodage / décodage base64 en flux (mémoire constante).")
+    parser.add_argument("mode", choices=("encode", "decode"))
+    parser.add_argument("--input", "-i", help="Fichier source (défaut : stdin).")
+    parser.add_argument("--output", "-o", help="Fichier de sortie (défaut : stdout).")
+    parser.add_argument("--wrap", action="store_true", help="Retour à la ligne tous les 76 caractères (RFC 2045).")
+    parser.add_argument("--crlf", action="store_true", help="Fins de ligne CRLF avec --wrap.")
+    parser.add_argument("--data-uri", metavar="MIME", help="Préfixer par data:<MIME>;base64,.")
+    args = parser.parse_args()
+
+    src = open(args.input, "rb") if args.input else sys.stdin.buffer
+    dst = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        if args.mode == "encode":
+            encode_file(src, dst, args.wrap, b"\r\n" if args.crlf else b"\n", args.data_uri)
+        else:
+            decode_file(src, dst)
+    except (ValueError, binascii.Error) as exc:
+        print(f"Erreur : {exc}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.input:
+            src.close()
+        if args.output:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Traitement hors ligne de fichiers JSONL de requêtes chat (style OpenAI Batch).
+
+Chaque job vit dans BATCH_DIR/<job_id>/ :
+• input.jsonl   – fichier uploadé, une requête par ligne ;
+• results.jsonl – une réponse par ligne traitée (écrite au fil de l'eau) ;
+• state.json    – statut et compteurs (réécrit atomiquement).
+
+Formats de ligne acceptés :
+• OpenAI Batch : {"custom_id": ..., "body": {"model", "messages", ...}} ;
+• corps chat direct : {"messages": [...], "model": ..., ...} ;
+• prompt simple : {"prompt": "..."} ou {"request_id", "title", "body": "..."}.
+
+Les appels passent par la classe `batch` du contrôle d'admission : ils
+n'occupent jamais les créneaux interactifs. Après un redémarrage, les jobs
+non terminés reprennent là où results.jsonl s'est arrêté. Un verrou fichier
+garantit qu'un seul process traite un job donné.
+"""
+import asyncio
+import fcntl
+import json
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from llm_service import Message, get_ollama_response, openai_chat_completion
+from scheduler_service import QueueFull, scheduler
+
+BATCH_DIR = Path(os.getenv("BATCH_DIR", "batches"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "2"))
+# Nombre de résultats entre deux fsync / mises à jour de state.json
+BATCH_CHECKPOINT_EVERY = int(os.getenv("BATCH_CHECKPOINT_EVERY", "20"))
+
+_ACTIVE_STATUSES = ("validating", "in_progress")
+
+
+def _now() -> int:
+    return int(datetime.utcnow().timestamp())
+
+
+def parse_line(raw: str, index: int) -> Tuple[str, Dict[str, Any]]:
+    """Convertit une ligne du fichier en (custom_id, corps de requête chat)."""
+    item = json.loads(raw)
+    if not isinstance(item, dict):
+        raise ValueError("chaque ligne doit être un objet JSON")
+    custom_id = str(item.get("custom_id") or item.get("request_id") or f"line-{index}")
+
+    body = item.get("body")
+    if isinstance(body, dict):
+        return custom_id, body
+    if "messages" in item:
+        return custom_id, item
+    prompt = item.get("prompt")
+    if prompt is None and isinstance(body, str):
+        prompt = f"{item['title']}\n\n{body}" if item.get("title") else body
+    if not isinstance(prompt, str):
+        raise ValueError("ligne sans 'messages', 'prompt' ni 'body'")
+    return custom_id, {"messages": [{"role": "user", "content": prompt}]}
+
+
+class BatchJob:
+    def __init__(self, job_dir: Path):
+        self.dir = job_dir
+        self.id = job_dir.name
+        self.input_path = job_dir / "input.jsonl"
+        self.results_path = job_dir / "results.jsonl"
+        self.state_path = job_dir / "state.json"
+        self.state: Dict[str, Any] = json.loads(self.state_path.read_text()) if self.state_path.exists() else {}
+
+    def save_state(self) -> None:
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state))
+        os.replace(tmp, self.state_path)
+
+    def cancel_requested(self) -> bool:
+        """Annulation demandée sur disque (par un autre process que celui qui traite le job)."""
+        try:
+            return json.loads(self.state_path.read_text()).get("status") == "cancelling"
+        except (OSError, ValueError):
+            return False
+
+    def public(self) -> Dict[str, Any]:
+        """Objet `batch` au format OpenAI."""
+        s = self.state
+        return {
+            "id": self.id,
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "status": s.get("status"),
+            "created_at": s.get("created_at"),
+            "completed_at": s.get("completed_at"),
+            "errors": s.get("error"),
+            "request_counts": {
+                "total": s.get("total", 0),
+                "completed": s.get("completed", 0),
+                "failed": s.get("failed", 0),
+            },
+            "output_file": f"/v1/batches/{self.id}/output",
+            "metadata": s.get("metadata") or {},
+        }
+
+    def done_lines(self) -> set:
+        """Indices déjà traités ; recalcule les compteurs et tronque une
+        éventuelle dernière ligne incomplète (arrêt brutal pendant l'écriture)."""
+        done = set()
+        self.state["completed"] = self.state["failed"] = 0
+        if not self.results_path.exists():
+            return done
+        good_size = 0
+        with open(self.results_path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                try:
+                    result = json.loads(raw)
+                    done.add(result["line"])
+                except (ValueError, KeyError):
+                    break
+                self.state["failed" if result.get("error") else "completed"] += 1
+                good_size += len(raw)
+        if good_size != self.results_path.stat().st_size:
+            with open(self.results_path, "r+b") as f:
+                f.truncate(good_size)
+        return done
+
+
+class _CancelRequested(Exception):
+    """Annulation demandée par un autre process (statut `cancelling` sur disque)."""
+
+
+class BatchManager:
+    """Création, reprise et exécution des jobs batch du process."""
+
+    def __init__(self, root: Path = BATCH_DIR, concurrency: int = BATCH_CONCURRENCY):
+        self.root = root
+        self.concurrency = concurrency
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._cancelled: set = set()
+
+    def get(self, job_id: str) -> BatchJob:
+        job_dir = self.root / job_id
+        if not job_id.startswith("batch_") or not (job_dir / "state.json").exists():
+            raise KeyError(job_id)
+        return BatchJob(job_dir)
+
+    def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        if not self.root.exists():
+            return []
+        dirs = sorted(self.root.glob("batch_*"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [BatchJob(d).public() for d in dirs[:limit] if (d / "state.json").exists()]
+
+    async def create(self, chunks, metadata: Optional[Dict[str, Any]] = None) -> BatchJob:
+        """Écrit l'upload (itérable asynchrone de blocs bytes) sur disque et lance le job."""
+        job_dir = self.root / f"batch_{uuid.uuid4().hex[:16]}"
+        job_dir.mkdir(parents=True)
+        job = BatchJob(job_dir)
+        # Lignes non vides seulement : _process ignore les lignes blanches
+        lines = 0
+        content = False  # la ligne en cours contient autre chose que des blancs
+        with open(job.input_path, "wb") as f:
+            async for chunk in chunks:
+                f.write(chunk)
+                *complete, rest = chunk.split(b"\n")
+                for piece in complete:
+                    lines += content or bool(piece.strip())
+                    content = False
+                content = content or bool(rest.strip())
+        lines += content
+        job.state = {
+            "status": "validating",
+            "created_at": _now(),
+            "completed_at": None,
+            "total": lines,
+            "completed": 0,
+            "failed": 0,
+            "metadata": metadata or {},
+        }
+        job.save_state()
+        self.start(job)
+        return job
+
+    def start(self, job: BatchJob) -> bool:
+        if job.id in self._tasks and not self._tasks[job.id].done():
+            return False
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        return True
+
+    def cancel(self, job_id: str) -> BatchJob:
+        job = self.get(job_id)
+        if job.state.get("status") not in _ACTIVE_STATUSES:
+            return job
+        task = self._tasks.get(job_id)
+        if task and not task.done():
+            # La tâche enregistre elle-même le statut final en s'arrêtant
+            self._cancelled.add(job_id)
+            task.cancel()
+            job.state["status"] = "cancelling"
+        elif self._locked_elsewhere(job):
+            # Traité par un autre worker : il s'arrête à son prochain point de contrôle
+            job.state["status"] = "cancelling"
+        else:
+            job.state.update(status="cancelled", completed_at=_now())
+        job.save_state()
+        return job
+
+    @staticmethod
+    def _locked_elsewhere(job: BatchJob) -> bool:
+        with open(job.dir / ".lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return False
+
+    def resume_all(self) -> int:
+        """Relance les jobs interrompus (appelé au démarrage)."""
+        resumed = 0
+        if not self.root.exists():
+            return 0
+        for job_dir in self.root.glob("batch_*"):
+            if not (job_dir / "state.json").exists():
+                continue
+            job = BatchJob(job_dir)
+            if job.state.get("status") == "cancelling" and not self._locked_elsewhere(job):
+                # Annulation demandée avant l'arrêt du process qui traitait le job
+                job.state.update(status="cancelled", completed_at=_now())
+                job.save_state()
+            elif job.state.get("status") in _ACTIVE_STATUSES and self.start(job):
+                resumed += 1
+        if resumed:
+            print(f"[BATCH] {resumed} job(s) repris")
+        return resumed
+
+    async def shutdown(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _run(self, job: BatchJob) -> None:
+        lock_file = open(job.dir / ".lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return  # déjà traité par un autre process
+        job = BatchJob(job.dir)  # relit l'état sur disque (annulation, reprise)
+        try:
+            await self._process(job)
+        except asyncio.CancelledError:
+            # Annulation explicite, sinon arrêt du serveur : le job reprendra
+            if job.id in self._cancelled or job.cancel_requested():
+                job.state.update(status="cancelled", completed_at=_now())
+            job.save_state()
+            raise
+        except _CancelRequested:
+            print(f"[BATCH] Job {job.id} annulé")
+            job.state.update(status="cancelled", completed_at=_now())
+            job.save_state()
+        except Exception as err:
+            print(f"[BATCH] Job {job.id} en échec : {err}")
+            job.state.update(status="failed", error=str(err), completed_at=_now())
+            job.save_state()
+        finally:
+            lock_file.close()
+
+    async def _process(self, job: BatchJob) -> None:
+        if job.state.get("status") not in _ACTIVE_STATUSES:
+            return
+        done = job.done_lines()
+        job.state["status"] = "in_progress"
+        job.save_state()
+
+        sem = asyncio.Semaphore(self.concurrency)
+        pending: set = set()
+        since_checkpoint = 0
+        cancel_requested = False  # statut `cancelling` écrit par un autre process
+
+        with open(job.results_path, "a", encoding="utf-8") as out:
+            async def handle(index: int, raw: str) -> None:
+                nonlocal since_checkpoint, cancel_requested
+                try:
+                    result, ok = await self._execute(job.id, index, raw)
+                finally:
+                    sem.release()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                job.state["completed" if ok else "failed"] += 1
+                since_checkpoint += 1
+                if since_checkpoint >= BATCH_CHECKPOINT_EVERY:
+                    since_checkpoint = 0
+                    os.fsync(out.fileno())
+                    if job.cancel_requested():
+                        cancel_requested = True
+                    else:
+                        job.save_state()
+
+            try:
+                with open(job.input_path, encoding="utf-8") as f:
+                    for index, raw in enumerate(f):
+                        if index in done or not raw.strip():
+                            continue
+                        await sem.acquire()
+                        if cancel_requested:
+                            sem.release()
+                            raise _CancelRequested(job.id)
+                        task = asyncio.create_task(handle(index, raw))
+                        pending.add(task)
+                        task.add_done_callback(pending.discard)
+                if pending:
+                    await asyncio.gather(*pending)
+            finally:
+                for task in list(pending):
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                out.flush()
+                os.fsync(out.fileno())
+
+        job.state.update(status="completed", completed_at=_now())
+        job.save_state()
+        print(f"[BATCH] Job {job.id} terminé : {job.state['completed']} ok, {job.state['failed']} en erreur")
+
+    async def _execute(self, job_id: str, index: int, raw: str) -> Tuple[Dict[str, Any], bool]:
+        result: Dict[str, Any] = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "line": index, "custom_id": f"line-{index}"}
+        try:
+            custom_id, body = parse_line(raw, index)
+            result["custom_id"] = custom_id
+            model = body.get("model") or os.getenv("MODEL_NAME", "mistral")
+            messages = [Message(role=m["role"], content=m["content"]) for m in body.get("messages", [])]
+        except (ValueError, KeyError, TypeError, AttributeError) as err:
+            result.update(response=None, error={"code": "invalid_request", "message": str(err)})
+            return result, False
+
+        try:
+            while True:
+                try:
+                    async with scheduler.slot("batch", f"batch:{job_id}"):
+                        answer = await get_ollama_response(
+                            messages, body.get("temperature", 0.7), body.get("max_tokens", 1024), model
+                        )
+                    break
+                except QueueFull:
+                    await asyncio.sleep(1.0)
+        except httpx.HTTPError as err:
+            result.update(response=None, error={"code": "backend_error", "message": str(err)})
+            return result, False
+        except Exception as err:
+            # Toute autre erreur (paramètre mal typé, réponse Ollama inattendue,
+            # délai dépassé…) reste une erreur de la ligne, pas du job
+            result.update(response=None, error={"code": "server_error", "message": f"{type(err).__name__}: {err}"})
+            return result, False
+
+        result.update(response={"status_code": 200, "body": openai_chat_completion(model, answer)}, error=None)
+        return result, True
+
+
+# Instance unique utilisée par l'application
+batch_manager = BatchManager()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark du coût de l'authentification par requête (auth.py).
+
+Compare :
+- login : ancien chemin (hash bcrypt + vérification) et chemin actuel
+  (empreinte précalculée, vérification seule) ;
+- JWT : décodage complet et jeton déjà validé (cache) ;
+- clé API : recherche HMAC dans la table, avec 1 et 1000 clés.
+
+Usage :
+    python benchmarks/bench_auth.py --iterations 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import auth  # noqa: E402
+
+
+def per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - start) / iterations * 1e6, 2)
+
+
+def legacy_login(username: str, password: str) -> bool:
+    """Chemin d'origine : bcrypt du mot de passe admin à chaque login."""
+    hashed = auth.get_password_hash(os.getenv("ADMIN_PASSWORD", "changeme"))
+    return username == os.getenv("ADMIN_USERNAME", "admin") and auth.verify_password(password, hashed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'authentification")
+    parser.add_argument("--iterations", type=int, default=20000, help="Appels pour les mesures rapides")
+    parser.add_argument("--logins", type=int, default=5, help="Appels pour les mesures bcrypt")
+    args = parser.parse_args()
+
+    user, password = os.getenv("ADMIN_USERNAME", "admin"), os.getenv("ADMIN_PASSWORD", "changeme")
+    report = {}
+
+    report["login_legacy_ms"] = round(per_call_us(lambda: legacy_login(user, password), args.logins) / 1000, 1)
+    auth.prepare_auth()
+    report["login_precomputed_ms"] = round(
+        per_call_us(lambda: auth.authenticate_user(user, password), args.logins) / 1000, 1
+    )
+
+    token = auth.create_access_token({"sub": user}, timedelta(minutes=30))
+
+    def decode_uncached():
+        auth._TOKEN_CACHE.clear()
+        auth.decode_access_token(token)
+
+    report["jwt_decode_us"] = per_call_us(decode_uncached, args.iterations)
+    auth.decode_access_token(token)
+    report["jwt_cached_us"] = per_call_us(lambda: auth.decode_access_token(token), args.iterations)
+
+    header = f"Bearer {auth.SECRET_KEY}"
+    report["api_key_1_us"] = per_call_us(lambda: auth.check_api_key(header, None), args.iterations)
+    for i in range(1000):
+        auth.api_keys.add(f"bench-{i}", f"sk-bench-{i:04d}")
+    report["api_key_1000_us"] = per_call_us(lambda: auth.check_api_key("Bearer sk-bench-0500", None), args.iterations)
+
+    print(json.dumps(report, indent=2))
+    print(f"✅ Login : {report['login_legacy_ms']} ms -> {report['login_precomputed_ms']} ms")
+    print(f"✅ JWT   : {report['jwt_decode_us']} µs -> {report['jwt_cached_us']} µs par requête")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark du budget CPU : débit agrégé de requêtes STT et TTS concurrentes,
+avec les threads torch par défaut (asyncio.to_thread, comportement d'origine)
+puis avec les créneaux de cpu_budget_service.
+
+Les requêtes sont des charges torch synthétiques (produits matriciels et
+convolutions de tailles proches d'un encodeur Whisper « base » et d'un
+décodeur VITS), sérialisées par famille comme les verrous de modèle de
+stt_service / tts_service : au plus une STT et une TTS calculent en même
+temps. Chaque mode tourne dans un process neuf (réglages torch non partagés).
+
+Usage :
+    python benchmarks/bench_cpu_budget.py [--concurrency 1,2,4,8] [--requests 24]
+        [--budget 0] [--slots stt:1,tts:1] [--pin]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _workloads():
+    import torch
+
+    torch.manual_seed(0)
+    enc_x, enc_w = torch.randn(1500, 512), torch.randn(512, 2048)
+    dec_x, dec_w = torch.randn(1, 192, 8000), torch.randn(192, 192, 7)
+
+    def stt():
+        for _ in range(6):
+            torch.relu(enc_x @ enc_w) @ enc_w.T
+
+    def tts():
+        for _ in range(4):
+            torch.nn.functional.conv1d(dec_x, dec_w, padding=3)
+
+    return {"stt": stt, "tts": tts}
+
+
+def child(mode: str, concurrency_levels: list, requests: int, budget: int, slots: str, pin: bool) -> dict:
+    import torch
+    from cpu_budget_service import CPUBudget, parse_slots
+
+    work = _workloads()
+    locks = {family: threading.Lock() for family in work}   # verrous de modèle
+
+    def request(family):
+        with locks[family]:
+            work[family]()
+
+    manager = CPUBudget(budget, parse_slots(slots), pin=pin, enabled=(mode == "budget"))
+    for family in work:                                     # préchauffage
+        manager.run_sync(family, request, family)
+
+    async def level(concurrency: int) -> dict:
+        sem = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(i: int):
+            family = "stt" if i % 2 == 0 else "tts"
+            async with sem:
+                start = time.perf_counter()
+                await manager.run(family, request, family)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "concurrency": concurrency,
+            "throughput_rps": round(requests / elapsed, 2),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+        }
+
+    return {
+        "mode": mode,
+        "torch_threads": torch.get_num_threads(),
+        "plan": manager.plan() if mode == "budget" else None,
+        "levels": [asyncio.run(level(c)) for c in concurrency_levels],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du budget de threads CPU")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Niveaux de concurrence")
+    parser.add_argument("--requests", type=int, default=24, help="Requêtes par niveau (STT/TTS alternées)")
+    parser.add_argument("--budget", type=int, default=0, help="Cœurs du budget (0 : tous)")
+    parser.add_argument("--slots", default="stt:1,tts:1", help="Créneaux par famille")
+    parser.add_argument("--pin", action="store_true", help="Épingler les créneaux sur leurs cœurs")
+    parser.add_argument("--child", choices=("default", "budget"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    if args.child:
+        print(json.dumps(child(args.child, levels, args.requests, args.budget, args.slots, args.pin)))
+        return
+
+    report = {"cores": len(os.sched_getaffinity(0)), "runs": []}
+    for mode in ("default", "budget"):
+        cmd = [sys.executable, __file__, "--child", mode, "--concurrency", args.concurrency,
+               "--requests", str(args.requests), "--budget", str(args.budget), "--slots", args.slots]
+        proc = subprocess.run(cmd + (["--pin"] if args.pin else []), capture_output=True, text=True, cwd=ROOT)
+        try:
+            run = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            run = {"mode": mode, "error": (proc.stderr.strip().splitlines() or ["sortie vide"])[-1]}
+        report["runs"].append(run)
+        for lvl in run.get("levels", []):
+            print(f"⚙️  {mode:8} c={lvl['concurrency']:<3} {lvl['throughput_rps']:7.2f} req/s"
+                  f"  p50 {lvl['p50_ms']:8.1f} ms  p95 {lvl['p95_ms']:8.1f} ms", file=sys.stderr)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
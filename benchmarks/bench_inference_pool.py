@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark des process d'inférence (inference_pool_service), sans modèle :
+
+• transport : aller-retour d'un audio 16 kHz float32 (1 s à 5 min) vers un
+  worker, qui en calcule l'énergie (entrée) ou renvoie un signal de même
+  durée (sortie), par mémoire partagée puis en pickle seul
+  (INFERENCE_SHM_MIN_BYTES très grand) ;
+• GIL : requêtes concurrentes d'une charge Python pure (boucle de
+  traitement de texte, comme la normalisation Coqui ou le décodage Whisper
+  hors torch), dans des threads du process API (cpu_budget) puis dans
+  autant de process d'inférence.
+
+Usage :
+    python benchmarks/bench_inference_pool.py [--workers 2] [--requests 16] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+import inference_pool_service
+from cpu_budget_service import CPUBudget
+from inference_pool_service import InferencePool
+
+SAMPLE_RATE = 16000
+
+
+def energy(audio) -> float:
+    return float(np.square(audio).mean())
+
+
+def tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    return np.sin(2 * np.pi * 440 * t).astype(np.float32)
+
+
+def text_work(n: int) -> int:
+    words = 0
+    for i in range(n):
+        words += len(f"phrase {i} à normaliser".lower().replace("à", "a").split())
+    return words
+
+
+def _pool(workers: int, shm_min_bytes: int) -> InferencePool:
+    # Le seuil est lu à l'import : fixé pour ce process et, via l'environnement, pour les workers
+    os.environ["INFERENCE_SHM_MIN_BYTES"] = str(shm_min_bytes)
+    inference_pool_service.INFERENCE_SHM_MIN_BYTES = shm_min_bytes
+    pool = InferencePool(enabled=True, budget=CPUBudget(0, {"cpu": workers}, pin=False), preload={})
+    pool.start(["cpu"])
+    for _ in range(workers):
+        pool.run_sync("cpu", energy, np.zeros(16, np.float32))  # attend le démarrage
+    return pool
+
+
+def transport(repeat: int) -> list:
+    rows = []
+    for mode, threshold in (("shm", 64 * 1024), ("pickle", 1 << 62)):
+        pool = _pool(1, threshold)
+        for seconds in (1, 30, 300):
+            audio = tone(seconds)
+            timings = {}
+            for direction, call in (("in", lambda: pool.run_sync("cpu", energy, audio)),
+                                    ("out", lambda: pool.run_sync("cpu", tone, seconds))):
+                call()
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    call()
+                timings[direction] = round((time.perf_counter() - start) / repeat * 1000, 2)
+            rows.append({"mode": mode, "audio_s": seconds, "mb": round(audio.nbytes / 1e6, 1),
+                         "in_ms": timings["in"], "out_ms": timings["out"]})
+            print(f"📦 {mode:6} {seconds:4d}s ({audio.nbytes / 1e6:5.1f} Mo)  entrée {timings['in']:8.2f} ms"
+                  f"  sortie {timings['out']:8.2f} ms", file=sys.stderr)
+        asyncio.run(pool.shutdown())
+    return rows
+
+
+def gil(workers: int, requests: int, size: int) -> list:
+    rows = []
+    threads = CPUBudget(0, {"cpu": workers}, pin=False)
+    for slot in threads.slots["cpu"]:       # création des threads (import torch) hors mesure
+        slot.executor().submit(text_work, 1).result()
+    pool = _pool(workers, 64 * 1024)
+
+    async def level(run) -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(run("cpu", text_work, size) for _ in range(requests)))
+        return time.perf_counter() - start
+
+    for mode, run in (("threads", threads.run), ("processes", pool.run)):
+        elapsed = asyncio.run(level(run))
+        rows.append({"mode": mode, "workers": workers, "throughput_rps": round(requests / elapsed, 2)})
+        print(f"🧵 {mode:9} {workers} créneau(x)  {requests / elapsed:7.2f} req/s", file=sys.stderr)
+    asyncio.run(pool.shutdown())
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des process d'inférence")
+    parser.add_argument("--workers", type=int, default=2, help="Créneaux (threads ou process)")
+    parser.add_argument("--requests", type=int, default=16, help="Requêtes concurrentes (charge GIL)")
+    parser.add_argument("--size", type=int, default=200_000, help="Itérations Python par requête")
+    parser.add_argument("--repeat", type=int, default=20, help="Répétitions par mesure de transport")
+    args = parser.parse_args()
+
+    report = {
+        "cores": len(os.sched_getaffinity(0)),
+        "transport": transport(args.repeat),
+        "gil": gil(args.workers, args.requests, args.size),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
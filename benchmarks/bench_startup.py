@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark du démarrage : durée d'import de l'application et RSS selon les
+sous-systèmes activés (ENABLE_LLM / ENABLE_STT / ENABLE_TTS), puis coût
+d'import de chaque dépendance lourde, payé au premier usage.
+
+Chaque mesure tourne dans un process neuf (aucun module déjà en cache).
+
+Usage :
+    python benchmarks/bench_startup.py [--repeat 3] [--importtime 15]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CONFIGS = {
+    "full": {},
+    "llm_only": {"ENABLE_STT": "0", "ENABLE_TTS": "0"},
+    "speech_only": {"ENABLE_LLM": "0"},
+}
+HEAVY_MODULES = ("torch", "torchaudio", "whisper", "TTS.api")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = 0
+with open("/proc/self/status") as f:
+    for line in f:
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) / 1024
+print(json.dumps({{"import_ms": round(elapsed * 1000, 1), "rss_mb": round(rss, 1),
+                  "heavy_loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def probe(module: str, env: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, cwd=ROOT, env={**os.environ, **env},
+    )
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"error": (proc.stderr.strip().splitlines() or ["sortie vide"])[-1]}
+
+
+def best_of(module: str, env: dict, repeat: int) -> dict:
+    runs = [probe(module, env) for _ in range(repeat)]
+    ok = [r for r in runs if "error" not in r]
+    return min(ok, key=lambda r: r["import_ms"]) if ok else runs[-1]
+
+
+def importtime_top(env: dict, top: int) -> list:
+    """Modules les plus coûteux (cumulé) à l'import de main, via -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, cwd=ROOT, env={**os.environ, **env},
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return [{"module": n, "cumulative_ms": round(c / 1000, 1)} for c, n in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du temps de démarrage")
+    parser.add_argument("--repeat", type=int, default=3, help="Process par mesure (meilleur retenu)")
+    parser.add_argument("--importtime", type=int, default=0, help="Afficher les N imports les plus coûteux")
+    args = parser.parse_args()
+
+    report = {"app": {}, "first_use": {}}
+    for name, env in CONFIGS.items():
+        report["app"][name] = best_of("main", env, args.repeat)
+        print(f"🚀 {name:12} {report['app'][name]}", file=sys.stderr)
+    for module in HEAVY_MODULES:
+        report["first_use"][module] = best_of(module, {}, args.repeat)
+        print(f"📦 {module:12} {report['first_use'][module]}", file=sys.stderr)
+    if args.importtime:
+        report["importtime_full"] = importtime_top({}, args.importtime)
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
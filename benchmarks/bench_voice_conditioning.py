@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark du conditionnement des échantillons de voix (voice_service).
+
+Génère un échantillon synthétique « parole + silences + bruit », l'enregistre
+avec et sans conditionnement, puis compare :
+- le temps de traitement à l'upload ;
+- la durée de la référence conservée ;
+- (option --xtts) le temps de calcul des latents de conditionnement XTTS,
+  payé à chaque synthèse avec une voix clonée.
+
+Usage :
+    python benchmarks/bench_voice_conditioning.py --seconds 120
+    python benchmarks/bench_voice_conditioning.py --seconds 120 --xtts --repeat 3
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+# VOICES_DIR doit être défini avant l'import de voice_service
+os.environ.setdefault("VOICES_DIR", tempfile.mkdtemp(prefix="bench_voices_"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import voice_service  # noqa: E402
+
+
+def synthetic_sample(seconds: float, sample_rate: int = 44100, seed: int = 0) -> bytes:
+    """WAV : rafales « voisées » de 0,5 à 3 s séparées de silences bruités."""
+    rng = np.random.default_rng(seed)
+    parts, total = [rng.normal(0, 0.002, sample_rate * 2)], 2.0
+    while total < seconds:
+        n = int(sample_rate * rng.uniform(0.5, 3.0))
+        t = np.arange(n) / sample_rate
+        f0 = rng.uniform(100, 250)
+        voiced = 0.1 * np.sin(2 * np.pi * f0 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+        parts.append(voiced + rng.normal(0, 0.002, n))
+        pause = int(sample_rate * rng.uniform(0.2, 2.5))
+        parts.append(rng.normal(0, 0.002, pause))
+        total += (n + pause) / sample_rate
+    buf = io.BytesIO()
+    sf.write(buf, np.concatenate(parts).astype(np.float32), sample_rate, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def time_upload(data: bytes, name: str, condition: bool) -> dict:
+    # Upload non mesuré : imports paresseux, index SQLite, caches du resampler
+    voice_service.save_voice_wav_stream(io.BytesIO(data), f"{name}_warmup", condition=condition, keep_raw=False)
+    start = time.perf_counter()
+    voice_id = voice_service.save_voice_wav_stream(io.BytesIO(data), name, condition=condition, keep_raw=False)
+    elapsed = time.perf_counter() - start
+    path = voice_service._voice_path(voice_id)
+    return {"voice_id": voice_id, "upload_s": round(elapsed, 3), "reference_s": round(sf.info(str(path)).duration, 2)}
+
+
+def time_xtts_latents(paths: dict, repeat: int) -> dict:
+    from TTS.api import TTS
+    import torch
+
+    tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=torch.cuda.is_available())
+    model = tts.synthesizer.tts_model
+    results = {}
+    for label, path in paths.items():
+        model.get_conditioning_latents(audio_path=[str(path)])  # non mesuré
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            model.get_conditioning_latents(audio_path=[str(path)])
+            timings.append(time.perf_counter() - start)
+        results[label] = round(min(timings), 3)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du conditionnement des voix")
+    parser.add_argument("--seconds", type=float, default=120.0, help="Durée de l'échantillon synthétique")
+    parser.add_argument("--xtts", action="store_true", help="Mesurer aussi les latents XTTS (modèle requis)")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions pour la mesure XTTS")
+    args = parser.parse_args()
+
+    data = synthetic_sample(args.seconds)
+    print(f"📦 Échantillon synthétique : {args.seconds:.0f}s, {len(data) / 1e6:.1f} MB")
+
+    report = {
+        "raw": time_upload(data, "bench_raw", condition=False),
+        "conditioned": time_upload(data, "bench_conditioned", condition=True),
+    }
+    if args.xtts:
+        latents = time_xtts_latents(
+            {k: voice_service._voice_path(v["voice_id"]) for k, v in report.items()}, args.repeat
+        )
+        for label, seconds in latents.items():
+            report[label]["xtts_latents_s"] = seconds
+
+    print(json.dumps(report, indent=2))
+    raw, cond = report["raw"], report["conditioned"]
+    print(f"✅ Référence : {raw['reference_s']}s -> {cond['reference_s']}s")
+    if args.xtts:
+        print(f"✅ Latents XTTS : {raw['xtts_latents_s']}s -> {cond['xtts_latents_s']}s par synthèse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Faux serveur Ollama pour les tests de charge (aucun GPU ni modèle requis).
+
+Émule la latence d'un vrai modèle : délai de préremplissage (prefill) puis
+un délai par token, en streaming NDJSON ou en réponse unique. Un nombre
+limité de générations simultanées (--parallel, comme OLLAMA_NUM_PARALLEL)
+fait apparaître la mise en file côté serveur.
+
+Routes : /api/chat, /api/generate (avec `context`), /api/embed,
+/api/embeddings, /api/tags, /api/version.
+
+Usage :
+    python benchmarks/fake_ollama.py --port 11434 --prefill-ms 150 --token-ms 25
+    OLLAMA_HOST=http://localhost:11434 uvicorn main:app
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = ("le", "modèle", "répond", "avec", "une", "phrase", "plausible", "pour", "le", "test", "de", "charge.")
+
+
+class Settings:
+    prefill_ms = 150.0
+    token_ms = 25.0
+    max_tokens = 64
+    parallel = 4
+    embed_dim = 768
+    embed_ms = 5.0
+
+
+settings = Settings()
+app = FastAPI(title="Fake Ollama")
+_slots: asyncio.Semaphore = None  # type: ignore
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _num_tokens(body: dict) -> int:
+    requested = (body.get("options") or {}).get("num_predict") or settings.max_tokens
+    return max(1, min(int(requested), settings.max_tokens))
+
+
+async def _generate(body: dict):
+    """Produit (token, terminé) au rythme configuré, un créneau de génération occupé."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.parallel)
+    async with _slots:
+        await asyncio.sleep(settings.prefill_ms / 1000)
+        n = _num_tokens(body)
+        for i in range(n):
+            if i:
+                await asyncio.sleep(settings.token_ms / 1000)
+            yield WORDS[i % len(WORDS)] + " ", i == n - 1
+
+
+def _stats(start: float, n: int) -> dict:
+    total = int((time.perf_counter() - start) * 1e9)
+    return {"total_duration": total, "eval_count": n, "prompt_eval_count": 10, "load_duration": 0}
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    model, start = body.get("model", "fake"), time.perf_counter()
+
+    if body.get("stream", True):
+        async def lines():
+            n = 0
+            async for token, _ in _generate(body):
+                n += 1
+                yield json.dumps({"model": model, "created_at": _now(),
+                                  "message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+            yield json.dumps({"model": model, "created_at": _now(), "message": {"role": "assistant", "content": ""},
+                              "done": True, **_stats(start, n)}) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    tokens = [token async for token, _ in _generate(body)]
+    return {"model": model, "created_at": _now(), "message": {"role": "assistant", "content": "".join(tokens)},
+            "done": True, **_stats(start, len(tokens))}
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    body = await request.json()
+    model, start = body.get("model", "fake"), time.perf_counter()
+    tokens = [token async for token, _ in _generate(body)]
+    context = list(body.get("context") or []) + list(range(len(tokens) + 10))
+    result = {"model": model, "created_at": _now(), "response": "".join(tokens), "done": True,
+              "context": context, **_stats(start, len(tokens))}
+    if body.get("stream", True):
+        return StreamingResponse(iter([json.dumps(result) + "\n"]), media_type="application/x-ndjson")
+    return result
+
+
+def _vector(text: str) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+    vec = np.random.default_rng(seed).standard_normal(settings.embed_dim).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+@app.post("/api/embed")
+async def embed(request: Request):
+    body = await request.json()
+    inputs = body.get("input")
+    inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+    await asyncio.sleep(settings.embed_ms * len(inputs) / 1000)
+    return {"model": body.get("model", "fake"), "embeddings": [_vector(t) for t in inputs]}
+
+
+@app.post("/api/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    await asyncio.sleep(settings.embed_ms / 1000)
+    return {"embedding": _vector(body.get("prompt", ""))}
+
+
+@app.get("/api/tags")
+async def tags():
+    model = {"name": "mistral:latest", "model": "mistral:latest", "modified_at": _now(), "size": 4_100_000_000,
+             "details": {"family": "llama", "parameter_size": "7B", "quantization_level": "Q4_0"}}
+    return {"models": [model, {**model, "name": "nomic-embed-text:latest", "model": "nomic-embed-text:latest"}]}
+
+
+@app.get("/api/version")
+async def version():
+    return {"version": "0.0.0-fake"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Ollama à latence configurable")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--prefill-ms", type=float, default=settings.prefill_ms, help="Délai avant le premier token")
+    parser.add_argument("--token-ms", type=float, default=settings.token_ms, help="Délai entre deux tokens")
+    parser.add_argument("--max-tokens", type=int, default=settings.max_tokens, help="Plafond de tokens par réponse")
+    parser.add_argument("--parallel", type=int, default=settings.parallel, help="Générations simultanées")
+    parser.add_argument("--embed-ms", type=float, default=settings.embed_ms, help="Délai par texte embeddé")
+    args = parser.parse_args()
+    settings.prefill_ms, settings.token_ms = args.prefill_ms, args.token_ms
+    settings.max_tokens, settings.parallel, settings.embed_ms = args.max_tokens, args.parallel, args.embed_ms
+    print(f"🤖 Fake Ollama sur :{args.port} (prefill {args.prefill_ms} ms, {args.token_ms} ms/token, "
+          f"{args.parallel} en parallèle)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
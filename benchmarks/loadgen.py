@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Générateur de charge en boucle ouverte pour l'API (saturation, files d'attente).
+
+Les requêtes partent selon un processus d'arrivée (Poisson ou constant) au
+débit cible, indépendamment des réponses : quand le serveur sature, la
+latence et les erreurs montent au lieu d'être masquées par un client qui
+attend (boucle fermée, comme scripts/test-upload.py).
+
+Mélange de routes (--mix) :
+• stt    → POST /stt (WAV synthétique en base64)
+• tts    → POST /tts
+• chat   → POST /v1/chat/completions (prompts tirés de --prompts)
+• voices → GET /voices
+• upload → POST /voices (petit WAV, nom aléatoire)
+
+--prompts accepte un JSONL (prompt, messages, ou request_id/title/body comme
+requests.jsonl). Avec --rates 1,2,4,8, chaque palier dure --duration
+secondes : le point de saturation est le palier où p99 et erreurs décollent.
+
+Usage :
+    python benchmarks/fake_ollama.py --port 11434 &
+    python benchmarks/loadgen.py --url http://localhost:8000 --rates 2,4,8 \\
+        --duration 30 --mix chat=3,tts=1,stt=1,voices=1 --prompts requests.jsonl
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+import numpy as np
+import soundfile as sf
+
+ROUTES = ("stt", "tts", "chat", "voices", "upload")
+
+
+def _wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    audio = 0.1 * np.sin(2 * np.pi * 180 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    buf = io.BytesIO()
+    sf.write(buf, audio.astype(np.float32), sample_rate, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def load_prompts(path):
+    """Prompts d'un JSONL (mêmes formats que les jobs batch), ou une liste par défaut."""
+    if not path:
+        return [[{"role": "user", "content": "Explique en deux phrases ce qu'est un test de charge."}]]
+    prompts = []
+    for raw in Path(path).read_text(encoding="utf-8").splitlines():
+        if not raw.strip():
+            continue
+        item = json.loads(raw)
+        body = item.get("body")
+        if isinstance(body, dict) and "messages" in body:
+            prompts.append(body["messages"])
+        elif "messages" in item:
+            prompts.append(item["messages"])
+        else:
+            text = item.get("prompt") or (f"{item.get('title', '')}\n\n{body}" if isinstance(body, str) else None)
+            if text:
+                prompts.append([{"role": "user", "content": text}])
+    if not prompts:
+        sys.exit(f"❌ Aucun prompt exploitable dans {path}")
+    return prompts
+
+
+class Workload:
+    """Construit les requêtes de chaque type de route."""
+
+    def __init__(self, args, token: str):
+        self.args = args
+        self.jwt = {"Authorization": f"Bearer {token}"} if token else {}
+        self.api_key = {"Authorization": f"Bearer {args.api_key}"}
+        self.prompts = load_prompts(args.prompts)
+        self.stt_audio = base64.b64encode(_wav(args.stt_seconds)).decode()
+        self.upload_wav = _wav(3.0, 22050)
+
+    def build(self, route: str) -> dict:
+        if route == "stt":
+            return {"method": "POST", "url": "/stt", "headers": self.jwt,
+                    "json": {"audio": self.stt_audio, "language": "fr", "model": self.args.stt_model}}
+        if route == "tts":
+            return {"method": "POST", "url": "/tts", "headers": self.jwt,
+                    "json": {"text": self.args.tts_text, "language": "fr", "model": self.args.tts_model}}
+        if route == "chat":
+            return {"method": "POST", "url": "/v1/chat/completions", "headers": self.api_key,
+                    "json": {"model": self.args.model, "messages": random.choice(self.prompts),
+                             "max_tokens": self.args.max_tokens}}
+        if route == "voices":
+            return {"method": "GET", "url": "/voices", "headers": self.jwt}
+        return {"method": "POST", "url": "/voices", "headers": self.jwt,
+                "data": {"name": f"load_{uuid.uuid4().hex[:8]}"},
+                "files": {"file": ("sample.wav", self.upload_wav, "audio/wav")}}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            sys.exit(f"❌ Route inconnue dans --mix : {name} (attendu : {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    return float(np.percentile(values, q * 100))
+
+
+async def run_step(client, workload, mix, rate, duration, arrival, timeout):
+    """Un palier à débit fixe ; renvoie les statistiques par route."""
+    routes, weights = list(mix), list(mix.values())
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lag = []
+    tasks = []
+
+    async def fire(route, scheduled):
+        lag.append(time.perf_counter() - scheduled)
+        start = time.perf_counter()
+        try:
+            resp = await client.request(timeout=timeout, **workload.build(route))
+            await resp.aread()
+            status = str(resp.status_code)
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError as err:
+            status = type(err).__name__
+        latencies[route].append(time.perf_counter() - start)
+        statuses[route][status] += 1
+
+    start = time.perf_counter()
+    next_at = start
+    while next_at - start < duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route = random.choices(routes, weights)[0]
+        tasks.append(asyncio.create_task(fire(route, next_at)))
+        next_at += random.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    report = {"rate": rate, "sent": len(tasks), "elapsed_s": round(elapsed, 1),
+              "generator_lag_p99_ms": round((percentile(lag, 0.99) or 0) * 1000, 1), "routes": {}}
+    for route in routes:
+        values = latencies[route]
+        if not values:
+            continue
+        ok = sum(n for s, n in statuses[route].items() if s.startswith("2"))
+        report["routes"][route] = {
+            "count": len(values),
+            "error_rate": round(1 - ok / len(values), 4),
+            "statuses": dict(statuses[route]),
+            **{f"p{int(q * 100)}_ms": round(percentile(values, q) * 1000, 1) for q in (0.5, 0.95, 0.99)},
+            "throughput_rps": round(ok / elapsed, 2),
+        }
+    return report
+
+
+def print_step(step):
+    print(f"\n🚦 {step['rate']} req/s — {step['sent']} envoyées en {step['elapsed_s']}s "
+          f"(retard générateur p99 {step['generator_lag_p99_ms']} ms)")
+    print(f"   {'route':8} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'erreurs':>8} {'ok/s':>7}")
+    for route, r in step["routes"].items():
+        print(f"   {route:8} {r['count']:6d} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} {r['p99_ms']:9.1f} "
+              f"{r['error_rate']:8.1%} {r['throughput_rps']:7.2f}")
+
+
+async def main_async(args):
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        token = ""
+        if not args.no_login:
+            resp = await client.post("/auth/token", data={"username": args.username, "password": args.password})
+            if resp.status_code != 200:
+                sys.exit(f"❌ Authentification impossible ({resp.status_code}) : {resp.text[:200]}")
+            token = resp.json()["access_token"]
+        workload = Workload(args, token)
+        mix = parse_mix(args.mix)
+        steps = []
+        for rate in [float(r) for r in args.rates.split(",")]:
+            step = await run_step(client, workload, mix, rate, args.duration, args.arrival, args.timeout)
+            print_step(step)
+            steps.append(step)
+    if args.output:
+        Path(args.output).write_text(json.dumps({"args": vars(args), "steps": steps}, indent=2) + "\n")
+        print(f"\n✅ Résultats écrits dans {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge en boucle ouverte (Poisson ou constante)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rates", default="1", help="Débit(s) cible(s) en req/s, un palier par valeur")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée de chaque palier (s)")
+    parser.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    parser.add_argument("--mix", default="chat=3,tts=1,stt=1,voices=1", help="Poids par route")
+    parser.add_argument("--prompts", help="JSONL de prompts pour la route chat")
+    parser.add_argument("--model", default=os.getenv("MODEL_NAME", "mistral"))
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--stt-model", default="base")
+    parser.add_argument("--stt-seconds", type=float, default=5.0)
+    parser.add_argument("--tts-model", default="mms")
+    parser.add_argument("--tts-text", default="Bonjour, ceci est un test de charge du service de synthèse.")
+    parser.add_argument("--username", default=os.getenv("ADMIN_USERNAME", "admin"))
+    parser.add_argument("--password", default=os.getenv("ADMIN_PASSWORD", "changeme"))
+    parser.add_argument("--api-key", default=os.getenv("SECRET_KEY", "your-secret-key-here"))
+    parser.add_argument("--no-login", action="store_true", help="Ne pas demander de JWT (routes /v1 seulement)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks hors ligne (CPU) des chemins critiques du service.
+
+Chaque cas tourne dans un sous-process neuf : temps de chargement des
+modèles « à froid » et pic de RSS isolés. Audio synthétique, Ollama
+remplacé par un stub httpx (MockTransport) : aucun GPU ni réseau requis.
+Un cas dont les dépendances manquent (whisper, TTS…) est marqué `skipped`.
+
+Cas : base64, preprocess, voice_upload, stt, tts, llm_proxy, auth.
+
+Convention des métriques (sens de la comparaison) :
+• suffixes _ms, _us, _rtf, _rss_mb → plus petit = meilleur ;
+• suffixe _mb_s (débit)            → plus grand = meilleur.
+
+Usage :
+    python benchmarks/run.py --output bench.json [--cases stt,tts] [--repeat 5]
+    python benchmarks/run.py compare base.json bench.json [--threshold 0.10]
+"""
+
+import argparse
+import base64
+import importlib.util
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CASES = ("base64", "preprocess", "voice_upload", "stt", "tts", "llm_proxy", "auth")
+LOWER_IS_BETTER = ("_ms", "_us", "_rtf", "_rss_mb")
+HIGHER_IS_BETTER = ("_mb_s",)
+
+
+class Skipped(Exception):
+    """Dépendance absente : le cas n'est pas mesurable sur cette machine."""
+
+
+def require(*modules: str) -> None:
+    """Lève Skipped si un module n'est pas installé (les services l'importent au premier usage)."""
+    for name in modules:
+        if importlib.util.find_spec(name) is None:
+            raise Skipped(f"No module named '{name}'")
+
+
+# ---------------------------------------------------------------------------
+# Données synthétiques
+# ---------------------------------------------------------------------------
+
+def synthetic_speech(seconds: float, sample_rate: int = 16000, channels: int = 1, seed: int = 0) -> np.ndarray:
+    """Voyelles modulées + bruit léger : spectre proche de la parole, reproductible."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+    audio = (0.1 * voiced * envelope + rng.normal(0, 0.003, t.size)).astype(np.float32)
+    return np.stack([audio] * channels, axis=1) if channels > 1 else audio
+
+
+def wav_bytes(audio: np.ndarray, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    sf.write(buf, audio, sample_rate, format="WAV", subtype="PCM_16")
+    return buf.getvalue()
+
+
+def timed(fn, repeat: int, warmup: int = 1):
+    """Meilleur temps (s) sur *repeat* appels et dernier résultat.
+
+    *warmup* appels non mesurés d'abord (caches, imports paresseux, premières
+    allocations) ; 0 pour mesurer un chargement à froid.
+    """
+    for _ in range(warmup):
+        fn()
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_rss_mb() -> float:
+    """Pic de RSS du process (VmHWM, remis à zéro par exec contrairement à ru_maxrss)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# ---------------------------------------------------------------------------
+# Cas
+# ---------------------------------------------------------------------------
+
+def case_base64(repeat: int) -> dict:
+    import base64_stream
+
+    data = wav_bytes(synthetic_speech(60, 44100, 2), 44100)
+    encoded = base64.b64encode(data)
+    mb = len(data) / 1e6
+    enc, _ = timed(lambda: base64.b64encode(data), repeat)
+    dec, _ = timed(lambda: base64.b64decode(encoded), repeat)
+    stream_enc, _ = timed(lambda: base64_stream.encode_file(io.BytesIO(data), io.BytesIO(), wrap=True), repeat)
+    stream_dec, _ = timed(lambda: base64_stream.decode_file(io.BytesIO(encoded), io.BytesIO()), repeat)
+    return {"payload_mb": round(mb, 1), "encode_mb_s": round(mb / enc, 1), "decode_mb_s": round(mb / dec, 1),
+            "stream_encode_wrapped_mb_s": round(mb / stream_enc, 1), "stream_decode_mb_s": round(mb / stream_dec, 1)}
+
+
+def case_preprocess(repeat: int) -> dict:
+    require("torch", "torchaudio")
+    from stt_service import decode_audio
+
+    out = {}
+    for label, sr, ch in (("16k_mono", 16000, 1), ("44k_stereo", 44100, 2)):
+        data = wav_bytes(synthetic_speech(30, sr, ch), sr)
+        elapsed, _ = timed(lambda: decode_audio(data), repeat)
+        out[f"decode_30s_{label}_ms"] = round(elapsed * 1000, 2)
+    return out
+
+
+def case_voice_upload(repeat: int) -> dict:
+    os.environ["VOICES_DIR"] = tempfile.mkdtemp(prefix="bench_voices_")
+    import voice_service
+
+    data = wav_bytes(synthetic_speech(60, 48000, 2), 48000)
+    out = {}
+    for condition in (False, True):
+        n = iter(range(10 ** 6))
+        elapsed, _ = timed(
+            lambda: voice_service.save_voice_wav_stream(io.BytesIO(data), f"bench_{next(n)}", condition=condition),
+            repeat,
+        )
+        out[f"upload_60s_48k_{'conditioned' if condition else 'raw'}_ms"] = round(elapsed * 1000, 1)
+    return out
+
+
+def case_stt(repeat: int) -> dict:
+    require("torch", "whisper")
+    import asyncio
+
+    import stt_service
+
+    model = os.getenv("BENCH_WHISPER_MODEL", "tiny")
+    load, _ = timed(lambda: stt_service.get_whisper_model(model), 1, warmup=0)
+    seconds = 10.0
+    audio_b64 = base64.b64encode(wav_bytes(synthetic_speech(seconds), 16000)).decode()
+    elapsed, _ = timed(lambda: asyncio.run(stt_service.transcribe_audio(audio_b64, "fr", model)), repeat)
+    return {"model": model, "load_ms": round(load * 1000, 1), "transcribe_10s_ms": round(elapsed * 1000, 1),
+            "transcribe_rtf": round(elapsed / seconds, 3)}
+
+
+def case_tts(repeat: int) -> dict:
+    require("torch", "TTS")
+    import asyncio
+
+    import tts_service
+
+    model = os.getenv("BENCH_TTS_MODEL", "mms")
+    load, _ = timed(lambda: tts_service.get_tts(model), 1, warmup=0)
+    text = "Bonjour, ceci est une phrase de test pour mesurer la vitesse de synthèse vocale."
+    elapsed, result = timed(lambda: asyncio.run(tts_service.synthesize_text(text, "fr", model)), repeat)
+    return {"model": model, "load_ms": round(load * 1000, 1), "synthesize_ms": round(elapsed * 1000, 1),
+            "synthesize_rtf": round(elapsed / max(result.duration, 1e-6), 3)}
+
+
+def case_llm_proxy(repeat: int) -> dict:
+    """Surcoût du proxy Ollama (sérialisation, client HTTP, format OpenAI) avec un stub instantané."""
+    import asyncio
+
+    import httpx
+
+    import llm_service
+
+    answer = {"message": {"role": "assistant", "content": "Réponse " * 50}, "done": True}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if json.loads(request.content).get("stream"):
+            lines = "".join(json.dumps({"message": {"content": "mot "}, "done": False}) + "\n" for _ in range(100))
+            return httpx.Response(200, content=lines + json.dumps({"done": True}) + "\n")
+        return httpx.Response(200, json=answer)
+
+    messages = [llm_service.Message(role="user", content="Question " * 100)]
+    calls = 200 * repeat
+
+    async def run():
+        llm_service._HTTP_CLIENT = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        # Tour non mesuré : connexion du client, imports paresseux
+        await llm_service.get_ollama_response(messages, 0.7, 100)
+        async for _ in llm_service.stream_ollama_response(messages, 0.7, 100):
+            pass
+        start = time.perf_counter()
+        for _ in range(calls):
+            text = await llm_service.get_ollama_response(messages, 0.7, 100)
+            llm_service.openai_chat_completion("mistral", text)
+        chat = (time.perf_counter() - start) / calls
+        start = time.perf_counter()
+        for _ in range(calls // 10):
+            async for _ in llm_service.stream_ollama_response(messages, 0.7, 100):
+                pass
+        stream = (time.perf_counter() - start) / (calls // 10)
+        await llm_service.close_http_client()
+        return chat, stream
+
+    chat, stream = asyncio.run(run())
+    return {"chat_call_us": round(chat * 1e6, 1), "stream_100_tokens_us": round(stream * 1e6, 1)}
+
+
+def case_auth(repeat: int) -> dict:
+    from datetime import timedelta
+
+    import auth
+
+    auth.prepare_auth()
+    token = auth.create_access_token({"sub": os.getenv("ADMIN_USERNAME", "admin")}, timedelta(minutes=30))
+    n = 5000 * repeat
+
+    def per_call_us(fn):
+        fn()  # non mesuré
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return round((time.perf_counter() - start) / n * 1e6, 2)
+
+    def uncached():
+        auth._TOKEN_CACHE.clear()
+        auth.decode_access_token(token)
+
+    login, _ = timed(lambda: auth.authenticate_user(os.getenv("ADMIN_USERNAME", "admin"), "wrong"), 1)
+    return {
+        "login_ms": round(login * 1000, 1),
+        "jwt_decode_us": per_call_us(uncached),
+        "jwt_cached_us": per_call_us(lambda: auth.decode_access_token(token)),
+        "api_key_us": per_call_us(lambda: auth.check_api_key(f"Bearer {auth.SECRET_KEY}", None)),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Exécution et comparaison
+# ---------------------------------------------------------------------------
+
+def run_case(name: str, repeat: int) -> dict:
+    """Exécute un cas dans le process courant (mode --only)."""
+    try:
+        result = globals()[f"case_{name}"](repeat)
+        result["peak_rss_mb"] = peak_rss_mb()
+        return {"status": "ok", **result}
+    except Skipped as err:
+        return {"status": "skipped", "reason": err.args[0] if err.args else ""}
+    except Exception as err:
+        return {"status": "error", "reason": f"{type(err).__name__}: {err}"}
+
+
+def run_suite(cases, repeat: int) -> dict:
+    results = {}
+    for name in cases:
+        print(f"⏱️  {name}…", file=sys.stderr)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--only", name, "--repeat", str(repeat)],
+            capture_output=True, text=True, cwd=ROOT,
+        )
+        try:
+            results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            results[name] = {"status": "error", "reason": (proc.stderr or "sortie vide").strip()[-500:]}
+        print(f"   {results[name]}", file=sys.stderr)
+    return results
+
+
+def metadata() -> dict:
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        meta["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT
+        ).stdout.strip()
+    except OSError:
+        pass
+    try:
+        import torch
+        meta["torch"] = torch.__version__
+        meta["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return meta
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    """Affiche les écarts métrique par métrique ; code retour 1 si régression."""
+    base = json.loads(Path(base_path).read_text())["results"]
+    new = json.loads(Path(new_path).read_text())["results"]
+    regressions = 0
+    for case in sorted(set(base) | set(new)):
+        b, n = base.get(case, {}), new.get(case, {})
+        if b.get("status") != "ok" or n.get("status") != "ok":
+            print(f"{case:14} {b.get('status', '-')} -> {n.get('status', '-')}")
+            continue
+        for metric in sorted(set(b) & set(n)):
+            old, cur = b[metric], n[metric]
+            if not isinstance(old, (int, float)) or not isinstance(cur, (int, float)) or not old:
+                continue
+            change = (cur - old) / abs(old)
+            if metric.endswith(HIGHER_IS_BETTER):
+                worse = change < -threshold
+            elif metric.endswith(LOWER_IS_BETTER):
+                worse = change > threshold
+            else:
+                worse = False
+            regressions += worse
+            flag = "❌ régression" if worse else ""
+            print(f"{case:14} {metric:32} {old:>12} -> {cur:>12} ({change:+.1%}) {flag}")
+    print(f"\n{'❌' if regressions else '✅'} {regressions} régression(s) au-delà de {threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        parser = argparse.ArgumentParser(description="Compare deux résultats de benchmark")
+        parser.add_argument("base")
+        parser.add_argument("new")
+        parser.add_argument("--threshold", type=float, default=0.10, help="Écart toléré (0.10 = 10 %%)")
+        args = parser.parse_args(sys.argv[2:])
+        sys.exit(compare(args.base, args.new, args.threshold))
+
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne des chemins critiques")
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut : stdout)")
+    parser.add_argument("--cases", default=",".join(CASES), help="Cas à exécuter, séparés par des virgules")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions par mesure (meilleur temps retenu)")
+    parser.add_argument("--only", choices=CASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.only:
+        print(json.dumps(run_case(args.only, args.repeat)))
+        return
+
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"cas inconnus : {', '.join(sorted(unknown))}")
+    report = {"meta": metadata(), "results": run_suite(cases, args.repeat)}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"✅ Résultats écrits dans {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Catalogue des modèles servi depuis la mémoire.
+
+La liste des modèles Ollama (`/api/tags`) est rafraîchie en tâche de fond toutes
+les CATALOG_REFRESH_SECONDS. Les routes `/api/tags` et `/v1/models` lisent
+uniquement le cache. Si la boucle a pris du retard ou échoue (données plus
+vieilles que CATALOG_STALE_SECONDS, par défaut deux périodes), la réponse
+périmée est renvoyée immédiatement et un rafraîchissement est déclenché en
+arrière-plan (stale-while-revalidate). Seul le tout premier appel, avant tout
+chargement réussi, attend Ollama.
+
+Le catalogue OpenAI inclut aussi les modèles TTS/STT chargeables localement.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from llm_service import get_http_client, ollama_base
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+# 0 : deux périodes de rafraîchissement
+CATALOG_STALE_SECONDS = float(os.getenv("CATALOG_STALE_SECONDS", "0"))
+
+
+class ModelCatalog:
+    """Cache des modèles Ollama + modèles locaux (TTS/STT)."""
+
+    def __init__(self, local_models: List[Dict[str, Any]], refresh_interval: float = CATALOG_REFRESH_SECONDS,
+                 stale_after: float = CATALOG_STALE_SECONDS):
+        self.local_models = local_models
+        self.refresh_interval = refresh_interval
+        # Au-delà de la période de la boucle (qui dure période + requête) : sinon
+        # chaque fin de période déclencherait un rafraîchissement en double
+        self.stale_after = max(stale_after, refresh_interval) if stale_after else 2 * refresh_interval
+        self._tags: Optional[Dict[str, Any]] = None
+        self._openai: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self._fetched_at if self._tags is not None else float("inf")
+
+    async def _fetch(self) -> None:
+        try:
+            resp = await get_http_client().get(f"{ollama_base()}/api/tags", timeout=10.0)
+            resp.raise_for_status()
+            tags = resp.json()
+        except httpx.HTTPError as err:
+            self.last_error = str(err)
+            print(f"[CATALOG] Échec du rafraîchissement Ollama : {err}")
+            raise
+        self._tags = tags
+        self._openai = self._build_openai(tags)
+        self._fetched_at = time.monotonic()
+        self.last_error = None
+
+    def refresh(self) -> asyncio.Task:
+        """Lance un rafraîchissement (un seul à la fois) et renvoie la tâche."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._fetch())
+            # Évite l'avertissement « exception never retrieved » en tâche de fond
+            self._inflight.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._inflight
+
+    async def run(self) -> None:
+        """Boucle de rafraîchissement périodique (lancée au démarrage)."""
+        while True:
+            try:
+                await self.refresh()
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _ensure_loaded(self) -> None:
+        if self._tags is None:
+            # Démarrage à froid : on attend le premier chargement. shield : une
+            # requête annulée (client parti) n'annule pas la tâche partagée
+            await asyncio.shield(self.refresh())
+        elif self.age > self.stale_after:
+            # Données périmées : on sert le cache et on revalide en arrière-plan
+            self.refresh()
+
+    async def ollama_tags(self) -> Dict[str, Any]:
+        """Réponse au format Ollama `/api/tags`."""
+        await self._ensure_loaded()
+        return self._tags
+
+    async def openai_models(self) -> Dict[str, Any]:
+        """Réponse au format OpenAI `/v1/models`.
+
+        Si Ollama n'a jamais répondu, on annonce au moins MODEL_NAME pour que
+        le test de connexion des clients (n8n) passe."""
+        try:
+            await self._ensure_loaded()
+        except httpx.HTTPError:
+            return self._build_openai({"models": [{"name": os.getenv("MODEL_NAME", "mistral")}]})
+        return self._openai
+
+    def _build_openai(self, tags: Dict[str, Any]) -> Dict[str, Any]:
+        now = int(datetime.utcnow().timestamp())
+        data = []
+        for m in tags.get("models", []):
+            created = now
+            modified = m.get("modified_at")
+            if modified:
+                try:
+                    created = int(datetime.fromisoformat(modified[:19]).timestamp())
+                except ValueError:
+                    pass
+            data.append({
+                "id": m.get("name") or m.get("model"),
+                "object": "model",
+                "created": created,
+                "owned_by": "runpod-local",
+            })
+        for m in self.local_models:
+            data.append({"object": "model", "created": now, **m})
+        return {"data": data, "object": "list"}
@@ -0,0 +1,258 @@
+"""Fenêtre de contexte des requêtes chat : budget de tokens du prompt.
+
+Les clients (agents n8n notamment) renvoient tout l'historique à chaque
+appel. Sans limite, l'évaluation du prompt domine la latence, puis Ollama
+tronque silencieusement le début du contexte (message système compris) au
+delà de `num_ctx`. Avant chaque appel `/api/chat`, les messages sont donc
+ramenés sous un budget de tokens :
+
+• le ou les messages système de tête et le dernier message sont toujours
+  conservés ;
+• les tours les plus récents sont gardés tant qu'ils tiennent dans le
+  budget ;
+• les tours plus anciens sont compactés (LLM_CONTEXT_STRATEGY=compact) :
+  un extrait du début de chacun, du plus récent au plus ancien, dans un
+  message système unique, tant qu'il reste du budget ; sinon retirés
+  (LLM_CONTEXT_STRATEGY=drop). En mode compact, la place d'un extrait
+  (LLM_COMPACT_TOKENS et l'en-tête) est réservée avant de garder les tours
+  récents.
+
+Les tokens sont comptés avec le tokenizer Hugging Face du modèle
+(`transformers`, fichiers du tokenizer seulement), choisi d'après le nom du
+modèle Ollama (LLM_TOKENIZERS). Les dépôts par défaut (Mistral, Llama 3)
+sont restreints : sans HF_TOKEN, seul le cache local est consulté, sans
+requête vers le Hub. Tokenizer indisponible : estimation par longueur de
+texte, signalée une fois. Les comptes sont mis en cache par contenu : un historique renvoyé à
+chaque tour n'est tokenisé qu'une fois. Un historique dont la taille en
+octets tient déjà dans le budget n'est pas tokenisé du tout (un token
+couvre au moins un octet).
+
+Tokens économisés : llm_context_tokens_saved_total{model}, attributs de
+l'étape de trace `llm.context` et log `[CTX]`.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from prometheus_client import Counter
+
+from metrics_service import lazy_import
+from tracing_service import span
+
+# Fenêtre de contexte d'Ollama (num_ctx / OLLAMA_CONTEXT_LENGTH)
+LLM_CONTEXT_WINDOW = int(os.getenv("LLM_CONTEXT_WINDOW", "4096"))
+# Budget du prompt ; 0 : fenêtre moins les tokens de réponse demandés
+LLM_PROMPT_BUDGET = int(os.getenv("LLM_PROMPT_BUDGET", "0"))
+# compact | drop | off
+LLM_CONTEXT_STRATEGY = os.getenv("LLM_CONTEXT_STRATEGY", "compact")
+# Tokens conservés par tour compacté
+LLM_COMPACT_TOKENS = int(os.getenv("LLM_COMPACT_TOKENS", "48"))
+# Tokenizer par préfixe de nom de modèle Ollama, puis tokenizer par défaut
+LLM_TOKENIZERS = os.getenv(
+    "LLM_TOKENIZERS",
+    "mixtral=mistralai/Mixtral-8x7B-Instruct-v0.1,mistral=mistralai/Mistral-7B-Instruct-v0.2,"
+    "llama3=meta-llama/Meta-Llama-3-8B-Instruct,qwen2=Qwen/Qwen2-7B-Instruct",
+)
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "mistralai/Mistral-7B-Instruct-v0.2")
+LLM_TOKEN_CACHE_SIZE = int(os.getenv("LLM_TOKEN_CACHE_SIZE", "8192"))
+
+# Tokens du gabarit de chat par message ([INST], rôle, fin de tour…)
+_MESSAGE_OVERHEAD = 4
+# Estimation sans tokenizer (texte français, tokenizers BPE/SentencePiece)
+_CHARS_PER_TOKEN = 3.5
+_COMPACT_HEADER = "Échanges antérieurs de la conversation (extraits) :"
+# Tokens d'une ligne d'extrait en plus de l'extrait (« - assistant : », « … », fin de ligne)
+_COMPACT_LINE_OVERHEAD = 8
+
+TOKENS_SAVED = Counter(
+    "llm_context_tokens_saved", "Tokens de prompt retirés par le budget de contexte", ["model"]
+)
+CONTEXT_TRIMMED = Counter(
+    "llm_context_trimmed", "Requêtes chat ramenées sous le budget de contexte", ["model", "strategy"]
+)
+
+
+@dataclass
+class ContextReport:
+    model: str
+    budget: int
+    tokens_in: int        # prompt reçu (borne en octets si non tokenisé)
+    tokens_out: int       # prompt envoyé à Ollama
+    dropped: int = 0      # tours retirés
+    compacted: int = 0    # tours réduits à un extrait
+    counted: bool = True  # False : historique sous le budget, non tokenisé
+    exact: bool = True    # False : estimation sans tokenizer
+
+    @property
+    def saved(self) -> int:
+        return self.tokens_in - self.tokens_out
+
+
+def _tokenizer_table() -> List[Tuple[str, str]]:
+    table = []
+    for item in filter(None, (v.strip() for v in LLM_TOKENIZERS.split(","))):
+        prefix, _, repo = item.partition("=")
+        table.append((prefix.strip(), repo.strip()))
+    # Préfixe le plus long d'abord (mixtral avant mistral)
+    return sorted(table, key=lambda p: -len(p[0]))
+
+
+class ContextManager:
+    """Ramène les messages d'une requête chat sous le budget de tokens."""
+
+    def __init__(self, window: int = LLM_CONTEXT_WINDOW, budget: int = LLM_PROMPT_BUDGET,
+                 strategy: str = LLM_CONTEXT_STRATEGY, compact_tokens: int = LLM_COMPACT_TOKENS,
+                 cache_size: int = LLM_TOKEN_CACHE_SIZE):
+        if strategy not in ("compact", "drop", "off"):
+            raise ValueError(f"LLM_CONTEXT_STRATEGY inconnue : {strategy} (compact, drop ou off)")
+        self.window = window
+        self.budget = budget
+        self.strategy = strategy
+        self.compact_tokens = compact_tokens
+        self.cache_size = cache_size
+        self._table = _tokenizer_table()
+        self._tokenizers: Dict[str, object] = {}   # dépôt → tokenizer (None : indisponible)
+        self._load_lock = threading.Lock()
+        self._counts: "OrderedDict[Tuple[str, bytes], int]" = OrderedDict()
+        self._counts_lock = threading.Lock()
+
+    # --- tokenizer ---
+
+    def tokenizer_name(self, model: str) -> str:
+        base = model.split("/")[-1].lower()
+        for prefix, repo in self._table:
+            if base.startswith(prefix):
+                return repo
+        return LLM_TOKENIZER
+
+    def tokenizer(self, repo: str):
+        """Tokenizer du dépôt *repo* (chargé une fois ; None s'il est indisponible)."""
+        if repo in self._tokenizers:
+            return self._tokenizers[repo]
+        with self._load_lock:
+            if repo not in self._tokenizers:
+                try:
+                    auto = lazy_import("transformers").AutoTokenizer
+                    # Sans jeton, un dépôt restreint échoue après un aller-retour au Hub
+                    local_only = not (os.getenv("HF_TOKEN") or os.getenv("HUGGING_FACE_HUB_TOKEN"))
+                    self._tokenizers[repo] = auto.from_pretrained(repo, local_files_only=local_only)
+                    print(f"[CTX] Tokenizer {repo} chargé")
+                except Exception as err:
+                    self._tokenizers[repo] = None
+                    print(f"[CTX] Tokenizer {repo} indisponible ({err}) : estimation par longueur de texte")
+        return self._tokenizers[repo]
+
+    def count(self, repo: str, text: str) -> int:
+        key = repo, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._counts_lock:
+            cached = self._counts.get(key)
+            if cached is not None:
+                self._counts.move_to_end(key)
+                return cached
+        tok = self.tokenizer(repo)
+        if tok is None:
+            n = int(len(text) / _CHARS_PER_TOKEN) + 1
+        else:
+            n = len(tok.encode(text, add_special_tokens=False))
+        with self._counts_lock:
+            self._counts[key] = n
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return n
+
+    def excerpt(self, repo: str, text: str, tokens: int) -> str:
+        """Début de *text* limité à *tokens* tokens."""
+        tok = self.tokenizer(repo)
+        if tok is None:
+            limit = int(tokens * _CHARS_PER_TOKEN)
+            return text if len(text) <= limit else text[:limit].rstrip() + "…"
+        ids = tok.encode(text, add_special_tokens=False)
+        if len(ids) <= tokens:
+            return text
+        return tok.decode(ids[:tokens], skip_special_tokens=True).rstrip() + "…"
+
+    # --- budget ---
+
+    def prompt_budget(self, max_tokens: Optional[int]) -> int:
+        if self.budget > 0:
+            return self.budget
+        # Réponse comprise dans la fenêtre ; au moins un quart de fenêtre pour le prompt
+        return max(self.window - (max_tokens or 0), self.window // 4)
+
+    def fit(self, messages: list, model: str, max_tokens: Optional[int] = None) -> Tuple[list, Optional[ContextReport]]:
+        """Messages à envoyer (mêmes objets, ordre conservé) et rapport (None si inactif).
+
+        Bloquant (tokenisation, premier chargement du tokenizer) : à appeler
+        hors de la boucle asyncio.
+        """
+        if self.strategy == "off" or len(messages) < 2:
+            return messages, None
+        budget = self.prompt_budget(max_tokens)
+        upper = sum(len(m.content.encode("utf-8")) + _MESSAGE_OVERHEAD for m in messages)
+        if upper <= budget:
+            return messages, ContextReport(model, budget, upper, upper, counted=False)
+
+        with span("llm.context", model=model) as current:
+            repo = self.tokenizer_name(model)
+            sizes = [self.count(repo, m.content) + _MESSAGE_OVERHEAD for m in messages]
+            total = sum(sizes)
+            report = ContextReport(model, budget, total, total, exact=self.tokenizer(repo) is not None)
+            if total <= budget:
+                return messages, report
+
+            head = 0
+            while head < len(messages) - 1 and messages[head].role == "system":
+                head += 1
+            # Toujours envoyés : système de tête + dernier message
+            used = sum(sizes[:head]) + sizes[-1]
+            # compact : place réservée à l'en-tête et à l'extrait du tour le plus
+            # récent parmi les anciens, sinon les tours récents prennent tout
+            reserve = 0
+            if self.strategy == "compact":
+                reserve = (_MESSAGE_OVERHEAD + self.count(repo, _COMPACT_HEADER)
+                           + self.compact_tokens + _COMPACT_LINE_OVERHEAD)
+            start = len(messages) - 1
+            while start > head and used + sizes[start - 1] <= budget - reserve:
+                start -= 1
+                used += sizes[start]
+            # L'historique conservé ne commence pas par une réponse orpheline
+            while start < len(messages) - 1 and messages[start].role not in ("user", "system"):
+                used -= sizes[start]
+                start += 1
+            older = messages[head:start]
+
+            notes = []
+            if self.strategy == "compact" and older:
+                used += _MESSAGE_OVERHEAD + self.count(repo, _COMPACT_HEADER)
+                for message in reversed(older):
+                    line = f"- {message.role} : {self.excerpt(repo, message.content, self.compact_tokens)}"
+                    cost = self.count(repo, line) + 1
+                    if used + cost > budget:
+                        break
+                    notes.append(line)
+                    used += cost
+                if not notes:
+                    used -= _MESSAGE_OVERHEAD + self.count(repo, _COMPACT_HEADER)
+
+            kept = list(messages[:head])
+            if notes:
+                kept.append(type(messages[0])(role="system", content="\n".join([_COMPACT_HEADER, *reversed(notes)])))
+            kept += messages[start:]
+
+            report.tokens_out = used
+            report.compacted = len(notes)
+            report.dropped = len(older) - len(notes)
+            if current is not None:
+                current.attributes.update(tokens_in=report.tokens_in, tokens_out=report.tokens_out,
+                                          dropped=report.dropped, compacted=report.compacted)
+        TOKENS_SAVED.labels(model).inc(report.saved)
+        CONTEXT_TRIMMED.labels(model, self.strategy).inc()
+        print(f"[CTX] {model} : {report.tokens_in} → {report.tokens_out} tokens (budget {budget}, "
+              f"{report.dropped} tour(s) retiré(s), {report.compacted} compacté(s))")
+        return kept, report
+
+# Instance unique utilisée par l'application
+context_manager = ContextManager()
@@ -0,0 +1,197 @@
+"""Budget de cœurs CPU pour l'inférence (Whisper, Coqui TTS, torchaudio).
+
+Par défaut torch utilise autant de threads intra-op que de cœurs : une
+transcription et une synthèse simultanées se disputent alors tous les cœurs
+et le débit total baisse quand la concurrence augmente.
+
+Le budget (CPU_BUDGET cœurs, défaut : cœurs alloués au process) est réparti
+entre des créneaux d'inférence par famille de modèles (CPU_SLOTS, format
+`stt:1,tts:1`). Chaque créneau est un thread dédié, créé au premier usage :
+• torch.set_num_threads(part du créneau) dans ce thread, après
+  l'initialisation de ses threads torch : l'équipe OpenMP du thread garde
+  cette taille. La valeur par défaut du process (global torch, reprise par
+  les threads sans créneau, et le nombre de threads MKL) reste celle du
+  dernier créneau initialisé ;
+• avec CPU_PIN=1, affinité du thread sur des cœurs disjoints, héritée par
+  l'équipe OpenMP qu'il crée ensuite ;
+• torch.set_num_interop_threads(CPU_INTEROP_THREADS), une fois par process.
+Un appel part sur le créneau le moins chargé de sa famille et attend son
+tour si tous sont occupés. Une famille absente de CPU_SLOTS, ou
+CPU_BUDGET_ENABLED=0, retombe sur asyncio.to_thread.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics_service import lazy_import
+
+CPU_BUDGET_ENABLED = os.getenv("CPU_BUDGET_ENABLED", "1") == "1"
+CPU_BUDGET = int(os.getenv("CPU_BUDGET", "0"))  # 0 : tous les cœurs alloués au process
+CPU_SLOTS = os.getenv("CPU_SLOTS", "stt:1,tts:1")
+CPU_PIN = os.getenv("CPU_PIN", "0") == "1"
+CPU_INTEROP_THREADS = int(os.getenv("CPU_INTEROP_THREADS", "1"))
+
+
+def parse_slots(value: str) -> Dict[str, int]:
+    """`stt:2,tts:1` → {"stt": 2, "tts": 1}."""
+    slots = {}
+    for item in filter(None, (v.strip() for v in value.split(","))):
+        family, _, count = item.partition(":")
+        slots[family.strip()] = max(1, int(count or 1))
+    return slots
+
+
+def available_cores() -> List[int]:
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # hors Linux
+        return list(range(os.cpu_count() or 1))
+
+
+class Slot:
+    """Un créneau d'inférence : un thread, *threads* threads torch, des cœurs."""
+
+    def __init__(self, family: str, index: int, threads: int, cores: List[int], pin: bool):
+        self.family = family
+        self.index = index
+        self.threads = threads
+        self.cores = cores
+        self.pin = pin
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.family}#{self.index}"
+
+    def _init_thread(self) -> None:
+        if self.pin and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.cores)  # 0 : le thread appelant (Linux)
+        torch = lazy_import("torch")
+        # Le nombre de threads torch est global : au premier calcul d'un thread,
+        # at::init_num_threads relit la valeur du process, réglée par le
+        # dernier créneau initialisé. get_num_threads force cette
+        # initialisation maintenant, set_num_threads fixe ensuite la part du
+        # créneau pour ce thread (OpenMP), qu'un autre créneau ne modifie plus.
+        torch.get_num_threads()
+        torch.set_num_threads(self.threads)
+
+    def executor(self) -> ThreadPoolExecutor:
+        # Jamais créé avant un fork (serve.py) : le thread n'existe qu'au premier appel
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix=f"cpu-{self.name}",
+                                                initializer=self._init_thread)
+        return self._executor
+
+    def describe(self) -> Dict[str, Any]:
+        return {"slot": self.name, "threads": self.threads, "cores": self.cores if self.pin else None,
+                "pending": self.pending}
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class CPUBudget:
+    """Répartition du budget de cœurs entre les créneaux de chaque famille."""
+
+    def __init__(self, budget: int = CPU_BUDGET, slots: Optional[Dict[str, int]] = None,
+                 pin: bool = CPU_PIN, interop_threads: int = CPU_INTEROP_THREADS,
+                 enabled: bool = CPU_BUDGET_ENABLED):
+        self.enabled = enabled
+        self.pin = pin
+        self.interop_threads = interop_threads
+        self.slot_counts = parse_slots(CPU_SLOTS) if slots is None else slots
+        self._lock = threading.Lock()
+        self._interop_set = False
+        self.slots: Dict[str, List[Slot]] = {}
+        self.configure(budget)
+
+    def configure(self, budget: int = 0, cores: Optional[List[int]] = None) -> None:
+        """(Re)calcule le plan : *budget* cœurs (0 : tous), pris dans *cores*.
+
+        serve.py l'appelle dans chaque worker avec sa part des cœurs ; les
+        threads déjà créés sont arrêtés et recréés au prochain appel.
+        """
+        cores = cores or available_cores()
+        budget = min(budget or len(cores), len(cores))
+        cores = cores[:budget]
+        total = sum(self.slot_counts.values())
+        with self._lock:
+            for slot in (s for family in self.slots.values() for s in family):
+                slot.shutdown()
+            self.budget = budget
+            self.slots = {}
+            if not total:
+                return
+            share, extra = divmod(budget, total)
+            offset = 0
+            position = 0
+            for family, count in self.slot_counts.items():
+                self.slots[family] = []
+                for index in range(count):
+                    threads = max(1, share + (1 if position < extra else 0))
+                    # Budget < nombre de créneaux : les créneaux se partagent les cœurs
+                    slot_cores = [cores[(offset + i) % len(cores)] for i in range(threads)]
+                    self.slots[family].append(Slot(family, index, threads, slot_cores, self.pin))
+                    offset += threads
+                    position += 1
+
+    def plan(self) -> List[Dict[str, Any]]:
+        return [slot.describe() for family in self.slots.values() for slot in family]
+
+    def _pick(self, family: str) -> Optional[Slot]:
+        slots = self.slots.get(family) if self.enabled else None
+        if not slots:
+            return None
+        with self._lock:
+            slot = min(slots, key=lambda s: s.pending)
+            slot.pending += 1
+        return slot
+
+    def _release(self, slot: Slot) -> None:
+        with self._lock:
+            slot.pending -= 1
+
+    def _set_interop(self) -> None:
+        # Possible une seule fois, avant tout travail inter-op dans le process
+        if self._interop_set or not self.interop_threads:
+            return
+        self._interop_set = True
+        try:
+            lazy_import("torch").set_num_interop_threads(self.interop_threads)
+        except RuntimeError:
+            pass
+
+    def run_sync(self, family: str, fn: Callable, *args) -> Any:
+        """Exécute *fn* sur un créneau de *family* et attend le résultat (appel bloquant)."""
+        slot = self._pick(family)
+        if slot is None:
+            return fn(*args)
+        try:
+            self._set_interop()
+            ctx = contextvars.copy_context()
+            return slot.executor().submit(ctx.run, fn, *args).result()
+        finally:
+            self._release(slot)
+
+    async def run(self, family: str, fn: Callable, *args) -> Any:
+        """Équivalent d'asyncio.to_thread sur un créneau de *family*."""
+        slot = self._pick(family)
+        if slot is None:
+            return await asyncio.to_thread(fn, *args)
+        try:
+            self._set_interop()
+            # Comme asyncio.to_thread : le contexte (trace en cours) suit l'appel
+            ctx = contextvars.copy_context()
+            return await asyncio.wrap_future(slot.executor().submit(ctx.run, fn, *args))
+        finally:
+            self._release(slot)
+
+
+# Instance unique utilisée par l'application
+cpu_budget = CPUBudget()
@@ -0,0 +1,175 @@
+"""Embeddings via Ollama avec regroupement des requêtes et cache LRU.
+
+Les textes demandés en même temps (dans une fenêtre de EMBED_BATCH_WINDOW_MS)
+par des requêtes différentes sont regroupés en un seul appel `/api/embed`
+(jusqu'à EMBED_MAX_BATCH textes). Les vecteurs sont mis en cache par
+(modèle, SHA-256 du texte) et un même texte déjà en cours de calcul n'est
+demandé qu'une fois.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from llm_service import OLLAMA_KEEP_ALIVE, get_http_client, ollama_base
+from tracing_service import span
+
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "nomic-embed-text")
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+
+_Key = Tuple[str, bytes]
+
+
+def _key(model: str, text: str) -> _Key:
+    return model, hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def encode_embedding(vector: np.ndarray, encoding_format: str = "float"):
+    """Format OpenAI : liste de floats ou base64 des float32 little-endian."""
+    if encoding_format == "base64":
+        return base64.b64encode(vector.astype("<f4", copy=False).tobytes()).decode()
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """Cache LRU borné de vecteurs float32."""
+
+    def __init__(self, max_items: int = EMBED_CACHE_SIZE):
+        self.max_items = max_items
+        self._items: "OrderedDict[_Key, np.ndarray]" = OrderedDict()
+
+    def get(self, key: _Key):
+        vec = self._items.get(key)
+        if vec is not None:
+            self._items.move_to_end(key)
+        return vec
+
+    def put(self, key: _Key, vec: np.ndarray) -> None:
+        self._items[key] = vec
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+class EmbeddingBatcher:
+    def __init__(self, cache: EmbeddingCache, window_ms: float = EMBED_BATCH_WINDOW_MS,
+                 max_batch: int = EMBED_MAX_BATCH):
+        self.cache = cache
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: Dict[str, List[Tuple[_Key, str]]] = {}
+        self._inflight: Dict[_Key, asyncio.Future] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+
+    async def embed(self, model: str, texts: List[str]) -> List[np.ndarray]:
+        """Renvoie un vecteur par texte (cache, requêtes en vol ou nouvel appel groupé)."""
+        loop = asyncio.get_running_loop()
+        waits = []
+        for text in texts:
+            key = _key(model, text)
+            vec = self.cache.get(key)
+            if vec is not None:
+                waits.append(vec)
+                continue
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = loop.create_future()
+                self._inflight[key] = fut
+                queue = self._pending.setdefault(model, [])
+                queue.append((key, text))
+                if len(queue) >= self.max_batch:
+                    self._flush(model)
+                elif model not in self._timers:
+                    self._timers[model] = loop.call_later(self.window, self._flush, model)
+            waits.append(fut)
+        # gather : l'exception de chaque appel est récupérée, même si un autre
+        # échoue avant ; shield : annuler cette requête n'annule pas un appel
+        # en vol partagé avec d'autres requêtes
+        futures = [w for w in waits if isinstance(w, asyncio.Future)]
+        results = iter(await asyncio.gather(*(asyncio.shield(f) for f in futures)))
+        return [next(results) if isinstance(w, asyncio.Future) else w for w in waits]
+
+    def _flush(self, model: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer:
+            timer.cancel()
+        queue = self._pending.pop(model, [])
+        for start in range(0, len(queue), self.max_batch):
+            asyncio.create_task(self._call_backend(model, queue[start:start + self.max_batch]))
+
+    async def _call_backend(self, model: str, batch: List[Tuple[_Key, str]]) -> None:
+        try:
+            with span("ollama.embed", model=model, batch=len(batch)):
+                vectors = await _ollama_embed(model, [text for _, text in batch])
+            if len(vectors) != len(batch):
+                raise ValueError("Nombre d'embeddings inattendu renvoyé par Ollama")
+        except Exception as err:
+            for key, _ in batch:
+                fut = self._inflight.pop(key, None)
+                if fut and not fut.done():
+                    fut.set_exception(err)
+            return
+        for (key, _), vec in zip(batch, vectors):
+            self.cache.put(key, vec)
+            fut = self._inflight.pop(key, None)
+            if fut and not fut.done():
+                fut.set_result(vec)
+
+
+async def _ollama_embed(model: str, texts: List[str]) -> List[np.ndarray]:
+    """Un seul aller-retour `/api/embed` pour tout le lot (Ollama >= 0.3).
+
+    Les versions plus anciennes n'ont que `/api/embeddings` (un texte par appel)."""
+    client = get_http_client()
+    resp = await client.post(
+        f"{ollama_base()}/api/embed",
+        json={"model": model, "input": texts, "keep_alive": OLLAMA_KEEP_ALIVE},
+        timeout=60.0,
+    )
+    if resp.status_code == 404 and "model" not in resp.text.lower():
+        vectors = []
+        for text in texts:
+            legacy = await client.post(
+                f"{ollama_base()}/api/embeddings",
+                json={"model": model, "prompt": text, "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=60.0,
+            )
+            legacy.raise_for_status()
+            vectors.append(np.asarray(legacy.json()["embedding"], dtype=np.float32))
+        return vectors
+    resp.raise_for_status()
+    return [np.asarray(v, dtype=np.float32) for v in resp.json()["embeddings"]]
+
+
+# Instance unique utilisée par l'application
+embedding_batcher = EmbeddingBatcher(EmbeddingCache())
+
+
+async def create_embeddings(payload: dict) -> dict:
+    """Traite une requête `/v1/embeddings` au format OpenAI."""
+    inputs = payload.get("input")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    if not isinstance(inputs, list) or not inputs or not all(isinstance(t, str) for t in inputs):
+        raise ValueError("'input' doit être une chaîne ou une liste de chaînes non vide")
+    encoding_format = payload.get("encoding_format") or "float"
+    if encoding_format not in ("float", "base64"):
+        raise ValueError("'encoding_format' doit valoir 'float' ou 'base64'")
+    model = payload.get("model") or EMBED_MODEL_NAME
+
+    vectors = await embedding_batcher.embed(model, inputs)
+    return {
+        "object": "list",
+        "model": model,
+        "data": [
+            {"object": "embedding", "index": i, "embedding": encode_embedding(vec, encoding_format)}
+            for i, vec in enumerate(vectors)
+        ],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
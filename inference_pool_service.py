@@ -0,0 +1,505 @@
+"""Process d'inférence dédiés : Whisper et Coqui TTS hors du process API.
+
+Dans le process API, le décodage Whisper et le traitement de texte Coqui
+(code Python) se disputent le GIL avec la boucle asyncio et entre eux, même
+sur des créneaux CPU distincts. Avec INFERENCE_PROCESSES=1, chaque créneau
+de cpu_budget_service (CPU_SLOTS, ex. `stt:2,tts:1`) devient un process
+worker de longue durée qui possède ses modèles :
+
+• démarrage par `spawn` (aucun état hérité de la boucle ni des threads du
+  parent), threads torch et cœurs du créneau, modèles de PRELOAD_WHISPER_MODELS
+  / PRELOAD_TTS_MODEL chargés avant la première requête ;
+• transport : les appels sont picklés, mais les tableaux numpy et les
+  `bytes` d'au moins INFERENCE_SHM_MIN_BYTES passent par des blocs
+  `multiprocessing.shared_memory` (une copie dans le bloc, lu sur place par
+  le worker ; la sortie est recopiée une fois puis le bloc libéré) ;
+• routage : le worker de la famille le moins chargé, en préférant ceux qui
+  ont déjà le modèle demandé (charger un modèle compte comme
+  INFERENCE_LOAD_PENALTY requêtes en attente) ;
+• supervision : un worker mort (plantage, OOM killer) est relancé, par la
+  requête suivante ou par la vérification périodique
+  (INFERENCE_HEALTH_INTERVAL) ; un appel plus long que INFERENCE_TIMEOUT
+  tue le worker ; recyclage après INFERENCE_WORKER_MAX_REQUESTS requêtes ou
+  au-delà de INFERENCE_WORKER_MAX_RSS_MB, avec rechargement des mêmes
+  modèles ;
+• observabilité : les étapes mesurées dans le worker (stage, acquire) et
+  les RTF sont rejouées dans la trace et les métriques du process API.
+
+Les fonctions exécutées doivent être définies au niveau d'un module
+(picklées par nom). Famille non servie ou INFERENCE_PROCESSES=0 : repli sur
+cpu_budget.run, dans le process API.
+"""
+import asyncio
+import contextvars
+import importlib
+import io
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import psutil
+from prometheus_client import Counter, Gauge
+
+from cpu_budget_service import CPUBudget, cpu_budget
+from metrics_service import STAGE_SECONDS, capture_rtf, lazy_import, observe_rtf, stage
+from tracing_service import record_span, start_trace
+
+INFERENCE_PROCESSES = os.getenv("INFERENCE_PROCESSES", "0") == "1"
+INFERENCE_SHM_MIN_BYTES = int(os.getenv("INFERENCE_SHM_MIN_BYTES", str(64 * 1024)))
+INFERENCE_LOAD_PENALTY = float(os.getenv("INFERENCE_LOAD_PENALTY", "2"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "300"))            # 0 : pas de limite
+INFERENCE_START_TIMEOUT = float(os.getenv("INFERENCE_START_TIMEOUT", "600"))  # chargement des modèles inclus
+INFERENCE_HEALTH_INTERVAL = float(os.getenv("INFERENCE_HEALTH_INTERVAL", "5"))
+INFERENCE_WORKER_MAX_REQUESTS = int(os.getenv("INFERENCE_WORKER_MAX_REQUESTS", "0"))  # 0 : jamais
+INFERENCE_WORKER_MAX_RSS_MB = float(os.getenv("INFERENCE_WORKER_MAX_RSS_MB", "0"))    # 0 : pas de limite
+PRELOAD_WHISPER_MODELS = os.getenv("PRELOAD_WHISPER_MODELS", "base")
+PRELOAD_TTS_MODEL = os.getenv("PRELOAD_TTS_MODEL", "mms")
+
+WORKER_RESTARTS = Counter(
+    "inference_worker_restarts_total", "Redémarrages des process d'inférence", ["family", "reason"]
+)
+WORKER_RSS = Gauge("inference_worker_rss_bytes", "Mémoire résidente des process d'inférence", ["worker"])
+
+# Chargement et inventaire des modèles par famille : (module, fonction)
+_MODEL_LOADERS = {"stt": ("stt_service", "get_whisper_model"), "tts": ("tts_service", "get_tts")}
+_MODEL_REPORTERS = {"stt": ("stt_service", "loaded_models"), "tts": ("tts_service", "loaded_models")}
+
+
+class WorkerCrashed(RuntimeError):
+    """Le process d'inférence s'est arrêté pendant l'appel."""
+
+
+def default_preload() -> Dict[str, List[str]]:
+    return {
+        "stt": [n.strip() for n in PRELOAD_WHISPER_MODELS.split(",") if n.strip()],
+        "tts": [PRELOAD_TTS_MODEL] if PRELOAD_TTS_MODEL else [],
+    }
+
+
+# -----------------------------------------------------------------------------
+# Transport : pickle + blocs de mémoire partagée pour les gros tampons
+# -----------------------------------------------------------------------------
+
+class _ShmPickler(pickle.Pickler):
+    """Pickler qui place les gros tableaux / bytes dans des blocs partagés."""
+
+    def __init__(self, file, blocks: List[shared_memory.SharedMemory]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.blocks = blocks
+
+    def _block(self, size: int) -> shared_memory.SharedMemory:
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self.blocks.append(block)
+        return block
+
+    def persistent_id(self, obj):
+        if type(obj) is np.ndarray and not obj.dtype.hasobject and obj.nbytes >= INFERENCE_SHM_MIN_BYTES:
+            block = self._block(obj.nbytes)
+            np.ndarray(obj.shape, obj.dtype, buffer=block.buf)[...] = obj
+            return ("ndarray", block.name, obj.dtype.str, obj.shape)
+        if isinstance(obj, (bytes, bytearray)) and len(obj) >= INFERENCE_SHM_MIN_BYTES:
+            block = self._block(len(obj))
+            block.buf[:len(obj)] = obj
+            return ("bytes", block.name, len(obj))
+        return None
+
+
+class _ShmUnpickler(pickle.Unpickler):
+    """Relit les blocs partagés : sur place (*in_place*) ou par copie.
+
+    Sur place, les blocs restent ouverts dans *blocks* jusqu'à la fin de
+    l'appel ; par copie, chaque bloc est fermé et supprimé aussitôt lu.
+    """
+
+    def __init__(self, file, blocks: List[shared_memory.SharedMemory], in_place: bool):
+        super().__init__(file)
+        self.blocks = blocks
+        self.in_place = in_place
+
+    def persistent_load(self, pid):
+        kind, name = pid[0], pid[1]
+        block = shared_memory.SharedMemory(name=name)
+        if self.in_place:
+            self.blocks.append(block)
+            if kind == "ndarray":
+                return np.ndarray(pid[3], np.dtype(pid[2]), buffer=block.buf)
+            return block.buf[:pid[2]]
+        try:
+            if kind == "ndarray":
+                return np.ndarray(pid[3], np.dtype(pid[2]), buffer=block.buf).copy()
+            return bytes(block.buf[:pid[2]])
+        finally:
+            _release([block], unlink=True)
+
+
+def _dumps(obj, blocks: List[shared_memory.SharedMemory]) -> bytes:
+    buffer = io.BytesIO()
+    try:
+        _ShmPickler(buffer, blocks).dump(obj)
+    except BaseException:
+        _release(blocks, unlink=True)
+        raise
+    return buffer.getvalue()
+
+
+def _loads(data: bytes, blocks: List[shared_memory.SharedMemory], in_place: bool = False):
+    return _ShmUnpickler(io.BytesIO(data), blocks, in_place).load()
+
+
+def _release(blocks: List[shared_memory.SharedMemory], unlink: bool = False) -> List[shared_memory.SharedMemory]:
+    """Ferme (et supprime) les blocs ; renvoie ceux encore référencés par une vue."""
+    busy = []
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            busy.append(block)
+        if unlink:
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+    blocks.clear()
+    return busy
+
+
+# -----------------------------------------------------------------------------
+# Côté worker (process enfant)
+# -----------------------------------------------------------------------------
+
+def _hook(table: Dict[str, tuple], family: str) -> Optional[Callable]:
+    if family not in table:
+        return None
+    module, name = table[family]
+    return getattr(importlib.import_module(module), name)
+
+
+def _loaded_models(family: str) -> List[str]:
+    reporter = _hook(_MODEL_REPORTERS, family)
+    return list(reporter()) if reporter else []
+
+
+def _rss() -> int:
+    return psutil.Process().memory_info().rss
+
+
+def _portable(err: Exception) -> Exception:
+    """L'exception si elle survit à un aller-retour pickle, sinon un RuntimeError équivalent."""
+    try:
+        pickle.loads(pickle.dumps(err))
+        return err
+    except Exception:
+        return RuntimeError(f"{type(err).__name__}: {err}")
+
+
+def _worker_main(conn, family: str, threads: int, cores: List[int], pin: bool, preload: List[str]) -> None:
+    """Boucle du process d'inférence : un appel à la fois, jusqu'au message vide."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # arrêt piloté par le process API
+    if pin and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)            # avant tout thread : vaut pour le process
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    loader = _hook(_MODEL_LOADERS, family)
+    if loader is not None:
+        lazy_import("torch").set_num_threads(threads)
+        for name in preload:
+            try:
+                loader(name)
+            except Exception as err:
+                print(f"[POOL] {family} : préchargement de '{name}' impossible : {err}")
+    conn.send_bytes(pickle.dumps(("ready", _loaded_models(family), _rss())))
+
+    lingering: List[shared_memory.SharedMemory] = []
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, OSError):
+            break                                 # process API disparu
+        if not data:
+            break
+        blocks: List[shared_memory.SharedMemory] = []
+        trace = start_trace(f"{family}.worker")
+        with capture_rtf() as rtf:
+            try:
+                fn, args = _loads(data, blocks, in_place=True)
+                reply = ("ok", fn(*args))
+            except Exception as err:
+                traceback.print_exc()
+                reply = ("error", _portable(err))
+            fn = args = None                      # libère les vues sur les blocs d'entrée
+        meta = {
+            "spans": [(s.name, s.start_ns, s.end_ns) for s in trace.spans],
+            "rtf": rtf,
+            "models": _loaded_models(family),
+            "rss": _rss(),
+        }
+        out_blocks: List[shared_memory.SharedMemory] = []
+        try:
+            payload = _dumps(reply + (meta,), out_blocks)
+        except Exception as err:                  # résultat non picklable
+            payload = _dumps(("error", _portable(err), meta), out_blocks)
+        reply = None
+        lingering = _release(lingering + blocks)
+        try:
+            conn.send_bytes(payload)
+        except (EOFError, OSError):
+            _release(out_blocks, unlink=True)
+            break
+        # Le process API supprime les blocs de sortie après lecture
+        _release(out_blocks)
+
+
+# -----------------------------------------------------------------------------
+# Côté process API
+# -----------------------------------------------------------------------------
+
+class Worker:
+    """Un process d'inférence et le thread qui sérialise ses appels."""
+
+    def __init__(self, pool: "InferencePool", family: str, index: int, threads: int, cores: List[int], pin: bool):
+        self.pool = pool
+        self.family = family
+        self.index = index
+        self.threads = threads
+        self.cores = cores
+        self.pin = pin
+        self.process = None
+        self.conn = None
+        self.ready = False
+        self.models: set = set()
+        self.pending = 0
+        self.requests = 0
+        self.rss = 0
+        self.restarts = 0
+        self.recycle_reason: Optional[str] = None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix=f"pool-{self.name}")
+
+    @property
+    def name(self) -> str:
+        return f"{self.family}#{self.index}"
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    # --- cycle de vie (toujours exécuté dans le thread du worker) ---
+
+    def ensure_running(self, reason: str = "crash") -> None:
+        if self.alive() and self.recycle_reason is None:
+            return
+        if self.process is not None:
+            reason = self.recycle_reason or reason
+            self.stop()
+            self.restarts += 1
+            WORKER_RESTARTS.labels(self.family, reason).inc()
+            print(f"[POOL] Redémarrage du worker {self.name} ({reason})")
+        self.recycle_reason = None
+        preload = sorted(set(self.pool.preload.get(self.family, [])) | self.models)
+        parent_conn, child_conn = self.pool.context.Pipe()
+        process = self.pool.context.Process(
+            target=_worker_main, name=f"inference-{self.name}", daemon=True,
+            args=(child_conn, self.family, self.threads, self.cores, self.pin, preload),
+        )
+        start = time.perf_counter()
+        process.start()
+        child_conn.close()
+        self.process, self.conn, self.ready, self.requests = process, parent_conn, False, 0
+        try:
+            if not parent_conn.poll(INFERENCE_START_TIMEOUT or None):
+                self.kill()
+                raise TimeoutError(f"Worker {self.name} non prêt après {INFERENCE_START_TIMEOUT:.0f}s")
+            _, models, rss = pickle.loads(parent_conn.recv_bytes())
+        except (EOFError, OSError):
+            raise WorkerCrashed(f"Worker {self.name} arrêté pendant son démarrage (code {process.exitcode})")
+        self.models, self.ready = set(models), True
+        self._set_rss(rss)
+        print(f"[POOL] Worker {self.name} prêt (pid {process.pid}, {self.threads} thread(s), "
+              f"modèles : {', '.join(sorted(self.models)) or 'aucun'}) en {time.perf_counter() - start:.1f}s")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                self.conn.send_bytes(b"")
+            except OSError:
+                pass
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+        self.process, self.conn, self.ready = None, None, False
+        WORKER_RSS.labels(self.name).set(0)
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(5)
+
+    def _set_rss(self, rss: int) -> None:
+        self.rss = rss
+        WORKER_RSS.labels(self.name).set(rss)
+
+    # --- appel ---
+
+    def call(self, fn: Callable, args: tuple) -> Any:
+        """Exécute fn(*args) dans le process (thread du worker, contexte de l'appelant)."""
+        self.ensure_running()
+        blocks: List[shared_memory.SharedMemory] = []
+        data = _dumps((fn, args), blocks)
+        try:
+            self.conn.send_bytes(data)
+            reply = self.conn.recv_bytes() if self.conn.poll(INFERENCE_TIMEOUT or None) else None
+        except (EOFError, OSError):
+            self.process.join(5)   # relancé par l'appel suivant, même s'il n'est pas encore sorti
+            self.recycle_reason = "crash"
+            raise WorkerCrashed(f"Worker {self.name} arrêté pendant l'inférence (code {self.process.exitcode})")
+        finally:
+            _release(blocks, unlink=True)
+        if reply is None:
+            self.kill()
+            self.recycle_reason = "timeout"
+            raise TimeoutError(f"Worker {self.name} : pas de réponse après {INFERENCE_TIMEOUT:.0f}s (arrêté)")
+        status, value, meta = _loads(reply, [])
+
+        self.requests += 1
+        self.models = set(meta["models"])
+        self._set_rss(meta["rss"])
+        for name, start_ns, end_ns in meta["spans"]:
+            service, _, step = name.partition(".")
+            STAGE_SECONDS.labels(service, step).observe((end_ns - start_ns) / 1e9)
+            record_span(name, start_ns, end_ns=end_ns, worker=self.name)
+        for observation in meta["rtf"]:
+            observe_rtf(*observation)
+        self._check_limits()
+        if status == "error":
+            raise value
+        return value
+
+    def _check_limits(self) -> None:
+        if INFERENCE_WORKER_MAX_REQUESTS and self.requests >= INFERENCE_WORKER_MAX_REQUESTS:
+            self.recycle_reason = "max_requests"
+        elif INFERENCE_WORKER_MAX_RSS_MB and self.rss > INFERENCE_WORKER_MAX_RSS_MB * 1024 * 1024:
+            self.recycle_reason = "max_rss"
+        if self.recycle_reason:
+            # Après les appels déjà en file sur ce worker
+            self.executor.submit(self._recycle)
+
+    def _recycle(self) -> None:
+        try:
+            self.ensure_running()
+        except Exception as err:
+            print(f"[POOL] Worker {self.name} : redémarrage impossible : {err}")
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "worker": self.name, "pid": self.process.pid if self.process else None, "alive": self.alive(),
+            "ready": self.ready, "models": sorted(self.models), "pending": self.pending,
+            "requests": self.requests, "rss_mb": round(self.rss / 1024 / 1024, 1), "restarts": self.restarts,
+            "threads": self.threads, "cores": self.cores if self.pin else None,
+        }
+
+
+class InferencePool:
+    """Process d'inférence par créneau de *budget*, routage par modèle chargé."""
+
+    def __init__(self, enabled: bool = INFERENCE_PROCESSES, budget: CPUBudget = cpu_budget,
+                 preload: Optional[Dict[str, List[str]]] = None, start_method: str = "spawn"):
+        self.enabled = enabled
+        self.budget = budget
+        self.preload = default_preload() if preload is None else preload
+        self.context = multiprocessing.get_context(start_method)
+        self.workers: Dict[str, List[Worker]] = {}
+        self._lock = threading.Lock()
+        self._supervisor: Optional[asyncio.Task] = None
+
+    def serves(self, family: str) -> bool:
+        return bool(self.workers.get(family))
+
+    def start(self, families: Iterable[str]) -> None:
+        """Crée un worker par créneau des familles demandées (démarrage en arrière-plan)."""
+        if not self.enabled or self.workers:
+            return
+        for family in families:
+            slots = self.budget.slots.get(family, [])
+            self.workers[family] = [Worker(self, family, s.index, s.threads, s.cores, s.pin) for s in slots]
+            for worker in self.workers[family]:
+                worker.executor.submit(worker._recycle)
+        if self.workers:
+            try:
+                self._supervisor = asyncio.get_running_loop().create_task(self._supervise())
+            except RuntimeError:
+                pass  # hors boucle asyncio (benchmarks, scripts) : relance au prochain appel
+
+    def _pick(self, family: str, model: Optional[str]) -> Optional[Worker]:
+        workers = self.workers.get(family)
+        if not workers:
+            return None
+
+        def cost(w: Worker) -> float:
+            missing = model is not None and model not in w.models
+            return w.pending + (INFERENCE_LOAD_PENALTY if missing or not w.ready else 0)
+
+        with self._lock:
+            worker = min(workers, key=cost)
+            worker.pending += 1
+        return worker
+
+    def _done(self, worker: Worker) -> None:
+        with self._lock:
+            worker.pending -= 1
+
+    async def run(self, family: str, fn: Callable, *args, model: Optional[str] = None) -> Any:
+        """fn(*args) dans un worker de *family* (de préférence un qui a *model*)."""
+        worker = self._pick(family, model)
+        if worker is None:
+            return await self.budget.run(family, fn, *args)
+        try:
+            with stage(family, "worker"):
+                # Étapes rejouées depuis le worker : rattachées à l'étape « worker »
+                ctx = contextvars.copy_context()
+                return await asyncio.wrap_future(worker.executor.submit(ctx.run, worker.call, fn, args))
+        finally:
+            self._done(worker)
+
+    def run_sync(self, family: str, fn: Callable, *args, model: Optional[str] = None) -> Any:
+        """Variante bloquante de run (hors boucle asyncio)."""
+        worker = self._pick(family, model)
+        if worker is None:
+            return self.budget.run_sync(family, fn, *args)
+        try:
+            return worker.executor.submit(worker.call, fn, args).result()
+        finally:
+            self._done(worker)
+
+    async def _supervise(self) -> None:
+        """Relance les workers morts hors requête (OOM killer, plantage au repos)."""
+        while True:
+            await asyncio.sleep(INFERENCE_HEALTH_INTERVAL)
+            for worker in (w for family in self.workers.values() for w in family):
+                if worker.process is not None and not worker.alive() and not worker.pending:
+                    worker.executor.submit(worker._recycle)
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [w.describe() for family in self.workers.values() for w in family]
+
+    def _stop_all(self) -> None:
+        for worker in (w for family in self.workers.values() for w in family):
+            worker.executor.shutdown(wait=True, cancel_futures=True)
+            worker.stop()
+
+    async def shutdown(self) -> None:
+        if self._supervisor:
+            self._supervisor.cancel()
+        if self.workers:
+            await asyncio.to_thread(self._stop_all)
+            self.workers = {}
+
+
+# Instance unique utilisée par l'application
+inference_pool = InferencePool()
@@ -0,0 +1,353 @@
+"""Jobs STT/TTS asynchrones avec file persistante (SQLite).
+
+`POST /stt?async=true` ou `POST /tts?async=true` renvoie aussitôt un job
+(202) au lieu d'attendre le calcul : une longue transcription n'est plus
+perdue quand un proxy coupe la connexion. Le job est écrit dans JOBS_DB et
+survit à un redémarrage ; des workers en tâche de fond (JOB_WORKERS par
+process) le traitent, et le résultat est récupéré par GET /jobs/{id} ou
+poussé vers `callback_url` s'il est fourni.
+
+• Réservation atomique (UPDATE … RETURNING) : plusieurs process (serve.py)
+  partagent la base sans jamais traiter deux fois le même job.
+• Bail (JOB_LEASE_SECONDS) renouvelé pendant le calcul : le job d'un process
+  mort repasse en file, au plus JOB_MAX_ATTEMPTS fois au total.
+• Les résultats expirent après JOB_RESULT_TTL_SECONDS, les jobs jamais
+  traités après JOB_QUEUED_TTL_SECONDS ; un balayage périodique les purge.
+• Le calcul passe par la classe `batch` du contrôle d'admission : les jobs
+  n'occupent jamais les créneaux interactifs.
+• Si JOB_CALLBACK_SECRET est défini, le callback porte l'en-tête
+  `X-Job-Signature: sha256=<HMAC du corps>`.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import httpx
+
+from scheduler_service import QueueFull, scheduler
+
+JOBS_DB = Path(os.getenv("JOBS_DB", "jobs/jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+JOB_QUEUED_TTL_SECONDS = int(os.getenv("JOB_QUEUED_TTL_SECONDS", "86400"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_SWEEP_INTERVAL = float(os.getenv("JOB_SWEEP_INTERVAL", "60"))
+JOB_CALLBACK_RETRIES = int(os.getenv("JOB_CALLBACK_RETRIES", "3"))
+JOB_CALLBACK_SECRET = os.getenv("JOB_CALLBACK_SECRET", "")
+
+_FINISHED = ("succeeded", "failed", "cancelled")
+_COLUMNS = ("id", "kind", "owner", "status", "result", "error", "callback_url", "callback_status",
+            "attempts", "created_at", "started_at", "finished_at", "expires_at")
+
+
+# stt_service / tts_service ne sont importés que si un worker du type tourne
+# (ENABLE_STT / ENABLE_TTS, voir main.py)
+async def _run_stt(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from stt_service import STTRequest, transcribe_audio
+    req = STTRequest(**payload)
+    return (await transcribe_audio(req.audio, req.language, req.model)).model_dump()
+
+
+async def _run_tts(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from tts_service import TTSRequest, synthesize_text
+    req = TTSRequest(**payload)
+    return (await synthesize_text(req.text, req.language, req.model, req.voice_id, req.speed)).model_dump()
+
+
+# Calcul de chaque type de job : process d'inférence ou créneau CPU (voir inference_pool_service)
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {"stt": _run_stt, "tts": _run_tts}
+
+
+class JobQueue:
+    """Table `jobs` de JOBS_DB : soumission, réservation, résultat, purge.
+
+    La connexion est ouverte au premier accès dans chaque process : une
+    connexion SQLite héritée d'un fork (serve.py) n'est pas utilisable.
+    """
+
+    def __init__(self, db_path: Path = JOBS_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None or self._pid != os.getpid():
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA busy_timeout=5000")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT, owner TEXT, status TEXT, payload TEXT,"
+                " result TEXT, error TEXT, callback_url TEXT, callback_status TEXT,"
+                " attempts INTEGER DEFAULT 0, created_at INTEGER, started_at INTEGER,"
+                " finished_at INTEGER, expires_at INTEGER, lease_until REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at)")
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _execute(self, sql: str, params: Iterable[Any] = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn().execute(sql, tuple(params))
+
+    def submit(self, kind: str, payload: Dict[str, Any], owner: Optional[str],
+               callback_url: Optional[str] = None) -> Dict[str, Any]:
+        now = int(time.time())
+        job_id = f"job_{uuid.uuid4().hex[:16]}"
+        self._execute(
+            "INSERT INTO jobs (id, kind, owner, status, payload, callback_url, created_at, expires_at)"
+            " VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, owner, json.dumps(payload), callback_url, now, now + JOB_QUEUED_TTL_SECONDS),
+        )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        row = self._execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return dict(zip(_COLUMNS, row))
+
+    def list(self, owner: Optional[str], limit: int = 20) -> List[Dict[str, Any]]:
+        """Jobs les plus récents d'un propriétaire (sans les résultats)."""
+        rows = self._execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE owner IS ? ORDER BY created_at DESC LIMIT ?",
+            (owner, limit),
+        ).fetchall()
+        return [dict(zip(_COLUMNS, row), result=None) for row in rows]
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Annule un job encore en file (un job en cours va jusqu'au bout)."""
+        now = int(time.time())
+        self._execute(
+            "UPDATE jobs SET status = 'cancelled', payload = NULL, finished_at = ?, expires_at = ?"
+            " WHERE id = ? AND status = 'queued'",
+            (now, now + JOB_RESULT_TTL_SECONDS, job_id),
+        )
+        return self.get(job_id)
+
+    def claim(self, kinds: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Réserve le plus ancien job en file parmi *kinds* (None si aucun)."""
+        kinds = list(kinds)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            # Baux expirés : process mort ou arrêté brutalement pendant le calcul
+            db.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL"
+                " WHERE status = 'running' AND lease_until < ? AND attempts < ?",
+                (now, JOB_MAX_ATTEMPTS),
+            )
+            db.execute(
+                "UPDATE jobs SET status = 'failed', payload = NULL, error = 'abandonné après plusieurs tentatives',"
+                " finished_at = ?, expires_at = ? WHERE status = 'running' AND lease_until < ?",
+                (int(now), int(now) + JOB_RESULT_TTL_SECONDS, now),
+            )
+            row = db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, lease_until = ?"
+                " WHERE id = (SELECT id FROM jobs WHERE status = 'queued'"
+                f" AND kind IN ({', '.join('?' * len(kinds))}) ORDER BY created_at LIMIT 1)"
+                " RETURNING id, kind, owner, payload, callback_url, attempts",
+                (int(now), now + JOB_LEASE_SECONDS, *kinds),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "kind", "owner", "payload", "callback_url", "attempts"), row))
+
+    def renew(self, job_id: str) -> None:
+        self._execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'",
+                      (time.time() + JOB_LEASE_SECONDS, job_id))
+
+    def release(self, job_id: str) -> None:
+        """Remet en file un job interrompu par l'arrêt du process (tentative non comptée)."""
+        self._execute(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1, lease_until = NULL"
+            " WHERE id = ? AND status = 'running'",
+            (job_id,),
+        )
+
+    def finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """Enregistre le résultat (ou l'erreur) ; l'entrée n'est plus conservée."""
+        now = int(time.time())
+        self._execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, payload = NULL, lease_until = NULL,"
+            " finished_at = ?, expires_at = ? WHERE id = ? AND status = 'running'",
+            ("failed" if error else "succeeded", json.dumps(result) if result is not None else None,
+             error, now, now + JOB_RESULT_TTL_SECONDS, job_id),
+        )
+
+    def set_callback_status(self, job_id: str, status: str) -> None:
+        self._execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (status, job_id))
+
+    def purge(self) -> int:
+        """Supprime les jobs expirés (jamais un job en cours) ; renvoie leur nombre."""
+        cursor = self._execute("DELETE FROM jobs WHERE expires_at < ? AND status != 'running'", (int(time.time()),))
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self._execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def public(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Objet `job` renvoyé par l'API et envoyé au callback."""
+    result = job.get("result")
+    return {
+        "id": job["id"],
+        "object": "job",
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "expires_at": job["expires_at"],
+        "attempts": job["attempts"],
+        "result": json.loads(result) if isinstance(result, str) else result,
+        "error": job["error"],
+        "callback": {"url": job["callback_url"], "status": job["callback_status"]} if job["callback_url"] else None,
+    }
+
+
+def sign_callback(body: bytes) -> Dict[str, str]:
+    """En-tête de signature du callback (vide si JOB_CALLBACK_SECRET n'est pas défini)."""
+    if not JOB_CALLBACK_SECRET:
+        return {}
+    digest = hmac.new(JOB_CALLBACK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return {"X-Job-Signature": f"sha256={digest}"}
+
+
+class JobRunner:
+    """Workers et balayage des jobs du process."""
+
+    def __init__(self, queue: JobQueue, workers: int = JOB_WORKERS):
+        self.queue = queue
+        self.workers = workers
+        self.kinds: List[str] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._callbacks: set = set()
+
+    def start(self, kinds: Iterable[str]) -> None:
+        self.kinds = [k for k in kinds if k in JOB_HANDLERS]
+        if not self.kinds:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+        print(f"[JOBS] {self.workers} worker(s) pour {', '.join(self.kinds)} ({self.queue.db_path})")
+
+    def notify(self) -> None:
+        """Réveille les workers après une soumission (sans attendre JOB_POLL_INTERVAL)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def submit(self, kind: str, payload: Dict[str, Any], owner: Optional[str],
+                     callback_url: Optional[str] = None) -> Dict[str, Any]:
+        # L'écriture du payload (audio base64) se fait hors de la boucle asyncio
+        job = await asyncio.to_thread(self.queue.submit, kind, payload, owner, callback_url)
+        self.notify()
+        return job
+
+    async def shutdown(self) -> None:
+        for task in self._tasks + list(self._callbacks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._callbacks, return_exceptions=True)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim, self.kinds)
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                try:
+                    await self._run(job)
+                except asyncio.CancelledError:
+                    # Arrêt du serveur : le job reprendra au prochain démarrage
+                    await asyncio.to_thread(self.queue.release, job["id"])
+                    raise
+            except Exception as err:
+                # Base verrouillée ou indisponible (claim, finish) : le worker
+                # continue ; un job réclamé mais non terminé est repris à
+                # l'expiration de son bail
+                print(f"[JOBS] Erreur du worker : {err}")
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        renewer = asyncio.create_task(self._renew(job["id"]))
+        result, error = None, None
+        try:
+            payload = json.loads(job["payload"])
+            while True:
+                try:
+                    async with scheduler.slot("batch", f"job:{job['owner']}"):
+                        result = await JOB_HANDLERS[job["kind"]](payload)
+                    break
+                except QueueFull:
+                    await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            error = str(err) or err.__class__.__name__
+            print(f"[JOBS] Job {job['id']} en échec : {error}")
+        finally:
+            renewer.cancel()
+        await asyncio.to_thread(self.queue.finish, job["id"], result, error)
+        if job["callback_url"]:
+            task = asyncio.create_task(self._callback(job["id"]))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _renew(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            await asyncio.to_thread(self.queue.renew, job_id)
+
+    async def _callback(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.queue.get, job_id)
+        body = json.dumps(public(job), ensure_ascii=False).encode()
+        headers = {"Content-Type": "application/json", **sign_callback(body)}
+        status = "failed"
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            for attempt in range(JOB_CALLBACK_RETRIES):
+                try:
+                    response = await client.post(job["callback_url"], content=body, headers=headers)
+                    if response.status_code < 400:
+                        status = "delivered"
+                        break
+                    status = f"failed: HTTP {response.status_code}"
+                except httpx.HTTPError as err:
+                    status = f"failed: {err.__class__.__name__}"
+                await asyncio.sleep(2 ** attempt)
+        if status != "delivered":
+            print(f"[JOBS] Callback du job {job_id} non délivré ({status})")
+        await asyncio.to_thread(self.queue.set_callback_status, job_id, status)
+
+    async def _sweeper(self) -> None:
+        while True:
+            try:
+                purged = await asyncio.to_thread(self.queue.purge)
+                if purged:
+                    print(f"[JOBS] {purged} job(s) expiré(s) supprimé(s)")
+            except sqlite3.Error as err:
+                print(f"[JOBS] Purge impossible : {err}")
+            await asyncio.sleep(JOB_SWEEP_INTERVAL)
+
+
+# Instances uniques utilisées par l'application
+job_queue = JobQueue()
+job_runner = JobRunner(job_queue)
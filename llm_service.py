@@ -1,8 +1,19 @@
+import asyncio
 import httpx
+import json
 import os
-from typing import List, Optional
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
 from pydantic import BaseModel
 
+from context_service import context_manager
+from tracing_service import inject_traceparent, span
+
+# Durée pendant laquelle Ollama garde le modèle chargé après un appel
+# ("30m", "1h", "-1" pour l'épingler indéfiniment, "0" pour le décharger).
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
 class Message(BaseModel):
     role: str
     content: str
@@ -12,17 +23,56 @@ class ChatRequest(BaseModel):
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 1000
 
-async def get_ollama_response(messages: List[Message], temperature: float, max_tokens: int) -> str:
-    """Appelle l'API Ollama pour obtenir une réponse du modèle."""
-    ollama_host = os.getenv("OLLAMA_HOST", "http://ollama:11434")
-    model_name = os.getenv("MODEL_NAME", "mistral")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            f"{ollama_host}/api/chat",
+def ollama_base() -> str:
+    """Renvoie l'URL de base Ollama avec schéma http:// si nécessaire."""
+    host = os.getenv("OLLAMA_HOST", "ollama:11434")
+    if not host.startswith(("http://", "https://")):
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+# Client partagé : réutilise les connexions keep-alive vers Ollama au lieu
+# d'ouvrir une nouvelle connexion TCP à chaque requête. Chaque appel porte
+# l'en-tête `traceparent` de la requête en cours (tracing_service).
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Renvoie le client HTTP partagé (créé au premier appel)."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = httpx.AsyncClient(timeout=30.0, event_hooks={"request": [inject_traceparent]})
+    return _HTTP_CLIENT
+
+async def close_http_client() -> None:
+    """Ferme le client partagé (arrêt de l'application)."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None and not _HTTP_CLIENT.is_closed:
+        await _HTTP_CLIENT.aclose()
+    _HTTP_CLIENT = None
+
+async def get_ollama_response(
+    messages: List[Message],
+    temperature: float,
+    max_tokens: int,
+    model_name: Optional[str] = None,
+    keep_alive: Optional[str] = None,
+) -> str:
+    """Appelle l'API Ollama pour obtenir une réponse du modèle.
+
+    Si *model_name* est fourni, on l'utilise ; sinon on retombe sur la variable
+    d'environnement MODEL_NAME ou, à défaut, « mistral ». Les erreurs HTTP
+    (httpx.HTTPError) sont propagées à l'appelant."""
+    model_name = model_name or os.getenv("MODEL_NAME", "mistral")
+    # Historique ramené sous le budget de tokens du prompt (context_service)
+    messages, _ = await asyncio.to_thread(context_manager.fit, messages, model_name, max_tokens)
+
+    with span("ollama.chat", model=model_name):
+        response = await get_http_client().post(
+            f"{ollama_base()}/api/chat",
             json={
                 "model": model_name,
                 "messages": [{"role": m.role, "content": m.content} for m in messages],
+                "stream": False,
+                "keep_alive": keep_alive or OLLAMA_KEEP_ALIVE,
                 "options": {
                     "temperature": temperature,
                     "num_predict": max_tokens
@@ -31,4 +81,64 @@ async def get_ollama_response(messages: List[Message], temperature: float, max_t
             timeout=30.0
         )
         response.raise_for_status()
-        return response.json()["message"]["content"] 
\ No newline at end of file
+        return response.json()["message"]["content"]
+
+async def stream_ollama_response(
+    messages: List[Message],
+    temperature: float,
+    max_tokens: int,
+    model_name: Optional[str] = None,
+    keep_alive: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Variante streaming de get_ollama_response : produit les fragments de
+    texte au fur et à mesure de leur génération par Ollama."""
+    model_name = model_name or os.getenv("MODEL_NAME", "mistral")
+    messages, _ = await asyncio.to_thread(context_manager.fit, messages, model_name, max_tokens)
+
+    with span("ollama.chat_stream", model=model_name):
+        async with get_http_client().stream(
+            "POST",
+            f"{ollama_base()}/api/chat",
+            json={
+                "model": model_name,
+                "messages": [{"role": m.role, "content": m.content} for m in messages],
+                "stream": True,
+                "keep_alive": keep_alive or OLLAMA_KEEP_ALIVE,
+                "options": {
+                    "temperature": temperature,
+                    "num_predict": max_tokens
+                }
+            },
+            timeout=httpx.Timeout(30.0, read=120.0),
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                content = chunk.get("message", {}).get("content")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
+
+def openai_chat_completion(model: str, answer: str) -> dict:
+    """Met une réponse Ollama au format OpenAI `chat.completion`."""
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(datetime.utcnow().timestamp()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop"
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0
+        }
+    }
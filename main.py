@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, Header, UploadFile, File, Form, Body, Request
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Header, Query, UploadFile, File, Form, Body, Request, WebSocket, WebSocketDisconnect
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from fastapi.openapi.utils import get_openapi
@@ -8,17 +8,33 @@ import os
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, Counter, Histogram
-from fastapi.responses import Response
-from auth import Token, authenticate_user, create_access_token, get_current_user, TokenData, ACCESS_TOKEN_EXPIRE_MINUTES
-from tts_service import TTSRequest, TTSResponse, synthesize_text
-from stt_service import STTRequest, STTResponse, transcribe_audio
-from llm_service import Message, ChatRequest, get_ollama_response
-from voice_service import save_voice_sample, delete_voice, list_voices
-import uuid
-import torch
+from fastapi.responses import Response, JSONResponse, FileResponse, StreamingResponse
+from auth import Token, authenticate_user_async, create_access_token, get_current_user, decode_access_token, TokenData, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth import check_api_key, prepare_auth
+from llm_service import Message, ChatRequest, close_http_client, openai_chat_completion
+from llm_service import get_ollama_response as _ollama_chat
+from session_service import (
+    SessionCreateRequest, SessionTurnRequest, SessionInfo, SessionTurnResponse,
+    session_store, chat_turn,
+)
+from catalog_service import ModelCatalog
+from metrics_service import HTTP_IN_FLIGHT, lazy_import
+from tracing_service import finish_trace, record_span, server_timing, start_trace, traceparent
+from profiling_service import Busy, memory_tracker, sample_cpu, torch_profile
+from scheduler_service import scheduler, DeadlineExceeded, QueueFull
+from base64_stream import adecode_chunks
+from batch_service import batch_manager
+from cpu_budget_service import cpu_budget
+from inference_pool_service import inference_pool
+from job_service import job_queue, job_runner, public as public_job
+from embedding_service import create_embeddings
+import asyncio
+import functools
+import json
+import time
 
 # Métriques Prometheus
-REQUESTS = Counter('http_requests_total', 'Total des requêtes HTTP', ['method', 'endpoint'])
+REQUESTS = Counter('http_requests_total', 'Total des requêtes HTTP', ['method', 'endpoint', 'status'])
 LATENCY = Histogram('http_request_duration_seconds', 'Latence des requêtes HTTP', ['method', 'endpoint'])
 
 app = FastAPI(
@@ -28,6 +44,112 @@ app = FastAPI(
     timeout=300  # 5 minutes timeout
 )
 
+# Sous-systèmes activés : les routes d'un sous-système désactivé ne sont pas
+# montées et ses modules (stt_service, tts_service, voice_service,
+# pipeline_service) jamais importés. Même activées, les dépendances lourdes
+# (torch, whisper, TTS) ne sont importées qu'au premier usage (lazy_import).
+ENABLE_LLM = os.getenv("ENABLE_LLM", "1") == "1"
+ENABLE_STT = os.getenv("ENABLE_STT", "1") == "1"
+ENABLE_TTS = os.getenv("ENABLE_TTS", "1") == "1"
+
+llm_router = APIRouter()
+stt_router = APIRouter()
+tts_router = APIRouter()     # synthèse et gestion des voix clonées
+voice_router = APIRouter()   # tour de parole complet : STT + LLM + TTS
+jobs_router = APIRouter()    # suivi des jobs STT/TTS asynchrones
+
+# Catalogue des modèles (Ollama + modèles TTS/STT chargeables localement)
+_local_models = []
+if ENABLE_TTS:
+    from tts_service import TTS_MODELS
+    _local_models += [{"id": f"tts-{code}", "owned_by": "local-tts", "root": name} for code, name in TTS_MODELS.items()]
+if ENABLE_STT:
+    from stt_service import WHISPER_MODELS
+    _local_models += [{"id": f"whisper-{name}", "owned_by": "local-stt", "root": name} for name in WHISPER_MODELS]
+model_catalog = ModelCatalog(local_models=_local_models)
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Contrôle d'admission : classes de priorité, file équitable et échéances."""
+    if not scheduler.applies(request.method, request.url.path):
+        return await call_next(request)
+    priority, caller, deadline = scheduler.classify(
+        request.headers, request.client.host if request.client else None
+    )
+    queued_at = time.time_ns()
+    try:
+        async with scheduler.slot(priority, caller, deadline):
+            record_span("admission.queue", queued_at, priority=priority)
+            return await call_next(request)
+    except DeadlineExceeded:
+        return JSONResponse(status_code=504, content={"detail": "Échéance de la requête dépassée"})
+    except QueueFull:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": f"File d'attente '{priority}' pleine"},
+            headers={"Retry-After": "1"},
+        )
+
+# Déclaré après admission_control, qu'il enveloppe : la latence inclut donc
+# l'attente d'admission (seul trace_requests, déclaré ensuite, est plus
+# externe). Pour une réponse en streaming, elle s'arrête à l'envoi des en-têtes.
+@app.middleware("http")
+async def record_http_metrics(request: Request, call_next):
+    """Compte chaque requête par méthode, route (gabarit) et statut."""
+    start = time.perf_counter()
+    status_code = 500
+    HTTP_IN_FLIGHT.inc()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        # Gabarit de la route ("/voices/{voice_id}") : cardinalité bornée
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", None) or "<unmatched>"
+        REQUESTS.labels(request.method, endpoint, str(status_code)).inc()
+        LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - start)
+
+# Chemins non tracés (scrapes et sondes fréquents)
+_UNTRACED_PATHS = ("/metrics", "/health")
+
+# Middleware le plus externe : la trace couvre l'admission et les métriques.
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace par requête : en-tête Server-Timing et export OTLP/JSON (TRACE_FILE)."""
+    if request.url.path in _UNTRACED_PATHS:
+        return await call_next(request)
+    trace = start_trace(
+        f"{request.method} {request.url.path}",
+        request.headers.get("traceparent"),
+        **{"http.method": request.method, "http.target": request.url.path},
+    )
+    try:
+        response = await call_next(request)
+    except Exception:
+        finish_trace(trace, **{"http.status_code": 500})
+        raise
+    route = request.scope.get("route")
+    if getattr(route, "path", None):
+        trace.root.name = f"{request.method} {route.path}"
+    response.headers["Server-Timing"] = server_timing(trace)
+    response.headers["traceparent"] = traceparent()
+
+    # Les réponses en streaming (NDJSON) se terminent après le retour du
+    # middleware : la trace est clôturée à la fin du corps.
+    body = response.body_iterator
+
+    async def body_then_finish():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish_trace(trace, **{"http.status_code": response.status_code})
+
+    response.body_iterator = body_then_finish()
+    return response
+
 class ChatResponse(BaseModel):
     response: str
     timestamp: str
@@ -37,13 +159,6 @@ class HomeResponse(BaseModel):
     version: str
     description: str
 
-def _ollama_base() -> str:
-    """Renvoie l'URL de base Ollama avec schéma http:// si nécessaire."""
-    host = os.getenv("OLLAMA_HOST", "ollama:11434")
-    if not host.startswith(("http://", "https://")):
-        host = f"http://{host}"
-    return host.rstrip("/")
-
 async def get_ollama_response(
     messages: list[Message],
     temperature: float,
@@ -52,38 +167,69 @@ async def get_ollama_response(
 ) -> str:
     """Appelle l'API Ollama et renvoie la réponse.
 
-    Si *model_name* est fourni, on l'utilise ; sinon on retombe sur la variable
+    Si *model_name* est fourni, on l'utilise ; sinon on retombe sur la variable
     d'environnement MODEL_NAME ou, à défaut, « mistral »."""
+    try:
+        return await _ollama_chat(messages, temperature, max_tokens, model_name)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Erreur Ollama: {str(e)}")
 
-    ollama_host = _ollama_base()
-    model_name = model_name or os.getenv("MODEL_NAME", "mistral")
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{ollama_host}/api/chat",
-                json={
-                    "model": model_name,
-                    "messages": [{"role": m.role, "content": m.content} for m in messages],
-                    "options": {
-                        "temperature": temperature,
-                        "num_predict": max_tokens
-                    }
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()["message"]["content"]
-        except httpx.HTTPError as e:
-            raise HTTPException(status_code=500, detail=f"Erreur Ollama: {str(e)}")
+@app.on_event("startup")
+def log_enabled_subsystems():
+    # torch n'est pas importé ici : la détection GPU a lieu au premier
+    # chargement de modèle (voir stt_service / tts_service)
+    enabled = [name for name, on in (("llm", ENABLE_LLM), ("stt", ENABLE_STT), ("tts", ENABLE_TTS)) if on]
+    print(f"[INFO] Sous-systèmes actifs : {', '.join(enabled) or 'aucun'}")
+    if cpu_budget.enabled and (ENABLE_STT or ENABLE_TTS):
+        slots = ", ".join(f"{s['slot']} {s['threads']} thread(s)" for s in cpu_budget.plan())
+        print(f"[CPU] Budget de {cpu_budget.budget} cœur(s) : {slots}")
 
 @app.on_event("startup")
-def log_gpu_status():
-    try:
-        gpu = torch.cuda.is_available()
-        print(f"[INFO] GPU détecté : {gpu}")
-    except Exception as e:
-        print(f"[INFO] torch non disponible ou erreur détection GPU : {e}")
+async def prepare_credentials():
+    """Empreintes bcrypt et clés API calculées une fois, hors de la boucle asyncio."""
+    await asyncio.to_thread(prepare_auth)
+
+@app.on_event("startup")
+async def start_session_sweeper():
+    """Nettoyage périodique des sessions de conversation expirées."""
+    if ENABLE_LLM:
+        app.state.session_sweeper = asyncio.create_task(session_store.run_sweeper())
+
+@app.on_event("startup")
+async def start_model_catalog():
+    """Rafraîchissement en arrière-plan de la liste des modèles Ollama."""
+    if ENABLE_LLM:
+        app.state.catalog_refresher = asyncio.create_task(model_catalog.run())
+
+@app.on_event("startup")
+async def resume_batch_jobs():
+    """Reprise des jobs batch interrompus par un redémarrage."""
+    if ENABLE_LLM:
+        batch_manager.resume_all()
+
+@app.on_event("startup")
+async def start_inference_pool():
+    """Process d'inférence STT/TTS (INFERENCE_PROCESSES=1), un par créneau CPU."""
+    inference_pool.start(kind for kind, on in (("stt", ENABLE_STT), ("tts", ENABLE_TTS)) if on)
+    if inference_pool.workers:
+        names = ", ".join(w["worker"] for w in inference_pool.describe())
+        print(f"[POOL] Process d'inférence : {names}")
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Workers des jobs STT/TTS asynchrones (reprennent la file persistante)."""
+    job_runner.start(kind for kind, on in (("stt", ENABLE_STT), ("tts", ENABLE_TTS)) if on)
+
+@app.on_event("shutdown")
+async def shutdown_background_tasks():
+    for name in ("session_sweeper", "catalog_refresher"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    await batch_manager.shutdown()
+    await job_runner.shutdown()
+    await inference_pool.shutdown()
+    await close_http_client()
 
 @app.get("/", response_model=HomeResponse)
 async def home():
@@ -97,7 +243,7 @@ async def home():
 @app.post("/auth/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Authentification"""
-    if not authenticate_user(form_data.username, form_data.password):
+    if not await authenticate_user_async(form_data.username, form_data.password):
         raise HTTPException(
             status_code=401,
             detail="Nom d'utilisateur ou mot de passe incorrect",
@@ -109,7 +255,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/llm/chat", response_model=ChatResponse)
+@llm_router.post("/llm/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest, current_user: TokenData = Depends(get_current_user)):
     """Chat avec Mistral"""
     try:
@@ -126,50 +272,216 @@ async def chat(request: ChatRequest, current_user: TokenData = Depends(get_curre
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/tts", response_model=TTSResponse, 
-    tags=["Speech"],
-    summary="Conversion texte vers parole",
-    description="Convertit du texte en audio en utilisant le modèle TTS Coqui"
-)
-async def text_to_speech(request: TTSRequest, current_user: TokenData = Depends(get_current_user)):
-    """
-    Conversion texte vers parole avec les paramètres suivants:
-    - **text**: Le texte à convertir en audio
-    - **language**: La langue du texte (par défaut: fr)
-    - **voice_id**: L'identifiant de la voix (optionnel)
-    - **speed**: La vitesse de la parole (par défaut: 1.0)
-    """
+# -----------------------------------------------------------------------------
+# Sessions de conversation (historique conservé côté serveur)
+# -----------------------------------------------------------------------------
+
+@llm_router.post("/llm/sessions", response_model=SessionInfo, tags=["LLM"])
+async def create_chat_session(request: SessionCreateRequest, current_user: TokenData = Depends(get_current_user)):
+    """Crée une session : les tours suivants n'envoient que le nouveau message."""
+    return session_store.create(request).info()
+
+@llm_router.post("/llm/sessions/{session_id}/chat", response_model=SessionTurnResponse, tags=["LLM"])
+async def chat_in_session(session_id: str, request: SessionTurnRequest, current_user: TokenData = Depends(get_current_user)):
+    """Ajoute un tour à la session et renvoie la réponse du modèle."""
     try:
-        return await synthesize_text(
-            text=request.text,
-            language=request.language,
-            voice_id=request.voice_id,
-            speed=request.speed
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        session = session_store.get(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée")
+    try:
+        result = await chat_turn(session, request)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=500, detail=f"Erreur Ollama: {str(e)}")
+    session_store.evict()
+    return result
 
-@app.post("/stt", response_model=STTResponse, 
-    tags=["Speech"],
-    summary="Conversion parole vers texte",
-    description="Convertit un fichier audio en texte en utilisant Whisper"
-)
-async def speech_to_text(request: STTRequest, current_user: TokenData = Depends(get_current_user)):
-    """
-    Conversion parole vers texte avec les paramètres suivants:
-    - **audio**: L'audio en base64
-    - **language**: La langue de l'audio (par défaut: fr)
-    - **model**: Le modèle Whisper à utiliser (par défaut: base)
-    """
+@llm_router.get("/llm/sessions/{session_id}", response_model=SessionInfo, tags=["LLM"])
+async def get_chat_session(session_id: str, current_user: TokenData = Depends(get_current_user)):
+    """Renvoie l'état et l'historique d'une session."""
     try:
-        
-        return await transcribe_audio(
-            audio_base64=request.audio,
-            language=request.language,
-            model_name=request.model
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return session_store.get(session_id).info(with_messages=True)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée")
+
+@llm_router.delete("/llm/sessions/{session_id}", tags=["LLM"])
+async def delete_chat_session(session_id: str, current_user: TokenData = Depends(get_current_user)):
+    """Supprime une session."""
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session inconnue ou expirée")
+    return {"status": "deleted", "session_id": session_id}
+
+if ENABLE_TTS:
+    from tts_service import TTSRequest, TTSResponse, synthesize_text
+
+    @tts_router.post("/tts", response_model=TTSResponse, 
+        tags=["Speech"],
+        summary="Conversion texte vers parole",
+        description="Convertit du texte en audio en utilisant le modèle TTS Coqui"
+    )
+    async def text_to_speech(
+        request: TTSRequest,
+        async_mode: bool = Query(False, alias="async"),
+        callback_url: Optional[str] = None,
+        current_user: TokenData = Depends(get_current_user),
+    ):
+        """
+        Conversion texte vers parole avec les paramètres suivants:
+        - **text**: Le texte à convertir en audio
+        - **language**: La langue du texte (par défaut: fr)
+        - **voice_id**: L'identifiant de la voix (optionnel)
+        - **speed**: La vitesse de la parole (par défaut: 1.0)
+        - **async** : renvoyer un job (202) à suivre sur `/jobs/{id}`
+        - **callback_url** : URL appelée (POST) avec le job terminé
+        """
+        if async_mode:
+            return await _submit_job("tts", request.model_dump(), callback_url, current_user)
+        try:
+            return await synthesize_text(
+                text=request.text,
+                language=request.language,
+                voice_id=request.voice_id,
+                speed=request.speed
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+if ENABLE_STT:
+    from stt_service import STTRequest, STTResponse, transcribe_audio
+
+    @stt_router.post("/stt", response_model=STTResponse, 
+        tags=["Speech"],
+        summary="Conversion parole vers texte",
+        description="Convertit un fichier audio en texte en utilisant Whisper"
+    )
+    async def speech_to_text(
+        request: STTRequest,
+        async_mode: bool = Query(False, alias="async"),
+        callback_url: Optional[str] = None,
+        current_user: TokenData = Depends(get_current_user),
+    ):
+        """
+        Conversion parole vers texte avec les paramètres suivants:
+        - **audio**: L'audio en base64
+        - **language**: La langue de l'audio (par défaut: fr)
+        - **model**: Le modèle Whisper à utiliser (par défaut: base)
+        - **async** : renvoyer un job (202) à suivre sur `/jobs/{id}`
+        - **callback_url** : URL appelée (POST) avec le job terminé
+        """
+        if async_mode:
+            return await _submit_job("stt", request.model_dump(), callback_url, current_user)
+        try:
+
+            return await transcribe_audio(
+                audio_base64=request.audio,
+                language=request.language,
+                model_name=request.model
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+# -----------------------------------------------------------------------------
+# Jobs asynchrones (/stt?async=true, /tts?async=true)
+# -----------------------------------------------------------------------------
+
+async def _submit_job(kind: str, payload: Dict[str, Any], callback_url: Optional[str], user: TokenData) -> JSONResponse:
+    if callback_url and not callback_url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=422, detail="callback_url doit être une URL http(s)")
+    job = await job_runner.submit(kind, payload, user.username, callback_url)
+    return JSONResponse(status_code=202, content=public_job(job), headers={"Location": f"/jobs/{job['id']}"})
+
+def _owned_job(job_id: str, user: TokenData) -> Dict[str, Any]:
+    try:
+        job = job_queue.get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job introuvable ou expiré")
+    if job["owner"] != user.username:
+        raise HTTPException(status_code=404, detail="Job introuvable ou expiré")
+    return job
+
+@jobs_router.get("/jobs", tags=["Jobs"])
+async def list_jobs(limit: int = 20, current_user: TokenData = Depends(get_current_user)):
+    """Jobs récents de l'utilisateur (sans les résultats)."""
+    limit = max(1, min(limit, 100))
+    jobs = await asyncio.to_thread(job_queue.list, current_user.username, limit)
+    return {"object": "list", "data": [public_job(j) for j in jobs]}
+
+@jobs_router.get("/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str, current_user: TokenData = Depends(get_current_user)):
+    """Statut du job ; `result` contient la réponse de /stt ou /tts une fois terminé."""
+    job = await asyncio.to_thread(_owned_job, job_id, current_user)
+    return public_job(job)
+
+@jobs_router.delete("/jobs/{job_id}", tags=["Jobs"])
+async def cancel_job(job_id: str, current_user: TokenData = Depends(get_current_user)):
+    """Annule un job encore en file (un job déjà démarré va jusqu'au bout)."""
+    await asyncio.to_thread(_owned_job, job_id, current_user)
+    return public_job(await asyncio.to_thread(job_queue.cancel, job_id))
+
+# -----------------------------------------------------------------------------
+# Tour de parole complet (audio → STT → LLM → TTS) en une seule requête
+# -----------------------------------------------------------------------------
+
+if ENABLE_LLM and ENABLE_STT and ENABLE_TTS:
+    from pipeline_service import VoiceTurnRequest, run_voice_turn
+
+    async def _admitted_voice_turn(req: VoiceTurnRequest, ticket):
+        """Exécute le pipeline en tenant un créneau d'admission pendant tout le flux."""
+        try:
+            async with scheduler.slot(*ticket):
+                async for event in run_voice_turn(req):
+                    yield event
+        except DeadlineExceeded:
+            yield {"type": "error", "stage": "admission", "status": 504, "detail": "Échéance de la requête dépassée"}
+        except QueueFull:
+            yield {"type": "error", "stage": "admission", "status": 429, "detail": "File d'attente pleine"}
+
+    @voice_router.post("/voice/turn", tags=["Speech"],
+        summary="Tour de parole complet",
+        description="Audio → Whisper → Ollama → TTS, renvoyé en flux NDJSON au fil de la génération"
+    )
+    async def voice_turn(request: Request, payload: VoiceTurnRequest, current_user: TokenData = Depends(get_current_user)):
+        """
+        Chaque ligne de la réponse est un événement JSON :
+        - **transcript** : texte reconnu
+        - **token** : fragment de réponse du LLM
+        - **audio** : WAV base64 d'une phrase, envoyé dès qu'il est prêt
+        - **done** : réponse complète et durées de chaque étape (`timings`, en ms)
+        """
+        ticket = scheduler.classify(request.headers, request.client.host if request.client else None)
+
+        async def ndjson():
+            async for event in _admitted_voice_turn(payload, ticket):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @voice_router.websocket("/voice/ws")
+    async def voice_turn_ws(websocket: WebSocket, token: Optional[str] = None):
+        """Variante WebSocket de /voice/turn.
+
+        Authentification par `?token=<JWT>`. Chaque message reçu est un
+        VoiceTurnRequest JSON ; les événements du tour sont renvoyés un par un.
+        """
+        try:
+            decode_access_token(token or "")
+        except HTTPException:
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        host = websocket.client.host if websocket.client else None
+        try:
+            while True:
+                data = await websocket.receive_json()
+                try:
+                    req = VoiceTurnRequest(**data)
+                except Exception as err:
+                    await websocket.send_json({"type": "error", "stage": "request", "detail": str(err)})
+                    continue
+                ticket = scheduler.classify(websocket.headers, host)
+                async for event in _admitted_voice_turn(req, ticket):
+                    await websocket.send_json(event)
+        except WebSocketDisconnect:
+            pass
 
 @app.get("/docs", include_in_schema=False)
 async def custom_swagger_ui_html():
@@ -204,6 +516,101 @@ async def metrics():
     """Métriques Prometheus"""
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
+# -----------------------------------------------------------------------------
+# Profilage à la demande (admin)
+# -----------------------------------------------------------------------------
+
+@app.get("/admin/profile/cpu", tags=["Monitoring"])
+async def profile_cpu(
+    seconds: float = 10.0,
+    interval_ms: float = 10.0,
+    format: str = "speedscope",
+    include_idle: bool = False,
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Échantillonne les piles Python de tous les threads pendant *seconds*.
+
+    - **format** : `speedscope` (JSON à ouvrir sur speedscope.app) ou
+      `folded` (piles repliées pour flamegraph.pl / inferno)
+    - **include_idle** : garder les threads en attente (I/O, verrous)
+    """
+    if format not in ("speedscope", "folded"):
+        raise HTTPException(status_code=400, detail="format attendu : speedscope ou folded")
+    if not 0 < seconds <= 120 or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds ∈ ]0, 120], interval_ms ∈ [1, 1000]")
+    try:
+        prof = await asyncio.to_thread(sample_cpu, seconds, interval_ms / 1000.0, include_idle)
+    except Busy as err:
+        raise HTTPException(status_code=409, detail=str(err))
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if format == "folded":
+        return Response(prof.folded(), media_type="text/plain",
+                        headers={"Content-Disposition": f'attachment; filename="cpu-{stamp}.folded"'})
+    return JSONResponse(prof.speedscope(),
+                        headers={"Content-Disposition": f'attachment; filename="cpu-{stamp}.speedscope.json"'})
+
+@app.post("/admin/profile/memory/start", tags=["Monitoring"])
+async def profile_memory_start(frames: int = 10, current_user: TokenData = Depends(get_current_user)):
+    """Démarre tracemalloc (*frames* niveaux de pile par allocation)."""
+    return memory_tracker.start(max(1, min(frames, 50)))
+
+@app.post("/admin/profile/memory/snapshot", tags=["Monitoring"])
+async def profile_memory_snapshot(limit: int = 25, group_by: str = "lineno", current_user: TokenData = Depends(get_current_user)):
+    """Top des allocations et différence avec l'instantané précédent."""
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by attendu : lineno, filename ou traceback")
+    try:
+        return await asyncio.to_thread(memory_tracker.snapshot, limit, group_by)
+    except RuntimeError as err:
+        raise HTTPException(status_code=409, detail=str(err))
+
+@app.post("/admin/profile/memory/stop", tags=["Monitoring"])
+async def profile_memory_stop(current_user: TokenData = Depends(get_current_user)):
+    """Arrête tracemalloc et libère ses données."""
+    return memory_tracker.stop()
+
+# Process d'inférence STT/TTS : routes montées si l'un des deux est actif
+if ENABLE_STT or ENABLE_TTS:
+    @app.post("/admin/profile/torch/{kind}", tags=["Monitoring"])
+    async def profile_torch(kind: str, payload: Dict[str, Any], row_limit: int = 30, current_user: TokenData = Depends(get_current_user)):
+        """Exécute une requête STT ou TTS sous torch.profiler.
+
+        Le corps est celui de `/stt` (kind=`stt`) ou de `/tts` (kind=`tts`). Avec
+        INFERENCE_PROCESSES=1, le profilage a lieu dans un process d'inférence
+        (celui qui a le modèle), sinon dans un créneau CPU du process API.
+        """
+        if kind not in ("stt", "tts"):
+            raise HTTPException(status_code=404, detail="kind attendu : stt ou tts")
+        if not (ENABLE_STT if kind == "stt" else ENABLE_TTS):
+            raise HTTPException(status_code=404, detail=f"Sous-système {kind} désactivé")
+        # Module importé seulement pour un sous-système actif
+        if kind == "stt":
+            from stt_service import STTRequest as request_model, decode_base64, transcribe_bytes
+        else:
+            from tts_service import TTSRequest as request_model, synthesize_wav
+        try:
+            req = request_model(**payload)
+        except ValueError as err:
+            raise HTTPException(status_code=422, detail=str(err))
+
+        try:
+            # Fonctions de module (picklables) : exécutables dans un process d'inférence
+            if kind == "stt":
+                audio = await asyncio.to_thread(decode_base64, req.audio)
+                run = functools.partial(transcribe_bytes, audio, req.language, req.model)
+            else:
+                run = functools.partial(synthesize_wav, req.text, req.language, req.model, req.voice_id, req.speed)
+            return await inference_pool.run(kind, torch_profile, run, row_limit, model=req.model)
+        except Busy as err:
+            raise HTTPException(status_code=409, detail=str(err))
+        except Exception as err:
+            raise HTTPException(status_code=500, detail=f"Erreur de profilage : {err}")
+
+    @app.get("/admin/inference/workers", tags=["Monitoring"])
+    async def inference_workers(current_user: TokenData = Depends(get_current_user)):
+        """État des process d'inférence : modèles chargés, file, mémoire, redémarrages."""
+        return {"enabled": inference_pool.enabled, "workers": inference_pool.describe()}
+
 @app.get("/health", tags=["Monitoring"])
 async def health_check():
     """Vérification de santé"""
@@ -211,9 +618,9 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
         "services": {
-            "llm": "ok",
-            "tts": "ok",
-            "stt": "ok"
+            "llm": "ok" if ENABLE_LLM else "disabled",
+            "tts": "ok" if ENABLE_TTS else "disabled",
+            "stt": "ok" if ENABLE_STT else "disabled"
         }
     }
 
@@ -224,9 +631,14 @@ async def health_check():
 # L'AI Agent d'n8n s'attend à un endpoint POST /v1/chat/completions au format
 # OpenAI. Nous l'implémentons en proxy vers get_ollama_response.
 
-# Permettre l'auth par clé secrète RunPod (Bearer <SECRET_KEY> ou X-API-KEY)
+# Permettre l'auth par clé API (Bearer <clé> ou X-API-KEY) : SECRET_KEY RunPod
+# ou toute clé déclarée dans API_KEYS / API_KEYS_FILE (voir auth.load_api_keys)
+
+def _check_secret_key(authorization: Optional[str], x_api_key: Optional[str]) -> None:
+    """Vérifie la clé API (Bearer ou X-API-KEY), sinon 401."""
+    check_api_key(authorization, x_api_key)
 
-@app.post("/v1/chat/completions", tags=["Compatibility"], include_in_schema=False)
+@llm_router.post("/v1/chat/completions", tags=["Compatibility"], include_in_schema=False)
 async def openai_compat(
     payload: Dict[str, Any],
     authorization: Optional[str] = Header(None),
@@ -242,16 +654,7 @@ async def openai_compat(
     """
 
     # --- Auth ----------------------------------------------------------------
-    secret_key = os.getenv("SECRET_KEY", "your-secret-key-here")
-
-    provided_token = None
-    if authorization and authorization.lower().startswith("bearer "):
-        provided_token = authorization.split(" ", 1)[1]
-    elif x_api_key:
-        provided_token = x_api_key
-
-    if provided_token != secret_key:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+    _check_secret_key(authorization, x_api_key)
 
     try:
         messages_in = payload.get("messages", [])
@@ -265,28 +668,11 @@ async def openai_compat(
         answer = await get_ollama_response(msg_objs, temperature, max_tokens, model)
 
         # Réponse au format OpenAI
-        return {
-            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
-            "object": "chat.completion",
-            "created": int(datetime.utcnow().timestamp()),
-            "model": model,
-            "choices": [
-                {
-                    "index": 0,
-                    "message": {"role": "assistant", "content": answer},
-                    "finish_reason": "stop"
-                }
-            ],
-            "usage": {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "total_tokens": 0
-            }
-        }
+        return openai_chat_completion(model, answer)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/v1/chat/completions", include_in_schema=False)
+@llm_router.get("/v1/chat/completions", include_in_schema=False)
 async def openai_compat_get(
     model: str,
     prompt: str,
@@ -304,57 +690,122 @@ async def openai_compat_get(
     }
     return await openai_compat(payload, authorization, x_api_key)
 
+# -----------------------------------------------------------------------------
+# Endpoint /v1/embeddings (proxy Ollama, requêtes regroupées et mises en cache)
+# -----------------------------------------------------------------------------
+
+@llm_router.post("/v1/embeddings", tags=["Compatibility"], include_in_schema=False)
+async def openai_embeddings(
+    payload: Dict[str, Any],
+    authorization: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None),
+):
+    """Compatibilité OpenAI v1 pour les embeddings (`input` chaîne ou liste,
+    `encoding_format` float ou base64)."""
+    _check_secret_key(authorization, x_api_key)
+    try:
+        return await create_embeddings(payload)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    except httpx.HTTPError as err:
+        raise HTTPException(status_code=500, detail=f"Erreur Ollama: {err}")
+
+@llm_router.post("/v1/embeddings/", include_in_schema=False)
+async def openai_embeddings_slash(payload: Dict[str, Any], authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
+    return await openai_embeddings(payload, authorization, x_api_key)
+
+# -----------------------------------------------------------------------------
+# Jobs batch hors ligne (/v1/batches, format proche de l'API OpenAI Batch)
+# -----------------------------------------------------------------------------
+
+@llm_router.post("/v1/batches", tags=["Compatibility"])
+async def create_batch(
+    file: UploadFile = File(..., description="Fichier JSONL : une requête chat par ligne"),
+    authorization: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None),
+):
+    """Crée un job batch à partir d'un fichier JSONL et renvoie son identifiant."""
+    _check_secret_key(authorization, x_api_key)
+
+    async def chunks():
+        while chunk := await file.read(1024 * 1024):
+            yield chunk
+
+    job = await batch_manager.create(chunks(), metadata={"filename": file.filename})
+    return job.public()
+
+@llm_router.get("/v1/batches", tags=["Compatibility"])
+async def list_batches(
+    limit: int = 20,
+    authorization: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None),
+):
+    """Liste les jobs batch les plus récents."""
+    _check_secret_key(authorization, x_api_key)
+    return {"object": "list", "data": batch_manager.list(limit)}
+
+@llm_router.get("/v1/batches/{batch_id}", tags=["Compatibility"])
+async def get_batch(batch_id: str, authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
+    """Statut et compteurs d'un job batch."""
+    _check_secret_key(authorization, x_api_key)
+    try:
+        return batch_manager.get(batch_id).public()
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job batch introuvable")
+
+@llm_router.get("/v1/batches/{batch_id}/output", tags=["Compatibility"])
+async def get_batch_output(batch_id: str, authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
+    """Télécharge le JSONL des résultats (partiel tant que le job tourne)."""
+    _check_secret_key(authorization, x_api_key)
+    try:
+        job = batch_manager.get(batch_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job batch introuvable")
+    if not job.results_path.exists():
+        raise HTTPException(status_code=404, detail="Aucun résultat disponible pour le moment")
+    return FileResponse(job.results_path, media_type="application/jsonl", filename=f"{batch_id}_output.jsonl")
+
+@llm_router.post("/v1/batches/{batch_id}/cancel", tags=["Compatibility"])
+async def cancel_batch(batch_id: str, authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
+    """Annule un job batch en cours (les résultats déjà écrits sont conservés)."""
+    _check_secret_key(authorization, x_api_key)
+    try:
+        return batch_manager.cancel(batch_id).public()
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job batch introuvable")
+
 # -----------------------------------------------------------------------------
 # Endpoint /v1/models  (utilisé par n8n pour tester la connexion OpenAI)
 # -----------------------------------------------------------------------------
 
-@app.get("/v1/models", tags=["Compatibility"], include_in_schema=False)
+@llm_router.get("/v1/models", tags=["Compatibility"], include_in_schema=False)
 async def list_models(
     authorization: Optional[str] = Header(None),
     x_api_key: Optional[str] = Header(None),
 ):
     """Renvoie la liste des modèles disponibles au format OpenAI.
 
-    Nécessaire pour que le test de connexion OpenAI (n8n) passe.
+    Nécessaire pour que le test de connexion OpenAI (n8n) passe. La liste est
+    servie depuis le catalogue en mémoire (modèles Ollama installés + TTS/STT).
     """
 
-    secret_key = os.getenv("SECRET_KEY", "your-secret-key-here")
-    provided = None
-    if authorization and authorization.lower().startswith("bearer "):
-        provided = authorization.split(" ", 1)[1]
-    elif x_api_key:
-        provided = x_api_key
-
-    if provided != secret_key:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-
-    model_name = os.getenv("MODEL_NAME", "mistral")
-    return {
-        "data": [
-            {
-                "id": model_name,
-                "object": "model",
-                "created": int(datetime.utcnow().timestamp()),
-                "owned_by": "runpod-local"
-            }
-        ],
-        "object": "list"
-    }
+    _check_secret_key(authorization, x_api_key)
+    return await model_catalog.openai_models()
 
 # -- Variant with trailing slash ------------------------------------------------
 
-@app.get("/v1/models/", include_in_schema=False)
+@llm_router.get("/v1/models/", include_in_schema=False)
 async def list_models_slash(authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
     """Alias avec slash final pour compatibilité clients."""
     return await list_models(authorization, x_api_key)
 
 # Alias pour /v1/chat/completions/ (POST et GET) --------------------------------
 
-@app.post("/v1/chat/completions/", include_in_schema=False)
+@llm_router.post("/v1/chat/completions/", include_in_schema=False)
 async def openai_compat_post_slash(payload: Dict[str, Any], authorization: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)):
     return await openai_compat(payload, authorization, x_api_key)
 
-@app.get("/v1/chat/completions/", include_in_schema=False)
+@llm_router.get("/v1/chat/completions/", include_in_schema=False)
 async def openai_compat_get_slash(
     model: str,
     prompt: str,
@@ -421,84 +872,172 @@ async def test_upload(
 # Gestion des voix clonées (XTTS)
 # -----------------------------------------------------------------------------
 
-class VoiceUploadResponse(BaseModel):
-    voice_id: str
+if ENABLE_TTS:
+    from voice_service import save_voice_sample, delete_voice, list_voices, voice_index, VoiceRecord
+    from voice_service import VOICE_MAX_UPLOAD_BYTES, check_wav_header, spool_wav_upload, save_voice_wav_stream
 
+    class VoiceUploadResponse(BaseModel):
+        voice_id: str
 
-@app.post(
-    "/voices",
-    tags=["Voices"],
-    response_model=VoiceUploadResponse,
-    summary="Upload d'un échantillon de voix (WAV)",
-    description=(
-        "Permet d'uploader un échantillon audio WAV pour XTTS.\n\n"
-        "Le fichier doit être un .wav mono ou stéréo. Il sera resamplé à 16kHz si besoin.\n"
-        "Champ 'name' optionnel pour l'identifiant."
-    ),
-)
-async def upload_voice(
-    file: UploadFile = File(..., description="Fichier .wav à uploader"),
-    name: str | None = Form(None, description="Nom/ID souhaité (optionnel)"),
-    current_user: TokenData = Depends(get_current_user),
-):
-    print(f"[UPLOAD] Début upload voix : name={name}, filename={file.filename}")
-    
-    # Validation du fichier
-    if not file.filename or not file.filename.lower().endswith('.wav'):
-        raise HTTPException(status_code=400, detail="Le fichier doit être un fichier WAV (.wav)")
-    
-    if file.size and file.size > 50 * 1024 * 1024:  # 50MB max
-        raise HTTPException(status_code=400, detail="Le fichier est trop volumineux (max 50MB)")
-    
-    try:
-        # Lecture du contenu
-        print(f"[UPLOAD] Lecture du fichier...")
-        content_bytes = await file.read()
-        print(f"[UPLOAD] Fichier lu : {len(content_bytes)} bytes")
-        
-        # Validation du contenu
-        if len(content_bytes) == 0:
-            raise HTTPException(status_code=400, detail="Le fichier est vide")
-        
-        # Import et traitement
-        from voice_service import save_voice_wav_file
-        print(f"[UPLOAD] Début traitement avec voice_service...")
-        vid = save_voice_wav_file(content_bytes, name)
-        print(f"[UPLOAD] Fin upload voix : voice_id={vid}")
-        return VoiceUploadResponse(voice_id=vid)
-        
-    except Exception as err:
+    class VoicePage(BaseModel):
+        total: int
+        offset: int
+        limit: int
+        items: list[VoiceRecord]
+
+    @app.on_event("startup")
+    async def sync_voice_index():
+        """Réconcilie l'index des voix avec VOICES_DIR (une seule fois, hors boucle)."""
+        added, removed = await asyncio.to_thread(voice_index.sync)
+        if added or removed:
+            print(f"[VOICES] Index synchronisé : {added} ajoutée(s), {removed} retirée(s)")
+
+    @tts_router.post(
+        "/voices",
+        tags=["Voices"],
+        response_model=VoiceUploadResponse,
+        summary="Upload d'un échantillon de voix (WAV)",
+        description=(
+            "Permet d'uploader un échantillon audio WAV pour XTTS.\n\n"
+            "Le fichier doit être un .wav mono ou stéréo. Il sera resamplé à 16kHz si besoin,\n"
+            "puis conditionné (silences retirés, niveau normalisé, meilleures secondes gardées).\n"
+            "Champ 'name' optionnel pour l'identifiant. Si un échantillon identique existe\n"
+            "déjà, l'identifiant de la voix existante est renvoyé."
+        ),
+    )
+    async def upload_voice(
+        file: UploadFile = File(..., description="Fichier .wav à uploader"),
+        name: str | None = Form(None, description="Nom/ID souhaité (optionnel)"),
+        condition: bool | None = Form(None, description="Retirer les silences, normaliser et garder les meilleures secondes"),
+        keep_raw: bool | None = Form(None, description="Conserver aussi l'échantillon non conditionné"),
+        current_user: TokenData = Depends(get_current_user),
+    ):
+        print(f"[UPLOAD] Début upload voix : name={name}, filename={file.filename}")
+
+        # Validation du fichier
+        if not file.filename or not file.filename.lower().endswith('.wav'):
+            raise HTTPException(status_code=400, detail="Le fichier doit être un fichier WAV (.wav)")
+
+        if file.size and file.size > VOICE_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=400, detail="Le fichier est trop volumineux (max 50MB)")
+
+        try:
+            # Validation de l'en-tête uniquement : le contenu est ensuite lu par blocs
+            # depuis le fichier temporaire de l'upload, jamais chargé en entier
+            head = await file.read(64 * 1024)
+            if len(head) == 0:
+                raise HTTPException(status_code=400, detail="Le fichier est vide")
+            if check_wav_header(head) is None:
+                raise ValueError("not a WAV file (en-tête incomplet)")
+            await file.seek(0)
+
+            print(f"[UPLOAD] Début traitement avec voice_service...")
+            vid = await asyncio.to_thread(save_voice_wav_stream, file.file, name, condition, keep_raw)
+            print(f"[UPLOAD] Fin upload voix : voice_id={vid}")
+            return VoiceUploadResponse(voice_id=vid)
+
+        except HTTPException:
+            raise
+        except Exception as err:
+            raise _voice_upload_error(err)
+
+    @tts_router.put(
+        "/voices/{voice_id}",
+        tags=["Voices"],
+        response_model=VoiceUploadResponse,
+        summary="Upload en flux d'un échantillon de voix (corps WAV brut)",
+        description=(
+            "Le corps de la requête est le fichier WAV lui-même (Content-Type: audio/wav),\n"
+            "ou son encodage base64 (Content-Type: text/plain, data URI accepté), décodé\n"
+            "au fil de l'envoi. L'en-tête est validé dès les premiers octets : un fichier\n"
+            "invalide ou trop volumineux est rejeté sans attendre la fin de l'envoi."
+        ),
+    )
+    async def put_voice(
+        voice_id: str,
+        request: Request,
+        condition: bool | None = None,
+        keep_raw: bool | None = None,
+        current_user: TokenData = Depends(get_current_user),
+    ):
+        chunks = request.stream()
+        if request.headers.get("content-type", "").startswith("text/plain"):
+            chunks = adecode_chunks(chunks)
+        try:
+            spool = await spool_wav_upload(chunks)
+        except ValueError as err:
+            status = 413 if "volumineux" in str(err) else 400
+            raise HTTPException(status_code=status, detail=str(err))
+        try:
+            vid = await asyncio.to_thread(save_voice_wav_stream, spool, voice_id, condition, keep_raw)
+            return VoiceUploadResponse(voice_id=vid)
+        except Exception as err:
+            raise _voice_upload_error(err)
+        finally:
+            spool.close()
+
+    def _voice_upload_error(err: Exception) -> HTTPException:
+        """Convertit une erreur de traitement d'échantillon en réponse HTTP."""
         print(f"[UPLOAD] Erreur traitement voix : {err}")
         print(f"[UPLOAD] Type d'erreur : {type(err).__name__}")
         import traceback
         print(f"[UPLOAD] Traceback : {traceback.format_exc()}")
-        
+
         # Gestion spécifique des erreurs
-        if "Invalid data" in str(err) or "not a WAV file" in str(err):
-            raise HTTPException(status_code=400, detail="Le fichier n'est pas un WAV valide")
+        if "Invalid data" in str(err) or "not a WAV file" in str(err) or "Format audio invalide" in str(err):
+            return HTTPException(status_code=400, detail="Le fichier n'est pas un WAV valide")
+        elif "Identifiant de voix invalide" in str(err):
+            return HTTPException(status_code=400, detail=str(err))
         elif "No space left" in str(err):
-            raise HTTPException(status_code=507, detail="Espace disque insuffisant")
+            return HTTPException(status_code=507, detail="Espace disque insuffisant")
         elif "Permission denied" in str(err):
-            raise HTTPException(status_code=500, detail="Erreur de permissions sur le système de fichiers")
+            return HTTPException(status_code=500, detail="Erreur de permissions sur le système de fichiers")
         else:
-            raise HTTPException(status_code=500, detail=f"Erreur lors du traitement : {str(err)}")
+            return HTTPException(status_code=500, detail=f"Erreur lors du traitement : {str(err)}")
 
-@app.get("/voices", tags=["Voices"], response_model=list)
-async def list_available_voices(current_user: TokenData = Depends(get_current_user)):
-    """Liste des voix clonées disponibles."""
-    return list_voices()
+    @tts_router.get("/voices", tags=["Voices"], response_model=list)
+    async def list_available_voices(
+        offset: int = 0,
+        limit: Optional[int] = None,
+        prefix: Optional[str] = None,
+        current_user: TokenData = Depends(get_current_user),
+    ):
+        """Liste des voix clonées disponibles (servie depuis l'index en mémoire)."""
+        return list_voices(offset, limit, prefix)
 
-@app.delete("/voices/{voice_id}", tags=["Voices"])
-async def remove_voice(voice_id: str, current_user: TokenData = Depends(get_current_user)):
-    """Supprime un échantillon de voix."""
-    delete_voice(voice_id)
-    return {"status": "deleted", "voice_id": voice_id}
+    @tts_router.get("/voices/details", tags=["Voices"], response_model=VoicePage)
+    async def list_voice_details(
+        offset: int = 0,
+        limit: int = 100,
+        prefix: Optional[str] = None,
+        min_duration: Optional[float] = None,
+        max_duration: Optional[float] = None,
+        current_user: TokenData = Depends(get_current_user),
+    ):
+        """Listing paginé des voix avec leurs métadonnées (durée, fréquence, taille, hash)."""
+        limit = max(1, min(limit, 1000))
+        total, items = voice_index.query(offset, limit, prefix, min_duration, max_duration)
+        return VoicePage(total=total, offset=offset, limit=limit, items=items)
+
+    @tts_router.get("/voices/{voice_id}", tags=["Voices"], response_model=VoiceRecord)
+    async def get_voice(voice_id: str, current_user: TokenData = Depends(get_current_user)):
+        """Métadonnées d'une voix."""
+        record = voice_index.get(voice_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Voix introuvable")
+        return record
+
+    @tts_router.delete("/voices/{voice_id}", tags=["Voices"])
+    async def remove_voice(voice_id: str, current_user: TokenData = Depends(get_current_user)):
+        """Supprime un échantillon de voix."""
+        delete_voice(voice_id)
+        return {"status": "deleted", "voice_id": voice_id}
 
 # -----------------------------------------------------------------------------
 # Route de compatibilité Ollama native (/api/chat)
 # -----------------------------------------------------------------------------
 
-@app.post("/api/chat", tags=["Compatibility"], include_in_schema=False)
+@llm_router.post("/api/chat", tags=["Compatibility"], include_in_schema=False)
 async def ollama_native_chat(payload: Dict[str, Any]):
     """Compatibilité avec l'endpoint natif d'Ollama (/api/chat).
 
@@ -550,18 +1089,30 @@ async def ollama_native_chat(payload: Dict[str, Any]):
 # Route de compatibilité Ollama pour la liste des modèles (/api/tags)
 # -----------------------------------------------------------------------------
 
-@app.get("/api/tags", tags=["Compatibility"], include_in_schema=False)
+@llm_router.get("/api/tags", tags=["Compatibility"], include_in_schema=False)
 async def ollama_native_tags():
     """Renvoie la liste des modèles disponibles depuis l'instance Ollama.
 
     Cette route est appelée par les clients comme n8n pour remplir le menu
-    déroulant des modèles.
+    déroulant des modèles. Elle est servie depuis le catalogue en mémoire,
+    rafraîchi en arrière-plan : les appels répétés ne sollicitent pas Ollama.
     """
-    ollama_host = _ollama_base()
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(f"{ollama_host}/api/tags", timeout=10.0)
-            resp.raise_for_status()
-            return resp.json()
-        except httpx.HTTPError as err:
-            raise HTTPException(status_code=500, detail=f"Erreur Ollama: {err}")
\ No newline at end of file
+    try:
+        return await model_catalog.ollama_tags()
+    except httpx.HTTPError as err:
+        raise HTTPException(status_code=500, detail=f"Erreur Ollama: {err}")
+
+# -----------------------------------------------------------------------------
+# Montage des sous-systèmes activés
+# -----------------------------------------------------------------------------
+
+if ENABLE_LLM:
+    app.include_router(llm_router)
+if ENABLE_STT:
+    app.include_router(stt_router)
+if ENABLE_TTS:
+    app.include_router(tts_router)
+if ENABLE_LLM and ENABLE_STT and ENABLE_TTS:
+    app.include_router(voice_router)
+if ENABLE_STT or ENABLE_TTS:
+    app.include_router(jobs_router)
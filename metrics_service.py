@@ -0,0 +1,135 @@
+"""Métriques Prometheus partagées par les services (STT, TTS, HTTP, process).
+
+• inference_stage_seconds{service, stage} : durée de chaque étape
+  (base64_decode, audio_decode, resample, model_load, model_acquire,
+  inference, encode) ;
+• inference_real_time_factor{service, model} : temps de calcul / durée audio ;
+• inference_waiting{service} : requêtes en attente du modèle (verrou) ;
+• http_requests_in_flight : requêtes HTTP en cours ;
+• lazy_import_seconds{module} : durée d'import des dépendances lourdes,
+  importées au premier usage (lazy_import) ;
+• app_process_* : RSS, CPU et threads du process, lus via psutil au moment
+  du scrape uniquement (aucun coût entre deux scrapes).
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+import psutil
+from prometheus_client import REGISTRY, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+from tracing_service import record_span, span
+
+_STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0, 10.0)
+
+STAGE_SECONDS = Histogram(
+    "inference_stage_seconds", "Durée des étapes STT/TTS", ["service", "stage"], buckets=_STAGE_BUCKETS
+)
+REAL_TIME_FACTOR = Histogram(
+    "inference_real_time_factor", "Temps de calcul / durée de l'audio", ["service", "model"], buckets=_RTF_BUCKETS
+)
+INFERENCE_WAITING = Gauge("inference_waiting", "Requêtes en attente du modèle", ["service"])
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requêtes HTTP en cours de traitement")
+IMPORT_SECONDS = Gauge("lazy_import_seconds", "Durée d'import au premier usage", ["module"])
+
+
+def lazy_import(name: str):
+    """Importe le module *name* au premier usage et mesure la durée de cet import."""
+    if name in sys.modules:
+        return importlib.import_module(name)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - start
+    IMPORT_SECONDS.labels(name).set(elapsed)
+    print(f"[IMPORT] {name} chargé en {elapsed:.2f}s")
+    return module
+
+
+@contextmanager
+def stage(service: str, name: str):
+    """Mesure la durée du bloc dans inference_stage_seconds (et comme étape de trace)."""
+    start = time.perf_counter()
+    try:
+        with span(f"{service}.{name}"):
+            yield
+    finally:
+        STAGE_SECONDS.labels(service, name).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def acquire(service: str, lock: threading.Lock):
+    """Prend *lock* en comptant l'attente (gauge + étape model_acquire)."""
+    start = time.perf_counter()
+    start_ns = time.time_ns()
+    waiting = INFERENCE_WAITING.labels(service)
+    waiting.inc()
+    try:
+        lock.acquire()
+    finally:
+        waiting.dec()
+    STAGE_SECONDS.labels(service, "model_acquire").observe(time.perf_counter() - start)
+    record_span(f"{service}.model_acquire", start_ns)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+# Observations RTF à renvoyer au process API (process d'inférence, voir inference_pool_service)
+_RTF_CAPTURE: ContextVar[Optional[List[tuple]]] = ContextVar("rtf_capture", default=None)
+
+
+def observe_rtf(service: str, model: str, seconds: float, audio_seconds: float) -> None:
+    if audio_seconds > 0:
+        REAL_TIME_FACTOR.labels(service, model).observe(seconds / audio_seconds)
+    captured = _RTF_CAPTURE.get()
+    if captured is not None:
+        captured.append((service, model, seconds, audio_seconds))
+
+
+@contextmanager
+def capture_rtf():
+    """Collecte les appels à observe_rtf du bloc (en plus de l'histogramme local)."""
+    captured: List[tuple] = []
+    token = _RTF_CAPTURE.set(captured)
+    try:
+        yield captured
+    finally:
+        _RTF_CAPTURE.reset(token)
+
+
+class _ProcessCollector:
+    """RSS, CPU et threads du process, lus à chaque scrape.
+
+    L'objet psutil est recréé quand le PID change : importé avant le fork
+    (serve.py), il désignerait sinon le process parent dans chaque worker.
+    """
+
+    def __init__(self):
+        self._proc: Optional[psutil.Process] = None
+
+    def _process(self) -> psutil.Process:
+        if self._proc is None or self._proc.pid != os.getpid():
+            self._proc = psutil.Process()
+            self._proc.cpu_percent(None)  # amorce la mesure CPU
+        return self._proc
+
+    def collect(self):
+        proc = self._process()
+        with proc.oneshot():
+            rss = proc.memory_info().rss
+            cpu = proc.cpu_percent(None)
+            threads = proc.num_threads()
+        yield GaugeMetricFamily("app_process_rss_bytes", "Mémoire résidente du process", value=rss)
+        yield GaugeMetricFamily("app_process_cpu_percent", "CPU du process depuis le dernier scrape", value=cpu)
+        yield GaugeMetricFamily("app_process_threads", "Nombre de threads du process", value=threads)
+
+
+REGISTRY.register(_ProcessCollector())
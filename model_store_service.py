@@ -0,0 +1,392 @@
+"""Magasin local des modèles : un téléchargement (ou import), vérifié, chargé par mmap.
+
+Chaque modèle est un artefact de MODEL_STORE_DIR décrit dans `manifest.json`
+(source, fichiers, taille et SHA-256 de chacun) :
+
+• whisper/<nom> : le checkpoint `.pt` officiel est téléchargé (ou importé
+  depuis ~/.cache/whisper) et vérifié contre le SHA-256 publié dans son
+  URL, puis converti une fois pour toutes en `model.safetensors` (float32).
+  Au chargement, les poids sont projetés en mémoire (mmap) au lieu d'être
+  dépicklés : pas de copie en RAM, pages partagées dans le cache disque
+  entre tous les process qui chargent le même modèle (workers serve.py,
+  process d'inférence) ;
+• coqui/<nom> : modèles Coqui TTS (`tts_models/...`), téléchargés par le
+  ModelManager de Coqui dans le magasin (TTS_HOME y pointe par défaut) ;
+  Coqui charge lui-même ses checkpoints, le magasin garantit leur intégrité
+  et l'absence de réseau ;
+• hf/<dépôt> : instantané d'un dépôt Hugging Face, fichiers LFS vérifiés
+  contre les SHA-256 publiés par le Hub.
+
+Les artefacts absents sont récupérés au premier usage, sous verrou de
+fichier (plusieurs process ne téléchargent jamais deux fois). Avec
+MODEL_STORE_OFFLINE=1, seul le contenu du magasin est utilisé : un modèle
+absent est une erreur, jamais un téléchargement. Au chargement, taille des
+fichiers contrôlée ; SHA-256 recalculé seulement avec MODEL_STORE_VERIFY=1
+(ou `verify`).
+
+CLI (remplace les scripts de préchargement du Dockerfile et de start.sh) :
+    python model_store_service.py fetch [whisper:base tts:tts_models/fr/css10/vits hf:facebook/mms-tts-fra ...]
+    python model_store_service.py import whisper:base ~/Téléchargements/base.pt
+    python model_store_service.py verify
+    python model_store_service.py list
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics_service import lazy_import
+
+MODEL_STORE_DIR = Path(os.path.expanduser(os.getenv("MODEL_STORE_DIR", "~/.cache/model-store")))
+MODEL_STORE_OFFLINE = os.getenv("MODEL_STORE_OFFLINE", "0") == "1"
+MODEL_STORE_VERIFY = os.getenv("MODEL_STORE_VERIFY", "0") == "1"
+MODEL_STORE_RETRIES = int(os.getenv("MODEL_STORE_RETRIES", "3"))
+# Artefacts de `fetch` sans argument (image Docker, start.sh)
+MODEL_STORE_FETCH = os.getenv(
+    "MODEL_STORE_FETCH",
+    "whisper:base,hf:facebook/mms-tts-fra,tts:tts_models/fr/css10/vits,tts:tts_models/multilingual/multi-dataset/xtts_v2",
+)
+
+# Coqui range ses modèles sous TTS_HOME : par défaut, dans le magasin
+os.environ.setdefault("TTS_HOME", str(MODEL_STORE_DIR / "coqui"))
+if MODEL_STORE_OFFLINE:
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+_HASH_BLOCK = 1 << 20
+_WHISPER_CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))) / "whisper"
+# Initialisations de torch.nn.init neutralisées pendant la construction d'un
+# modèle dont tous les poids viennent ensuite du fichier
+_INIT_FUNCTIONS = ("uniform_", "normal_", "trunc_normal_", "constant_", "ones_", "zeros_",
+                   "kaiming_uniform_", "kaiming_normal_", "xavier_uniform_", "xavier_normal_")
+
+
+class ArtifactMissing(RuntimeError):
+    """Artefact absent du magasin (et mode hors ligne, ou source inconnue)."""
+
+
+class ArtifactCorrupted(RuntimeError):
+    """Fichier d'artefact absent, tronqué ou de somme de contrôle différente."""
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _artifact_id(kind: str, name: str) -> str:
+    return f"{kind}/{name.replace('/', '--')}"
+
+
+def parse_specs(value: str) -> List[tuple]:
+    """`whisper:base,tts:tts_models/fr/css10/vits` → [("whisper", "base"), ("tts", ...)]."""
+    specs = []
+    for item in filter(None, (v.strip() for v in value.replace(",", " ").split())):
+        kind, sep, name = item.partition(":")
+        if not sep or kind not in ("whisper", "tts", "hf"):
+            raise ValueError(f"Artefact invalide : {item} (attendu whisper:<nom>, tts:<nom> ou hf:<dépôt>)")
+        specs.append((kind, name))
+    return specs
+
+
+def _skip_init():
+    """Mode torch qui rend sans effet les initialisations de torch.nn.init.
+
+    Sert à construire un modèle dont tous les poids viennent ensuite du
+    fichier. Les modes `__torch_function__` sont propres au thread qui les
+    active : un modèle construit en parallèle dans un autre thread (créneau
+    CPU voisin) garde son initialisation normale. Le device `meta` éviterait
+    aussi l'initialisation, mais Whisper y calcule son masque (triu_, to_sparse
+    non supporté) et le premier usage importe les décompositions de torch
+    (~1,5 s par process)."""
+    torch = lazy_import("torch")
+    init_functions = {getattr(torch.nn.init, name) for name in _INIT_FUNCTIONS}
+
+    class SkipInit(torch.overrides.TorchFunctionMode):
+        def __torch_function__(self, func, types, args=(), kwargs=None):
+            kwargs = kwargs or {}
+            if func in init_functions:
+                return args[0] if args else kwargs["tensor"]
+            return func(*args, **kwargs)
+
+    return SkipInit()
+
+
+class ModelStore:
+    """Artefacts de *root* : récupération unique, vérification, chargement."""
+
+    def __init__(self, root: Path = MODEL_STORE_DIR, offline: bool = MODEL_STORE_OFFLINE,
+                 verify: bool = MODEL_STORE_VERIFY, retries: int = MODEL_STORE_RETRIES):
+        self.root = Path(root)
+        self.offline = offline
+        self.verify = verify
+        self.retries = max(1, retries)
+
+    # --- manifeste et verrous ---
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / "manifest.json"
+
+    def manifest(self) -> Dict[str, Any]:
+        try:
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    @contextmanager
+    def _lock(self, name: str):
+        """Verrou inter-process (fichier) : un seul téléchargement par artefact."""
+        locks = self.root / ".locks"
+        locks.mkdir(parents=True, exist_ok=True)
+        with open(locks / f"{name.replace('/', '--')}.lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _record(self, artifact_id: str, entry: Optional[Dict[str, Any]]) -> None:
+        with self._lock("manifest"):
+            manifest = self.manifest()
+            if entry is None:
+                manifest.pop(artifact_id, None)
+            else:
+                manifest[artifact_id] = entry
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = self.manifest_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.manifest_path)
+
+    def _entry(self, artifact_id: str, kind: str, name: str, source: str, folder: Path, **extra) -> Dict[str, Any]:
+        files = {}
+        for path in sorted(p for p in folder.rglob("*") if p.is_file()):
+            files[str(path.relative_to(folder))] = {"size": path.stat().st_size, "sha256": sha256_file(path)}
+        return {"kind": kind, "name": name, "source": source, "path": str(folder.relative_to(self.root)),
+                "files": files, "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), **extra}
+
+    # --- contrôle et récupération ---
+
+    def check(self, artifact_id: str, full: Optional[bool] = None) -> Path:
+        """Dossier de l'artefact, après contrôle des tailles (et des SHA-256 si *full*)."""
+        entry = self.manifest().get(artifact_id)
+        if entry is None:
+            raise ArtifactMissing(f"{artifact_id} absent du magasin {self.root}")
+        folder = self.root / entry["path"]
+        for rel, meta in entry["files"].items():
+            path = folder / rel
+            if not path.is_file() or path.stat().st_size != meta["size"]:
+                raise ArtifactCorrupted(f"{artifact_id} : {rel} absent ou tronqué")
+            if (self.verify if full is None else full) and sha256_file(path) != meta["sha256"]:
+                raise ArtifactCorrupted(f"{artifact_id} : SHA-256 de {rel} invalide")
+        return folder
+
+    def ensure(self, artifact_id: str, fetcher: Callable[[], Dict[str, Any]], force: bool = False) -> Path:
+        """Dossier de l'artefact, récupéré par *fetcher* s'il manque (jamais hors ligne)."""
+        if not force:
+            try:
+                return self.check(artifact_id)
+            except ArtifactMissing:
+                pass
+        if self.offline:
+            raise ArtifactMissing(
+                f"{artifact_id} absent du magasin {self.root} (MODEL_STORE_OFFLINE=1) : "
+                f"lancer `python model_store_service.py fetch` avec accès réseau"
+            )
+        with self._lock(artifact_id):
+            if not force:
+                try:
+                    return self.check(artifact_id)   # récupéré entre-temps par un autre process
+                except ArtifactMissing:
+                    pass
+            for attempt in range(1, self.retries + 1):
+                try:
+                    start = time.perf_counter()
+                    self._record(artifact_id, fetcher())
+                    print(f"[STORE] {artifact_id} prêt en {time.perf_counter() - start:.1f}s")
+                    break
+                except (OSError, RuntimeError) as err:
+                    if attempt == self.retries or isinstance(err, ArtifactCorrupted):
+                        raise
+                    print(f"[STORE] {artifact_id} : échec {attempt}/{self.retries} ({err}), nouvel essai")
+                    time.sleep(5 * attempt)
+        return self.check(artifact_id, full=False)
+
+    # --- Whisper : .pt officiel → safetensors ---
+
+    def whisper_file(self, name: str) -> Path:
+        return self.root / "whisper" / name / "model.safetensors"
+
+    def _fetch_whisper(self, name: str, source: Optional[Path] = None) -> Dict[str, Any]:
+        whisper, torch = lazy_import("whisper"), lazy_import("torch")
+        save_file = lazy_import("safetensors.torch").save_file
+        url = whisper._MODELS[name]
+        expected = url.split("/")[-2]   # SHA-256 publié dans l'URL du checkpoint
+        folder = self.whisper_file(name).parent
+        folder.mkdir(parents=True, exist_ok=True)
+        cached = _WHISPER_CACHE_DIR / os.path.basename(url)
+        with tempfile.TemporaryDirectory(dir=folder) as tmp:
+            if source is None and cached.is_file() and sha256_file(cached) == expected:
+                source = cached
+            if source is None:
+                checkpoint, origin = Path(tmp) / os.path.basename(url), url
+                print(f"[STORE] Téléchargement de whisper/{name}…")
+                with urllib.request.urlopen(url) as response, open(checkpoint, "wb") as out:
+                    shutil.copyfileobj(response, out, _HASH_BLOCK)
+            else:
+                checkpoint, origin = Path(source), f"import:{Path(source).resolve()}"
+            if sha256_file(checkpoint) != expected:
+                raise ArtifactCorrupted(f"whisper/{name} : SHA-256 de {checkpoint.name} différent de {expected}")
+            state = torch.load(checkpoint, map_location="cpu", weights_only=True)
+            # float32 : le type des poids d'un modèle chargé par whisper.load_model
+            tensors = {k: v.float().contiguous() for k, v in state["model_state_dict"].items()}
+            tmp_file = Path(tmp) / "model.safetensors"
+            save_file(tensors, str(tmp_file), metadata={"dims": json.dumps(state["dims"]), "source_sha256": expected})
+            del state, tensors
+            os.replace(tmp_file, self.whisper_file(name))
+        return self._entry(_artifact_id("whisper", name), "whisper", name, origin, folder,
+                           format="safetensors", source_sha256=expected)
+
+    def import_whisper(self, name: str, source: Path) -> Path:
+        """Importe un checkpoint .pt local (vérifié contre le SHA-256 officiel)."""
+        return self.ensure(_artifact_id("whisper", name), lambda: self._fetch_whisper(name, Path(source)), force=True)
+
+    def load_whisper(self, name: str, device: str = "cpu"):
+        """Modèle Whisper dont les poids sont projetés depuis le magasin (mmap)."""
+        whisper, torch = lazy_import("whisper"), lazy_import("torch")
+        if name not in whisper._MODELS:
+            if self.offline and not os.path.isfile(name):
+                raise ArtifactMissing(f"Modèle Whisper inconnu hors ligne : {name}")
+            return whisper.load_model(name, device=device)  # chemin local d'un .pt personnalisé
+        self.ensure(_artifact_id("whisper", name), lambda: self._fetch_whisper(name))
+        safetensors = lazy_import("safetensors")
+        path = str(self.whisper_file(name))
+        with safetensors.safe_open(path, framework="pt") as f:
+            dims = whisper.model.ModelDimensions(**json.loads(f.metadata()["dims"]))
+        with _skip_init():
+            model = whisper.model.Whisper(dims)
+        # Tenseurs adossés au fichier (mmap, copie à l'écriture) : assign=True
+        # les garde tels quels au lieu de les recopier dans les paramètres
+        state = lazy_import("safetensors.torch").load_file(path, device="cpu")
+        model.load_state_dict(state, assign=True)  # strict : tout paramètre vient du fichier
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[name])
+        return model.to(device)
+
+    # --- Coqui TTS ---
+
+    def _fetch_coqui(self, name: str) -> Dict[str, Any]:
+        manager = lazy_import("TTS.utils.manage").ModelManager(progress_bar=False)
+        model_path, _config_path, _item = manager.download_model(name)
+        path = Path(model_path)
+        folder = path if path.is_dir() else path.parent
+        if self.root not in folder.resolve().parents:
+            raise RuntimeError(f"TTS_HOME ({os.environ.get('TTS_HOME')}) hors du magasin {self.root}")
+        return self._entry(_artifact_id("tts", name), "tts", name, f"coqui:{name}", folder, format="coqui")
+
+    def ensure_tts(self, name: str) -> Path:
+        """Modèle TTS présent et intact : Coqui (`tts_models/...`) ou dépôt Hugging Face."""
+        if not name.startswith("tts_models/"):
+            return self.ensure_hf(name)
+        return self.ensure(_artifact_id("tts", name), lambda: self._fetch_coqui(name))
+
+    # --- Hugging Face ---
+
+    def _fetch_hf(self, repo: str) -> Dict[str, Any]:
+        hub = lazy_import("huggingface_hub")
+        folder = self.root / "hf" / repo.replace("/", "--")
+        hub.snapshot_download(repo_id=repo, local_dir=str(folder))
+        shutil.rmtree(folder / ".cache", ignore_errors=True)  # métadonnées locales du Hub
+        info = hub.HfApi().model_info(repo, files_metadata=True)
+        entry = self._entry(_artifact_id("hf", repo), "hf", repo, f"hf:{repo}@{info.sha}", folder, format="hf")
+        for sibling in info.siblings:
+            lfs = getattr(sibling, "lfs", None)
+            meta = entry["files"].get(sibling.rfilename)
+            if lfs and meta and meta["sha256"] != lfs.sha256:
+                raise ArtifactCorrupted(f"hf/{repo} : SHA-256 de {sibling.rfilename} différent du Hub")
+        return entry
+
+    def ensure_hf(self, repo: str) -> Path:
+        return self.ensure(_artifact_id("hf", repo), lambda: self._fetch_hf(repo))
+
+    # --- commandes ---
+
+    def fetch(self, specs: List[tuple], force: bool = False) -> List[str]:
+        """Récupère (ou contrôle, hors ligne) chaque artefact ; renvoie les échecs."""
+        fetchers = {"whisper": self._fetch_whisper, "tts": self._fetch_coqui, "hf": self._fetch_hf}
+        failures = []
+        for kind, name in specs:
+            artifact_id = _artifact_id(kind, name)
+            try:
+                self.ensure(artifact_id, lambda: fetchers[kind](name), force=force)
+                print(f"✅ {artifact_id}")
+            except Exception as err:
+                print(f"⚠️  {artifact_id} : {err}")
+                failures.append(artifact_id)
+        return failures
+
+    def verify_all(self) -> List[str]:
+        """Recalcule les SHA-256 de tous les artefacts ; renvoie ceux invalides."""
+        failures = []
+        for artifact_id in sorted(self.manifest()):
+            try:
+                self.check(artifact_id, full=True)
+                print(f"✅ {artifact_id}")
+            except (ArtifactMissing, ArtifactCorrupted) as err:
+                print(f"❌ {err}")
+                failures.append(artifact_id)
+        return failures
+
+
+# Instance unique utilisée par l'application
+model_store = ModelStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Magasin local des modèles (Whisper, Coqui TTS, Hugging Face).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch = sub.add_parser("fetch", help="Télécharger / importer les artefacts manquants.")
+    fetch.add_argument("artifacts", nargs="*", help=f"whisper:<nom>, tts:<nom>, hf:<dépôt> (défaut : MODEL_STORE_FETCH)")
+    fetch.add_argument("--force", action="store_true", help="Récupérer à nouveau même si présent.")
+    imp = sub.add_parser("import", help="Importer un checkpoint Whisper local.")
+    imp.add_argument("artifact", help="whisper:<nom>")
+    imp.add_argument("path", help="Fichier .pt officiel (vérifié contre son SHA-256).")
+    sub.add_parser("verify", help="Recalculer toutes les sommes de contrôle.")
+    sub.add_parser("list", help="Lister les artefacts.")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "fetch":
+            failures = model_store.fetch(parse_specs(" ".join(args.artifacts) or MODEL_STORE_FETCH), args.force)
+        elif args.command == "import":
+            (kind, name), = parse_specs(args.artifact)
+            if kind != "whisper":
+                parser.error("seuls les checkpoints Whisper s'importent (whisper:<nom>)")
+            print(f"✅ {model_store.import_whisper(name, Path(args.path))}")
+            failures = []
+        elif args.command == "verify":
+            failures = model_store.verify_all()
+        else:
+            for artifact_id, entry in sorted(model_store.manifest().items()):
+                size = sum(f["size"] for f in entry["files"].values()) / 1024 / 1024
+                print(f"{artifact_id:60} {size:10.1f} Mo  {entry['fetched_at']}  {entry['source']}")
+            failures = []
+    except (ValueError, ArtifactMissing, ArtifactCorrupted) as err:
+        print(f"Erreur : {err}")
+        sys.exit(1)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
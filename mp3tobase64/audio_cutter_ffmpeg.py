@@ -1,13 +1,20 @@
 import argparse
+import functools
 import os
+import re
 import shlex
+import shutil
 import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Chemin FFmpeg par défaut. Peut être redéfini par l'argument CLI ou la variable d'env FFMPEG_PATH
 DEFAULT_FFMPEG = os.getenv("FFMPEG_PATH", "ffmpeg")
 
 
+@functools.lru_cache(maxsize=None)
 def ffmpeg_installed(ffmpeg_cmd: str) -> bool:
     """Vérifie que la commande ffmpeg est disponible."""
     try:
@@ -17,6 +24,18 @@ def ffmpeg_installed(ffmpeg_cmd: str) -> bool:
         return False
 
 
+def codec_args(output_path: str, reencode: bool) -> list:
+    """Options de codec : copie du flux, ou réencodage selon l'extension de sortie."""
+    if not reencode:
+        return ["-c", "copy"]
+    ext = Path(output_path).suffix.lower()
+    if ext in {".wav", ".wave"}:
+        return ["-acodec", "pcm_s16le"]
+    if ext in {".mp3"}:
+        return ["-acodec", "libmp3lame"]
+    return ["-acodec", "copy"]  # tentative copie si codec inconnu
+
+
 def cut_audio(input_path: str, start_sec: float, duration_sec: float, output_path: str | None = None, reencode: bool = False, ffmpeg_cmd: str = DEFAULT_FFMPEG):
     """Découpe n'importe quel fichier audio supporté par FFmpeg.
 
@@ -50,18 +69,7 @@ def cut_audio(input_path: str, start_sec: float, duration_sec: float, output_pat
         input_path,
     ]
 
-    if reencode:
-        # Choisit un codec en fonction de l'extension de sortie
-        ext = Path(output_path).suffix.lower()
-        if ext in {".wav", ".wave"}:
-            cmd += ["-acodec", "pcm_s16le"]
-        elif ext in {".mp3"}:
-            cmd += ["-acodec", "libmp3lame"]
-        else:
-            cmd += ["-acodec", "copy"]  # tentative copie si codec inconnu
-    else:
-        cmd += ["-c", "copy"]
-
+    cmd += codec_args(output_path, reencode)
     cmd.append(output_path)
 
     # Exécution
@@ -73,24 +81,239 @@ def cut_audio(input_path: str, start_sec: float, duration_sec: float, output_pat
     return output_path
 
 
+# ---------------------------------------------------------------------------
+# Découpe par lots : tous les segments d'un fichier en une seule lecture
+# ---------------------------------------------------------------------------
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def probe_duration(input_path: str, ffmpeg_cmd: str = DEFAULT_FFMPEG) -> float | None:
+    """Durée du fichier en secondes, lue dans l'en-tête de `ffmpeg -i` (None si inconnue)."""
+    process = subprocess.run([ffmpeg_cmd, "-hide_banner", "-i", input_path], capture_output=True, text=True)
+    match = _DURATION_RE.search(process.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def parse_ranges(text: str) -> list[tuple[float, float]]:
+    """Lit des plages `début:durée` séparées par des virgules ou des retours à la ligne.
+
+    Dans un fichier, `début durée`, `début,durée` ou `début;durée` par ligne
+    sont aussi acceptés ; lignes vides et commentaires (#) sont ignorés.
+    """
+    ranges = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        for item in line.split(",") if ":" in line else [line]:
+            parts = [part for part in re.split(r"[\s:,;]+", item.strip()) if part]
+            if len(parts) != 2:
+                raise ValueError(f"Plage invalide : {item!r} (attendu début:durée)")
+            start, duration = float(parts[0]), float(parts[1])
+            if start < 0 or duration <= 0:
+                raise ValueError(f"Plage invalide : {item!r} (début >= 0 et durée > 0)")
+            ranges.append((start, duration))
+    return ranges
+
+
+def _run_ffmpeg(cmd: list) -> None:
+    process = subprocess.run(cmd, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg a échoué :\n{process.stderr}")
+
+
+def _check_input(input_path: str, ffmpeg_cmd: str) -> Path:
+    if not ffmpeg_installed(ffmpeg_cmd):
+        raise RuntimeError("FFmpeg n'est pas installé ou pas présent dans le PATH.")
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Fichier introuvable : {input_path}")
+    return Path(os.path.abspath(input_path))
+
+
+def _layers(ranges: list[tuple[float, float]]) -> list[list[tuple[int, tuple[float, float]]]]:
+    """Répartit les plages (avec leur indice) en couches sans chevauchement, triées par début."""
+    layers: list[list] = []  # [fin de la dernière plage, [(indice, plage), ...]]
+    for index, (start, duration) in sorted(enumerate(ranges), key=lambda item: item[1][0]):
+        for layer in layers:
+            if layer[0] <= start + 1e-6:
+                break
+        else:
+            layer = [0.0, []]
+            layers.append(layer)
+        layer[0] = start + duration
+        layer[1].append((index, (start, duration)))
+    return [items for _, items in layers]
+
+
+# Écart admis entre une coupe demandée et le début réel d'un morceau (coupe
+# au paquet près en copie de flux), et entre la fin d'une plage et la durée
+_BOUNDARY_TOLERANCE = 0.1
+
+
+def cut_ranges(input_path: str, ranges: list[tuple[float, float]], output_dir: str | None = None,
+               reencode: bool = False, ffmpeg_cmd: str = DEFAULT_FFMPEG,
+               total_duration: float | None = None) -> list[str]:
+    """Découpe plusieurs plages (début, durée) d'un fichier en une seule lecture.
+
+    Le muxer segment coupe la source à chaque début et fin de plage en un
+    seul passage FFmpeg (seek rapide jusqu'à la première plage) ; les
+    morceaux entre deux plages sont supprimés. Des plages qui se chevauchent
+    demandent un passage de plus par niveau de chevauchement. Les fichiers
+    sont numérotés dans l'ordre de *ranges*. Une plage qui dépasse la fin du
+    fichier lève ValueError (*total_duration* évite de relire l'en-tête).
+    """
+    source = _check_input(input_path, ffmpeg_cmd)
+    total = total_duration if total_duration is not None else probe_duration(str(source), ffmpeg_cmd)
+    for index, (start, duration) in enumerate(ranges):
+        if start < 0 or duration <= 0:
+            raise ValueError(f"Plage {index} invalide : début >= 0 et durée > 0")
+        if total is not None and start + duration > total + _BOUNDARY_TOLERANCE:
+            raise ValueError(
+                f"La fin du segment {index} ({start + duration:.2f}s) dépasse la longueur totale du fichier ({total:.2f}s)."
+            )
+    out_dir = Path(output_dir) if output_dir else source.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    outputs: list[str] = [""] * len(ranges)
+    for items in _layers(ranges):
+        window_start = items[0][1][0]
+        window_end = items[-1][1][0] + items[-1][1][1]
+        bounds = sorted({round(t - window_start, 3) for _, (start, duration) in items
+                         for t in (start, start + duration)} - {0.0, round(window_end - window_start, 3)})
+        tmp_dir = Path(tempfile.mkdtemp(prefix=f".{source.stem}_", dir=out_dir))
+        try:
+            pattern = str(tmp_dir / f"%04d{source.suffix}")
+            cmd = [ffmpeg_cmd, "-y", "-hide_banner", "-loglevel", "error",
+                   "-ss", f"{window_start:.3f}", "-t", f"{window_end - window_start:.3f}", "-i", str(source),
+                   "-map", "0:a", "-f", "segment", "-reset_timestamps", "1",
+                   "-segment_list", str(tmp_dir / "list.csv"), "-segment_list_type", "csv"]
+            if bounds:
+                cmd += ["-segment_times", ",".join(f"{t:.3f}" for t in bounds)]
+            _run_ffmpeg(cmd + codec_args(pattern, reencode) + [pattern])
+
+            # Début réel de chaque morceau (coupe au paquet près en copie de flux)
+            pieces = {}
+            for line in (tmp_dir / "list.csv").read_text(encoding="utf-8").splitlines():
+                name, piece_start, _piece_end = line.rsplit(",", 2)
+                pieces[name] = float(piece_start)
+            for index, (start, duration) in items:
+                # Morceau commençant à la coupe demandée : jamais un intervalle
+                # supprimé ni un morceau déjà attribué
+                offset = start - window_start
+                matches = [name for name, piece_start in pieces.items()
+                           if abs(piece_start - offset) <= _BOUNDARY_TOLERANCE]
+                if not matches:
+                    raise RuntimeError(f"FFmpeg n'a produit aucun morceau commençant à {start:.3f}s (plage {index})")
+                name = min(matches, key=lambda n: abs(pieces[n] - offset))
+                del pieces[name]
+                output_path = str(out_dir / f"{source.stem}_segment_{index:04d}_{int(start)}s_{int(duration)}s{source.suffix}")
+                os.replace(tmp_dir / name, output_path)
+                outputs[index] = output_path
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return outputs
+
+
+def cut_fixed(input_path: str, segment_length: float, output_dir: str | None = None,
+              reencode: bool = False, ffmpeg_cmd: str = DEFAULT_FFMPEG) -> list[str]:
+    """Découpe tout le fichier en segments de *segment_length* secondes (muxer segment)."""
+    if segment_length <= 0:
+        raise ValueError("La longueur de segment doit être > 0")
+    source = _check_input(input_path, ffmpeg_cmd)
+    out_dir = Path(output_dir) if output_dir else source.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    pattern = str(out_dir / f"{source.stem}_segment_%04d{source.suffix}")
+    list_path = out_dir / f".{source.stem}_segments.txt"
+    try:
+        _run_ffmpeg([ffmpeg_cmd, "-y", "-hide_banner", "-loglevel", "error", "-i", str(source),
+                     "-map", "0:a", "-f", "segment", "-segment_time", str(segment_length),
+                     "-reset_timestamps", "1", "-segment_list", str(list_path), "-segment_list_type", "flat",
+                     *codec_args(pattern, reencode), pattern])
+        names = list_path.read_text(encoding="utf-8").splitlines()  # un nom par ligne (espaces possibles)
+    finally:
+        list_path.unlink(missing_ok=True)
+    return [str(out_dir / name) for name in names]
+
+
+def cut_batch(inputs: list[str], ranges: list[tuple[float, float]] | None = None,
+              segment_length: float | None = None, output_dir: str | None = None,
+              reencode: bool = False, ffmpeg_cmd: str = DEFAULT_FFMPEG, jobs: int = 1) -> dict:
+    """Découpe plusieurs fichiers, *jobs* process FFmpeg en parallèle.
+
+    Renvoie un rapport par fichier et le débit global en secondes d'audio
+    traitées par seconde (le fichier entier en longueur fixe, sinon la somme
+    des plages bornées à la durée du fichier).
+    """
+    def one(path: str) -> dict:
+        total = probe_duration(path, ffmpeg_cmd)
+        start = time.perf_counter()
+        if segment_length:
+            outputs = cut_fixed(path, segment_length, output_dir, reencode, ffmpeg_cmd)
+            audio = total or 0.0
+        else:
+            outputs = cut_ranges(path, ranges or [], output_dir, reencode, ffmpeg_cmd, total)
+            audio = sum(min(d, max(0.0, total - s)) if total else d for s, d in ranges or [])
+        return {"input": path, "segments": len(outputs), "audio_seconds": round(audio, 3),
+                "elapsed_seconds": round(time.perf_counter() - start, 3), "outputs": outputs}
+
+    start = time.perf_counter()
+    # Le travail se fait dans les process FFmpeg : des threads suffisent à les piloter
+    with ThreadPoolExecutor(max(1, jobs)) as pool:
+        files = list(pool.map(one, inputs))
+    wall = time.perf_counter() - start
+    audio = sum(f["audio_seconds"] for f in files)
+    return {
+        "files": files,
+        "segments": sum(f["segments"] for f in files),
+        "audio_seconds": round(audio, 3),
+        "wall_seconds": round(wall, 3),
+        "audio_seconds_per_second": round(audio / wall, 1) if wall else None,
+    }
+
+
 def main():
     parser = argparse.ArgumentParser(description="Découper un fichier audio via FFmpeg (sans pydub).")
-    parser.add_argument("--input", "-i", required=True, help="Chemin du fichier source.")
-    parser.add_argument("--start", "-s", type=float, required=True, help="Temps de départ en secondes.")
-    parser.add_argument("--duration", "-d", type=float, required=True, help="Durée du segment en secondes.")
+    parser.add_argument("--input", "-i", required=True, nargs="+", help="Fichier(s) source (plusieurs en mode lot).")
+    parser.add_argument("--start", "-s", type=float, help="Temps de départ en secondes.")
+    parser.add_argument("--duration", "-d", type=float, help="Durée du segment en secondes.")
     parser.add_argument("--output", "-o", help="Fichier de sortie (sinon auto-généré).")
+    parser.add_argument("--ranges", help="Mode lot : plages `début:durée,début:durée,...`.")
+    parser.add_argument("--ranges-file", help="Mode lot : fichier de plages (une `début durée` par ligne).")
+    parser.add_argument("--segment-length", type=float, help="Mode lot : segments consécutifs de N secondes.")
+    parser.add_argument("--output-dir", help="Mode lot : dossier des segments (défaut : celui de la source).")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="Mode lot : fichiers traités en parallèle.")
     parser.add_argument("--reencode", action="store_true", help="Réencoder au lieu de copier le flux audio.")
     parser.add_argument("--ffmpeg", dest="ffmpeg_path", default=DEFAULT_FFMPEG, help="Chemin vers l'exécutable FFmpeg si non présent dans le PATH.")
 
     args = parser.parse_args()
+    batch = args.ranges or args.ranges_file or args.segment_length
 
     try:
-        out = cut_audio(args.input, args.start, args.duration, args.output, args.reencode, args.ffmpeg_path)
-        print(f"Segment exporté dans : {out}")
+        if batch:
+            ranges = None
+            if not args.segment_length:
+                ranges = parse_ranges(Path(args.ranges_file).read_text(encoding="utf-8") if args.ranges_file else args.ranges)
+            report = cut_batch(args.input, ranges, args.segment_length, args.output_dir,
+                               args.reencode, args.ffmpeg_path, args.jobs)
+            for f in report["files"]:
+                print(f"{f['input']} : {f['segments']} segment(s) en {f['elapsed_seconds']:.2f}s")
+            print(f"{report['segments']} segment(s), {report['audio_seconds']:.0f}s d'audio en "
+                  f"{report['wall_seconds']:.2f}s ({report['audio_seconds_per_second']} s d'audio/s)")
+        else:
+            if args.start is None or args.duration is None or len(args.input) != 1:
+                parser.error("un seul --input avec --start et --duration, ou un mode lot "
+                             "(--ranges, --ranges-file, --segment-length)")
+            out = cut_audio(args.input[0], args.start, args.duration, args.output, args.reencode, args.ffmpeg_path)
+            print(f"Segment exporté dans : {out}")
     except Exception as exc:
         print(f"Error: {exc}")
         exit(1)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,6 +1,11 @@
 from pydub import AudioSegment
 import argparse
 import os
+import time
+from pathlib import Path
+
+from audio_cutter_ffmpeg import parse_ranges
+from pcm_cutter import cut_pcm, is_seekable_pcm
 
 
 def cut_mp3(input_path: str, start_sec: float, duration_sec: float, output_path: str | None = None):
@@ -18,6 +23,11 @@ def cut_mp3(input_path: str, start_sec: float, duration_sec: float, output_path:
     if start_sec < 0 or duration_sec <= 0:
         raise ValueError("Le temps de départ doit être >= 0 et la durée > 0.")
 
+    # WAV/FLAC vers le même format : seek sur les seules trames utiles (pcm_cutter)
+    same_format = output_path is None or Path(output_path).suffix.lower() == Path(input_path).suffix.lower()
+    if same_format and is_seekable_pcm(input_path):
+        return cut_pcm(input_path, start_sec, duration_sec, output_path)
+
     # Chargement de l'audio (format déduit automatiquement par pydub/ffmpeg)
     audio = AudioSegment.from_file(input_path)
 
@@ -39,16 +49,57 @@ def cut_mp3(input_path: str, start_sec: float, duration_sec: float, output_path:
     return output_path
 
 
+def cut_mp3_many(input_path: str, ranges: list[tuple[float, float]], output_dir: str | None = None) -> list[str]:
+    """Découpe plusieurs plages (début, durée) d'un MP3 décodé une seule fois.
+
+    Contrairement à des appels répétés à cut_mp3, le fichier n'est lu et
+    décodé qu'une fois pour toutes les plages. Pour de longs fichiers,
+    audio_cutter_ffmpeg.cut_ranges évite en plus de garder tout le PCM en mémoire.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Le fichier '{input_path}' est introuvable.")
+
+    audio = AudioSegment.from_file(input_path)
+    base = Path(input_path)
+    out_dir = Path(output_dir) if output_dir else base.parent
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    outputs = []
+    for index, (start_sec, duration_sec) in enumerate(ranges):
+        end_ms = (start_sec + duration_sec) * 1000
+        if end_ms > len(audio):
+            raise ValueError(
+                f"La fin du segment {index} ({end_ms/1000:.2f}s) dépasse la longueur totale du fichier ({len(audio)/1000:.2f}s)."
+            )
+        output_path = str(out_dir / f"{base.stem}_segment_{index:04d}_{int(start_sec)}s_{int(duration_sec)}s.mp3")
+        audio[start_sec * 1000:end_ms].export(output_path, format="mp3")
+        outputs.append(output_path)
+    return outputs
+
+
 def main():
     parser = argparse.ArgumentParser(description="Découper un MP3 en spécifiant le temps de départ et la durée.")
     parser.add_argument("--input", "-i", required=True, help="Chemin du fichier MP3 source.")
-    parser.add_argument("--start", "-s", type=float, required=True, help="Temps de départ en secondes.")
-    parser.add_argument("--duration", "-d", type=float, required=True, help="Durée du segment en secondes.")
+    parser.add_argument("--start", "-s", type=float, help="Temps de départ en secondes.")
+    parser.add_argument("--duration", "-d", type=float, help="Durée du segment en secondes.")
     parser.add_argument("--output", "-o", help="Chemin du fichier MP3 de sortie (facultatif).")
+    parser.add_argument("--ranges", help="Plusieurs plages `début:durée,début:durée,...` (un seul décodage).")
+    parser.add_argument("--ranges-file", help="Fichier de plages (une `début durée` par ligne).")
+    parser.add_argument("--output-dir", help="Dossier des segments en mode plages (défaut : celui de la source).")
 
     args = parser.parse_args()
 
     try:
+        if args.ranges or args.ranges_file:
+            ranges = parse_ranges(Path(args.ranges_file).read_text(encoding="utf-8") if args.ranges_file else args.ranges)
+            start = time.perf_counter()
+            outputs = cut_mp3_many(args.input, ranges, args.output_dir)
+            elapsed = time.perf_counter() - start
+            audio = sum(duration for _, duration in ranges)
+            print(f"{len(outputs)} segment(s) exporté(s) en {elapsed:.2f}s ({audio / elapsed:.1f} s d'audio/s)")
+            return
+        if args.start is None or args.duration is None:
+            parser.error("--start et --duration, ou --ranges / --ranges-file")
         out = cut_mp3(args.input, args.start, args.duration, args.output)
         print(f"Segment exporté vers : {out}")
     except Exception as e:
@@ -0,0 +1,187 @@
+import argparse
+import os
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from audio_cutter_ffmpeg import parse_ranges
+
+# Formats où soundfile sait se positionner à l'échantillon près
+SEEKABLE_FORMATS = {"WAV", "WAVEX", "FLAC", "AIFF", "W64", "CAF"}
+# Tags du chunk fmt dont chaque trame a une taille fixe (PCM, float, A-law, µ-law, extensible)
+_FIXED_FRAME_TAGS = {1, 3, 6, 7, 0xFFFE}
+# Trames copiées par bloc sur le chemin soundfile (mémoire bornée)
+_BLOCK_FRAMES = 1 << 16
+
+
+def is_seekable_pcm(input_path: str) -> bool:
+    """Vrai si le fichier peut être découpé par seek, sans décoder le reste."""
+    try:
+        return sf.info(input_path).format in SEEKABLE_FORMATS
+    except RuntimeError:
+        return False
+
+
+def wav_layout(input_path: str) -> dict | None:
+    """Position et format du chunk data d'un WAV à trames de taille fixe (None sinon)."""
+    with open(input_path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+        fmt = None
+        file_size = os.fstat(f.fileno()).st_size
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                f.seek(size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                break
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+        if fmt is None or len(fmt) < 16:
+            return None
+        tag, channels, sample_rate, _byte_rate, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if tag not in _FIXED_FRAME_TAGS or block_align != channels * ((bits + 7) // 8):
+            return None
+        offset = f.tell()
+        # Taille 0 ou 0xFFFFFFFF (enregistrement interrompu, flux) : jusqu'à la fin du fichier
+        available = file_size - offset
+        if size in (0, 0xFFFFFFFF) or size > available:
+            size = available
+        return {"fmt": fmt, "offset": offset, "frames": size // block_align, "block_align": block_align,
+                "sample_rate": sample_rate, "channels": channels}
+
+
+def _frames(start_sec: float, duration_sec: float, sample_rate: int, total_frames: int) -> tuple[int, int]:
+    """Bornes (première trame, nombre de trames) à l'échantillon près."""
+    if start_sec < 0 or duration_sec <= 0:
+        raise ValueError("Le temps de départ doit être >= 0 et la durée > 0.")
+    start = round(start_sec * sample_rate)
+    count = round(duration_sec * sample_rate)
+    if start + count > total_frames:
+        raise ValueError(
+            f"La fin du segment ({(start + count) / sample_rate:.2f}s) dépasse la longueur totale "
+            f"du fichier ({total_frames / sample_rate:.2f}s)."
+        )
+    return start, count
+
+
+def _write_wav(output_path: str, fmt: bytes, data) -> None:
+    """Écrit un WAV avec le chunk fmt d'origine et les trames brutes (aucun réencodage)."""
+    size = len(data) if isinstance(data, (bytes, bytearray)) else data.nbytes
+    fmt_chunk = b"fmt " + struct.pack("<I", len(fmt)) + fmt + (b"\0" if len(fmt) % 2 else b"")
+    with open(output_path, "wb") as out:
+        out.write(b"RIFF" + struct.pack("<I", 4 + len(fmt_chunk) + 8 + size + size % 2) + b"WAVE")
+        out.write(fmt_chunk)
+        out.write(b"data" + struct.pack("<I", size))
+        out.write(data)
+        if size % 2:
+            out.write(b"\0")
+
+
+def _read_dtype(subtype: str) -> str:
+    """Type numpy qui relit les échantillons sans perte pour ce sous-type."""
+    if subtype == "FLOAT":
+        return "float32"
+    if subtype == "DOUBLE":
+        return "float64"
+    if subtype in ("PCM_24", "PCM_32"):
+        return "int32"
+    return "int16"
+
+
+def _output_path(input_path: str, index: int | None, start_sec: float, duration_sec: float, output_dir: str | None) -> str:
+    base = Path(input_path)
+    out_dir = Path(output_dir) if output_dir else base.parent
+    label = f"_{index:04d}" if index is not None else ""
+    return str(out_dir / f"{base.stem}_segment{label}_{int(start_sec)}s_{int(duration_sec)}s{base.suffix}")
+
+
+def cut_pcm_many(input_path: str, ranges: list[tuple[float, float]], output_dir: str | None = None,
+                 output_paths: list[str] | None = None) -> list[str]:
+    """Découpe plusieurs plages (début, durée) en ne lisant que leurs trames.
+
+    • WAV (PCM, float, A-law/µ-law) : vue numpy en mémoire projetée (memmap)
+      sur le chunk data ; les octets des trames sont recopiés tels quels,
+      avec le chunk fmt d'origine.
+    • FLAC, AIFF, W64, CAF : seek soundfile puis copie par blocs dans le
+      même format et sous-type (échantillons identiques ; le FLAC est
+      recompressé, sans perte).
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Le fichier '{input_path}' est introuvable.")
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    outputs = output_paths or [_output_path(input_path, i, s, d, output_dir) for i, (s, d) in enumerate(ranges)]
+
+    layout = wav_layout(input_path)
+    if layout is not None:
+        frames = np.memmap(input_path, dtype=np.uint8, mode="r", offset=layout["offset"],
+                           shape=(layout["frames"], layout["block_align"]))
+        for (start_sec, duration_sec), output_path in zip(ranges, outputs):
+            start, count = _frames(start_sec, duration_sec, layout["sample_rate"], layout["frames"])
+            _write_wav(output_path, layout["fmt"], frames[start:start + count])
+        del frames
+        return outputs
+
+    with sf.SoundFile(input_path) as src:
+        if src.format not in SEEKABLE_FORMATS:
+            raise ValueError(f"Format non découpable par seek : {src.format} (utiliser audio_cutter_ffmpeg)")
+        dtype = _read_dtype(src.subtype)
+        for (start_sec, duration_sec), output_path in zip(ranges, outputs):
+            start, count = _frames(start_sec, duration_sec, src.samplerate, src.frames)
+            src.seek(start)
+            with sf.SoundFile(output_path, "w", src.samplerate, src.channels, src.subtype,
+                              format=src.format) as out:
+                while count > 0:
+                    block = src.read(min(count, _BLOCK_FRAMES), dtype=dtype, always_2d=True)
+                    if not len(block):
+                        break
+                    out.write(block)
+                    count -= len(block)
+    return outputs
+
+
+def cut_pcm(input_path: str, start_sec: float, duration_sec: float, output_path: str | None = None) -> str:
+    """Découpe un segment d'un fichier PCM (WAV, FLAC…) en ne lisant que ses trames."""
+    output_path = output_path or _output_path(input_path, None, start_sec, duration_sec, None)
+    return cut_pcm_many(input_path, [(start_sec, duration_sec)], output_paths=[output_path])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Découper un WAV/FLAC par seek, sans décoder le fichier entier.")
+    parser.add_argument("--input", "-i", required=True, help="Chemin du fichier source (WAV, FLAC, AIFF…).")
+    parser.add_argument("--start", "-s", type=float, help="Temps de départ en secondes.")
+    parser.add_argument("--duration", "-d", type=float, help="Durée du segment en secondes.")
+    parser.add_argument("--output", "-o", help="Fichier de sortie (sinon auto-généré).")
+    parser.add_argument("--ranges", help="Plusieurs plages `début:durée,début:durée,...`.")
+    parser.add_argument("--ranges-file", help="Fichier de plages (une `début durée` par ligne).")
+    parser.add_argument("--output-dir", help="Dossier des segments en mode plages (défaut : celui de la source).")
+
+    args = parser.parse_args()
+
+    try:
+        start = time.perf_counter()
+        if args.ranges or args.ranges_file:
+            ranges = parse_ranges(Path(args.ranges_file).read_text(encoding="utf-8") if args.ranges_file else args.ranges)
+            outputs = cut_pcm_many(args.input, ranges, args.output_dir)
+            print(f"{len(outputs)} segment(s) exporté(s) en {(time.perf_counter() - start) * 1000:.1f} ms")
+        else:
+            if args.start is None or args.duration is None:
+                parser.error("--start et --duration, ou --ranges / --ranges-file")
+            out = cut_pcm(args.input, args.start, args.duration, args.output)
+            print(f"Segment exporté vers : {out} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    except Exception as e:
+        print(f"Erreur : {e}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,38 @@
 import argparse
-import base64
 import os
+import sys
 from pathlib import Path
 
+# base64_stream est à la racine du dépôt (partagé avec le serveur)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from base64_stream import ENCODE_BLOCK, encode_chunks, read_blocks
 
-def wav_to_base64(input_path: str, as_data_uri: bool = False, wrap: bool = False) -> str:
-    """Encode un fichier WAV en chaîne base64.
 
-    Args:
-        input_path: Chemin du fichier WAV (ou autre fichier binaire).
-        as_data_uri: Si True, préfixe par `data:audio/wav;base64,`.
-        wrap: Si True, ajoute une nouvelle ligne tous les 76 caractères (RFC 2045).
+def iter_wav_base64(input_path: str, as_data_uri: bool = False, wrap: bool = False):
+    """Encode un fichier en base64 par blocs : itérateur de morceaux de texte (bytes ASCII).
 
-    Returns:
-        Chaîne base64 (UTF-8).
+    La mémoire utilisée ne dépend pas de la taille du fichier.
     """
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"Fichier introuvable : {input_path}")
 
     with open(input_path, "rb") as f:
-        raw_bytes = f.read()
+        yield from encode_chunks(read_blocks(f, ENCODE_BLOCK), wrap=wrap,
+                                 data_uri="audio/wav" if as_data_uri else None)
 
-    encoded_bytes = base64.b64encode(raw_bytes)
-    encoded_str = encoded_bytes.decode("utf-8")
 
-    if wrap:
-        import textwrap
-        encoded_str = "\n".join(textwrap.wrap(encoded_str, 76))
+def wav_to_base64(input_path: str, as_data_uri: bool = False, wrap: bool = False) -> str:
+    """Encode un fichier WAV en chaîne base64.
 
-    if as_data_uri:
-        encoded_str = f"data:audio/wav;base64,{encoded_str}"
+    Args:
+        input_path: Chemin du fichier WAV (ou autre fichier binaire).
+        as_data_uri: Si True, préfixe par `data:audio/wav;base64,`.
+        wrap: Si True, ajoute une nouvelle ligne tous les 76 caractères (RFC 2045).
 
-    return encoded_str
+    Returns:
+        Chaîne base64 (UTF-8).
+    """
+    return b"".join(iter_wav_base64(input_path, as_data_uri, wrap)).decode("ascii")
 
 
 def main():
@@ -44,16 +45,20 @@ def main():
     args = parser.parse_args()
 
     try:
-        b64 = wav_to_base64(args.input, as_data_uri=args.data_uri, wrap=args.wrap)
+        chunks = iter_wav_base64(args.input, as_data_uri=args.data_uri, wrap=args.wrap)
         if args.output:
-            Path(args.output).write_text(b64, encoding="utf-8")
+            with open(args.output, "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
             print(f"Base64 écrit dans : {args.output}")
         else:
-            print(b64)
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.write(b"\n")
     except Exception as exc:
         print(f"Erreur : {exc}")
         exit(1)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
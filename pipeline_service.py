@@ -0,0 +1,150 @@
+"""Tour de parole complet côté serveur : audio → Whisper → Ollama → TTS.
+
+Les étapes se chevauchent : les tokens Ollama sont découpés en phrases au fil
+du streaming et chaque phrase complète part en synthèse pendant que le LLM
+continue de générer. Les événements sont produits dès qu'ils sont prêts :
+
+• {"type": "transcript", ...}  texte reconnu par Whisper ;
+• {"type": "token", ...}       fragment de réponse du LLM ;
+• {"type": "audio", ...}       WAV base64 d'une phrase synthétisée ;
+• {"type": "done", ...}        réponse complète et durées par étape (ms) ;
+• {"type": "error", ...}       échec d'une étape (fin du flux).
+"""
+import asyncio
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from llm_service import Message, stream_ollama_response
+from stt_service import transcribe_audio
+from tts_service import encode_wav_base64, synthesize_audio
+
+# Longueur minimale d'une phrase envoyée seule au TTS (évite les appels trop courts)
+VOICE_MIN_SENTENCE_CHARS = int(os.getenv("VOICE_MIN_SENTENCE_CHARS", "20"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…;:])\s+|\n+")
+
+
+class VoiceTurnRequest(BaseModel):
+    audio: str                      # Audio encodé en base64
+    language: str = "fr"
+    stt_model: str = "base"
+    tts_model: str = "mms"
+    voice_id: Optional[str] = None
+    speed: float = 1.0
+    model: Optional[str] = None     # modèle Ollama (défaut : MODEL_NAME)
+    system: Optional[str] = None
+    messages: List[Message] = []    # historique éventuel de la conversation
+    temperature: float = 0.7
+    max_tokens: int = 300
+
+
+class SentenceSplitter:
+    """Découpe un flux de tokens en phrases d'au moins *min_chars* caractères."""
+
+    def __init__(self, min_chars: int = VOICE_MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self.buffer):
+            candidate = self.buffer[start:match.start()].strip()
+            if len(candidate) >= self.min_chars:
+                sentences.append(candidate)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest or None
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+async def run_voice_turn(req: VoiceTurnRequest) -> AsyncIterator[Dict]:
+    """Exécute un tour complet et produit les événements au fil de l'eau."""
+    t0 = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    try:
+        transcript = await transcribe_audio(req.audio, req.language, req.stt_model)
+    except Exception as err:
+        yield {"type": "error", "stage": "stt", "detail": str(err)}
+        return
+    timings["stt_ms"] = _ms(t0)
+    yield {"type": "transcript", "text": transcript.text, "language": transcript.language,
+           "confidence": transcript.confidence}
+
+    if not transcript.text.strip():
+        timings["total_ms"] = _ms(t0)
+        yield {"type": "done", "text": "", "timings": timings}
+        return
+
+    messages = [Message(role="system", content=req.system)] if req.system else []
+    messages += list(req.messages) + [Message(role="user", content=transcript.text.strip())]
+
+    events: asyncio.Queue = asyncio.Queue()
+    sentences: asyncio.Queue = asyncio.Queue()
+    answer: List[str] = []
+    tts_busy = 0.0
+
+    async def llm_stage() -> None:
+        splitter = SentenceSplitter()
+        t_llm = time.perf_counter()
+        async for token in stream_ollama_response(messages, req.temperature, req.max_tokens, req.model):
+            if not answer:
+                timings["llm_first_token_ms"] = _ms(t0)
+            answer.append(token)
+            await events.put({"type": "token", "text": token})
+            for sentence in splitter.feed(token):
+                await sentences.put(sentence)
+        tail = splitter.flush()
+        if tail:
+            await sentences.put(tail)
+        timings["llm_ms"] = _ms(t_llm)
+        await sentences.put(None)
+
+    async def tts_stage() -> None:
+        nonlocal tts_busy
+        index = 0
+        while (sentence := await sentences.get()) is not None:
+            t_tts = time.perf_counter()
+            wav, sample_rate = await synthesize_audio(sentence, req.language, req.tts_model, req.voice_id, req.speed)
+            audio = await asyncio.to_thread(encode_wav_base64, wav, sample_rate)
+            duration = len(wav) / sample_rate
+            tts_busy += time.perf_counter() - t_tts
+            if index == 0:
+                timings["first_audio_ms"] = _ms(t0)
+            await events.put({"type": "audio", "index": index, "text": sentence, "audio": audio,
+                              "format": "wav", "sample_rate": sample_rate, "duration": duration,
+                              "synth_ms": _ms(t_tts)})
+            index += 1
+        await events.put(None)
+
+    async def guard(stage: str, coro) -> None:
+        try:
+            await coro
+        except Exception as err:
+            await events.put({"type": "error", "stage": stage, "detail": str(err)})
+
+    tasks = [asyncio.create_task(guard("llm", llm_stage())), asyncio.create_task(guard("tts", tts_stage()))]
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+            if event["type"] == "error":
+                return
+        timings["tts_ms"] = round(tts_busy * 1000, 1)
+        timings["total_ms"] = _ms(t0)
+        yield {"type": "done", "text": "".join(answer), "timings": timings}
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,212 @@
+"""Profilage à la demande du process (CPU, mémoire, opérateurs torch).
+
+Rien ne tourne tant qu'aucune capture n'est demandée :
+• CPU : échantillonneur Python (sys._current_frames) dans un thread dédié,
+  pendant N secondes, exporté en piles repliées (flamegraph.pl, inferno)
+  ou au format speedscope ;
+• mémoire : tracemalloc démarré/arrêté explicitement, instantanés et
+  différences entre deux instantanés successifs ;
+• torch : une requête STT ou TTS exécutée sous torch.profiler (CPU, et
+  CUDA si disponible), résumé par opérateur.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Feuilles de pile considérées comme « thread au repos » (attente I/O ou verrou)
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py", "socket.py")
+
+_Frame = Tuple[str, str, int]
+
+
+class Busy(RuntimeError):
+    """Une capture du même type est déjà en cours."""
+
+
+def _stack(frame) -> Tuple[_Frame, ...]:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()  # racine -> feuille
+    return tuple(stack)
+
+
+class CPUProfile:
+    """Résultat d'un échantillonnage : nombre d'occurrences par (thread, pile)."""
+
+    def __init__(self, samples: Counter, interval: float, duration: float):
+        self.samples = samples
+        self.interval = interval
+        self.duration = duration
+
+    def folded(self) -> str:
+        """Une ligne `thread;f1;f2;... N` par pile (entrée de flamegraph.pl)."""
+        lines = []
+        for (thread, stack), count in self.samples.most_common():
+            names = [thread] + [f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack]
+            lines.append(f"{';'.join(names)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Fichier speedscope (https://www.speedscope.app), un profil par thread."""
+        frames: List[Dict[str, Any]] = []
+        index: Dict[_Frame, int] = {}
+        per_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+        for (thread, stack), count in self.samples.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples, weights = per_thread.setdefault(thread, ([], []))
+            samples.append(ids)
+            weights.append(count * self.interval)
+        profiles = [
+            {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread, (samples, weights) in sorted(per_thread.items())
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": f"cpu-{int(time.time())}",
+            "activeProfileIndex": 0,
+            "exporter": "profiling_service",
+        }
+
+
+_CPU_LOCK = threading.Lock()
+
+
+def sample_cpu(seconds: float, interval: float = 0.01, include_idle: bool = False) -> CPUProfile:
+    """Échantillonne les piles de tous les threads (appel bloquant, à lancer dans un thread)."""
+    if not _CPU_LOCK.acquire(blocking=False):
+        raise Busy("profilage CPU déjà en cours")
+    try:
+        me = threading.get_ident()
+        samples: Counter = Counter()
+        start = time.perf_counter()
+        deadline = start + seconds
+        next_tick = start
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _stack(frame)
+                if not stack:
+                    continue
+                if not include_idle and os.path.basename(stack[-1][1]) in _IDLE_FILES:
+                    continue
+                samples[(names.get(ident, str(ident)), stack)] += 1
+            next_tick += interval
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(max(0.0, next_tick - now))
+        return CPUProfile(samples, interval, time.perf_counter() - start)
+    finally:
+        _CPU_LOCK.release()
+
+
+class MemoryTracker:
+    """Pilotage de tracemalloc : démarrage, instantanés et différences."""
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._previous = None
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        self._previous = None
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {"tracing": tracing, "traced_bytes": current, "peak_bytes": peak}
+
+    def snapshot(self, limit: int = 25, group_by: str = "lineno") -> Dict[str, Any]:
+        """Top des allocations et différence avec l'instantané précédent."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc n'est pas démarré")
+        with self._lock:
+            snap = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            result = dict(self.status())
+            result["top"] = [
+                {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snap.statistics(group_by)[:limit]
+            ]
+            if self._previous is not None:
+                result["diff"] = [
+                    {"location": str(stat.traceback), "size_diff_bytes": stat.size_diff,
+                     "size_bytes": stat.size, "count_diff": stat.count_diff}
+                    for stat in snap.compare_to(self._previous, group_by)[:limit]
+                ]
+            self._previous = snap
+        return result
+
+
+memory_tracker = MemoryTracker()
+
+_TORCH_LOCK = threading.Lock()
+
+
+def torch_profile(fn: Callable[[], Any], row_limit: int = 30) -> Dict[str, Any]:
+    """Exécute *fn* sous torch.profiler et renvoie le résumé par opérateur."""
+    import torch
+    from torch.profiler import ProfilerActivity, profile
+
+    if not _TORCH_LOCK.acquire(blocking=False):
+        raise Busy("profilage torch déjà en cours")
+    try:
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        start = time.perf_counter()
+        with profile(activities=activities, record_shapes=True) as prof:
+            fn()
+        elapsed = time.perf_counter() - start
+    finally:
+        _TORCH_LOCK.release()
+
+    sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+    averages = prof.key_averages()
+    ops = sorted(averages, key=lambda e: e.self_cpu_time_total, reverse=True)[:row_limit]
+    return {
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "operators": [
+            {
+                "name": e.key,
+                "calls": e.count,
+                "self_cpu_ms": round(e.self_cpu_time_total / 1000, 3),
+                "cpu_total_ms": round(e.cpu_time_total / 1000, 3),
+            }
+            for e in ops
+        ],
+        "table": averages.table(sort_by=sort_by, row_limit=row_limit),
+    }
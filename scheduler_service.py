@@ -0,0 +1,229 @@
+"""Contrôle d'admission des requêtes de calcul (LLM, STT, TTS).
+
+Chaque requête appartient à une classe de priorité (`interactive` ou `batch`)
+qui a sa propre limite de concurrence. Quand une classe est saturée, les
+requêtes attendent dans une file équitable pondérée (WFQ) entre appelants :
+un client qui envoie 500 transcriptions n'affame pas les autres.
+
+Sélection de la classe :
+• clé API listée dans SCHED_BATCH_API_KEYS → toujours `batch` ;
+• sinon en-tête `X-Priority: interactive|batch` (défaut : interactive).
+
+Échéance optionnelle du client :
+• `X-Request-Deadline` : timestamp Unix (secondes) ;
+• `X-Request-Timeout-Ms` : budget relatif en millisecondes.
+Une requête dont l'échéance est dépassée est rejetée (504) avant d'utiliser
+du calcul, y compris si elle expire pendant l'attente.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from prometheus_client import Counter, Gauge, Histogram
+
+SCHED_INTERACTIVE_CONCURRENCY = int(os.getenv("SCHED_INTERACTIVE_CONCURRENCY", "4"))
+SCHED_BATCH_CONCURRENCY = int(os.getenv("SCHED_BATCH_CONCURRENCY", "1"))
+SCHED_MAX_QUEUE = int(os.getenv("SCHED_MAX_QUEUE", "200"))
+
+# Routes soumises au contrôle d'admission (préfixes de chemin)
+ADMISSION_PREFIXES = ("/llm", "/tts", "/stt", "/v1/chat", "/v1/embeddings", "/api/chat")
+
+QUEUE_DEPTH = Gauge("admission_queue_depth", "Requêtes en attente d'admission", ["priority"])
+IN_FLIGHT = Gauge("admission_in_flight", "Requêtes admises en cours", ["priority"])
+WAIT_TIME = Histogram(
+    "admission_wait_seconds", "Temps d'attente avant admission", ["priority"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+REJECTED = Counter("admission_rejected_total", "Requêtes rejetées par le contrôle d'admission", ["priority", "reason"])
+
+
+class DeadlineExceeded(Exception):
+    """L'échéance fournie par le client est dépassée."""
+
+
+class QueueFull(Exception):
+    """La file d'attente de la classe est pleine."""
+
+
+def _parse_list(value: str) -> Iterable[str]:
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """Format : `appelant:poids,autre:poids`."""
+    weights = {}
+    for item in _parse_list(value):
+        caller, _, weight = item.rpartition(":")
+        if caller:
+            weights[caller] = float(weight)
+    return weights
+
+
+def caller_id(token: str) -> str:
+    """Identifiant stable et non réversible d'un appelant à partir de son jeton."""
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+class _Waiter:
+    __slots__ = ("finish", "seq", "start", "caller", "future", "deadline")
+
+    def __init__(self, finish, seq, start, caller, future, deadline):
+        self.finish = finish
+        self.seq = seq
+        self.start = start
+        self.caller = caller
+        self.future = future
+        self.deadline = deadline
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+
+class PriorityClass:
+    """Une classe de priorité : limite de concurrence + file WFQ."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.active = 0
+        self.queue: list = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+
+    def dispatch(self) -> None:
+        """Donne les créneaux libres aux prochains waiters (plus petit tag de fin)."""
+        now = time.time()
+        while self.queue and self.active < self.limit:
+            waiter = heapq.heappop(self.queue)
+            if waiter.future.done():
+                continue  # annulé ou expiré pendant l'attente
+            if waiter.deadline is not None and now >= waiter.deadline:
+                waiter.future.set_exception(DeadlineExceeded())
+                continue
+            self.virtual_time = max(self.virtual_time, waiter.start)
+            self.active += 1
+            waiter.future.set_result(None)
+        if len(self.last_finish) > 1024:
+            # Les appelants dont le tag est dépassé n'ont plus de « dette »
+            self.last_finish = {c: f for c, f in self.last_finish.items() if f > self.virtual_time}
+        QUEUE_DEPTH.labels(self.name).set(len(self.queue))
+        IN_FLIGHT.labels(self.name).set(self.active)
+
+
+class AdmissionController:
+    def __init__(self, limits: Dict[str, int], batch_keys: Iterable[str] = (),
+                 weights: Optional[Dict[str, float]] = None, max_queue: int = SCHED_MAX_QUEUE):
+        self.classes = {name: PriorityClass(name, limit) for name, limit in limits.items()}
+        self.batch_callers = {caller_id(k) for k in batch_keys}
+        # Poids configurés par clé API ; stockés par identifiant d'appelant
+        self.weights = {caller_id(k): w for k, w in (weights or {}).items()}
+        self.max_queue = max_queue
+        self._seq = itertools.count()
+
+    @staticmethod
+    def applies(method: str, path: str) -> bool:
+        return method != "GET" and path.startswith(ADMISSION_PREFIXES)
+
+    def classify(self, headers, client_host: Optional[str] = None) -> Tuple[str, str, Optional[float]]:
+        """Renvoie (classe, appelant, échéance) à partir des en-têtes HTTP."""
+        token = None
+        auth = headers.get("authorization")
+        if auth and auth.lower().startswith("bearer "):
+            token = auth.split(" ", 1)[1]
+        token = token or headers.get("x-api-key")
+        caller = caller_id(token) if token else f"ip:{client_host or 'unknown'}"
+
+        if caller in self.batch_callers:
+            priority = "batch"
+        else:
+            priority = (headers.get("x-priority") or "interactive").lower()
+            if priority not in self.classes:
+                priority = "interactive"
+
+        deadline = None
+        try:
+            if headers.get("x-request-deadline"):
+                deadline = float(headers["x-request-deadline"])
+            elif headers.get("x-request-timeout-ms"):
+                deadline = time.time() + float(headers["x-request-timeout-ms"]) / 1000.0
+        except ValueError:
+            deadline = None
+        return priority, caller, deadline
+
+    @asynccontextmanager
+    async def slot(self, priority: str, caller: str, deadline: Optional[float] = None):
+        """Attend un créneau dans la classe *priority* puis le libère en sortie."""
+        cls = self.classes[priority]
+        if deadline is not None and time.time() >= deadline:
+            REJECTED.labels(priority, "deadline").inc()
+            raise DeadlineExceeded()
+
+        enqueued = time.perf_counter()
+        if cls.active < cls.limit and not cls.queue:
+            cls.active += 1
+            IN_FLIGHT.labels(priority).set(cls.active)
+        else:
+            if len(cls.queue) >= self.max_queue:
+                REJECTED.labels(priority, "queue_full").inc()
+                raise QueueFull()
+            await self._wait(cls, caller, deadline)
+        WAIT_TIME.labels(priority).observe(time.perf_counter() - enqueued)
+
+        try:
+            yield
+        finally:
+            cls.active -= 1
+            cls.dispatch()
+
+    async def _wait(self, cls: PriorityClass, caller: str, deadline: Optional[float]) -> None:
+        start = max(cls.virtual_time, cls.last_finish.get(caller, 0.0))
+        finish = start + 1.0 / self.weights.get(caller, 1.0)
+        cls.last_finish[caller] = finish
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(finish, next(self._seq), start, caller, future, deadline)
+        heapq.heappush(cls.queue, waiter)
+        QUEUE_DEPTH.labels(cls.name).set(len(cls.queue))
+
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+        try:
+            done, _ = await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            # Client parti : si le créneau venait d'être attribué, on le rend
+            if future.done() and not future.cancelled() and future.exception() is None:
+                cls.active -= 1
+            else:
+                future.cancel()
+                self._discard(cls, waiter)
+            cls.dispatch()
+            raise
+        if not done:
+            future.cancel()
+            self._discard(cls, waiter)
+            cls.dispatch()
+            REJECTED.labels(cls.name, "deadline").inc()
+            raise DeadlineExceeded()
+        if future.exception() is not None:
+            REJECTED.labels(cls.name, "deadline").inc()
+            raise future.exception()
+
+    @staticmethod
+    def _discard(cls: PriorityClass, waiter: _Waiter) -> None:
+        """Retire un waiter abandonné de la file (taille bornée par SCHED_MAX_QUEUE)."""
+        try:
+            cls.queue.remove(waiter)
+            heapq.heapify(cls.queue)
+        except ValueError:
+            pass
+
+
+# Instance unique utilisée par l'application
+scheduler = AdmissionController(
+    limits={"interactive": SCHED_INTERACTIVE_CONCURRENCY, "batch": SCHED_BATCH_CONCURRENCY},
+    batch_keys=_parse_list(os.getenv("SCHED_BATCH_API_KEYS", "")),
+    weights=_parse_weights(os.getenv("SCHED_CALLER_WEIGHTS", "")),
+)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Résumé des traces exportées (TRACE_FILE, OTLP/JSON une trace par ligne)
+
+Affiche, par route et par étape, le nombre d'occurrences et les
+percentiles p50 / p95 / p99 / max en millisecondes. Avec --slowest N,
+liste aussi le détail des N requêtes les plus lentes (queue de latence).
+
+Usage : python scripts/trace-summary.py traces/otlp.jsonl [--slowest 5]
+"""
+
+import argparse
+import json
+from collections import defaultdict
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def load(paths):
+    """Produit (racine, étapes) pour chaque trace des fichiers."""
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                for rs in json.loads(line)["resourceSpans"]:
+                    for ss in rs["scopeSpans"]:
+                        spans = ss["spans"]
+                        ids = {s["spanId"] for s in spans}
+                        roots = [s for s in spans if s.get("parentSpanId") not in ids]
+                        if roots:
+                            yield roots[0], [s for s in spans if s is not roots[0]]
+
+
+def duration_ms(span):
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Percentiles de latence par route et par étape")
+    parser.add_argument("files", nargs="+", help="Fichiers OTLP/JSON (TRACE_FILE)")
+    parser.add_argument("--slowest", type=int, default=0, help="Détailler les N requêtes les plus lentes")
+    args = parser.parse_args()
+
+    by_route = defaultdict(list)
+    by_stage = defaultdict(list)
+    traces = []
+    for root, spans in load(args.files):
+        total = duration_ms(root)
+        by_route[root["name"]].append(total)
+        per_stage = defaultdict(float)
+        for s in spans:
+            per_stage[s["name"]] += duration_ms(s)
+        for name, ms in per_stage.items():
+            by_stage[(root["name"], name)].append(ms)
+        traces.append((total, root["name"], root["traceId"], dict(per_stage)))
+
+    print(f"📊 {len(traces)} trace(s)")
+    header = f"{'':50} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(header)
+    for route in sorted(by_route, key=lambda r: -percentile(by_route[r], 0.99)):
+        values = by_route[route]
+        print(f"{route[:50]:50} {len(values):6d} " + " ".join(
+            f"{percentile(values, q):9.1f}" for q in (0.5, 0.95, 0.99, 1.0)))
+        for (r, stage), stage_values in sorted(by_stage.items()):
+            if r == route:
+                print(f"  └ {stage[:46]:46} {len(stage_values):6d} " + " ".join(
+                    f"{percentile(stage_values, q):9.1f}" for q in (0.5, 0.95, 0.99, 1.0)))
+
+    if args.slowest:
+        print(f"\n🐢 {args.slowest} requête(s) les plus lentes")
+        for total, route, trace_id, stages in sorted(traces, reverse=True)[:args.slowest]:
+            detail = ", ".join(f"{k}={v:.0f}" for k, v in sorted(stages.items(), key=lambda kv: -kv[1]))
+            print(f"{total:9.1f} ms  {route}  {trace_id}  {detail}")
+
+
+if __name__ == "__main__":
+    main()
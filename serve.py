@@ -0,0 +1,293 @@
+"""Service multi-process : modèles chargés une fois dans le parent, puis fork des workers.
+
+Le parent importe l'application, charge les modèles demandés
+(PRELOAD_WHISPER_MODELS, PRELOAD_TTS_MODEL), gèle le ramasse-miettes puis
+crée WORKERS process par fork. Les poids sont ainsi partagés en
+copie-sur-écriture :
+
+• les données des tenseurs vivent dans des blocs mémoire séparés des objets
+  Python : incrémenter un refcount ne touche que l'en-tête de l'objet, pas
+  les pages des poids ;
+• gc.freeze() place tous les objets existants hors de portée du GC, qui
+  sinon réécrirait leurs en-têtes à chaque collecte (et dupliquerait les
+  pages) ;
+• le parent limite torch à un thread et n'exécute aucune inférence : le pool
+  OpenMP n'est pas compatible avec fork, chaque worker règle ensuite son
+  propre nombre de threads (WORKER_TORCH_THREADS) ; c'est aussi le budget
+  que cpu_budget_service répartit entre ses créneaux d'inférence, sur des
+  cœurs distincts de ceux des autres workers quand CPU_PIN=1.
+
+Avec CUDA, un fork après initialisation est impossible : le préchargement
+est désactivé et chaque worker charge ses modèles à la première requête.
+Avec INFERENCE_PROCESSES=1, chaque worker HTTP démarre ses propres process
+d'inférence (inference_pool_service) qui chargent les modèles : rien n'est
+préchargé dans le parent.
+
+Les workers partagent la socket d'écoute du parent. Recyclage gracieux :
+• après WORKER_MAX_REQUESTS requêtes (+ aléa WORKER_MAX_REQUESTS_JITTER) ;
+• si la mémoire privée (USS) dépasse WORKER_MAX_USS_MB ;
+• SIGHUP : redémarrage progressif de tous les workers.
+Le remplaçant est forké avant l'arrêt de l'ancien : la capacité ne baisse pas.
+
+Rapport mémoire (/proc/<pid>/smaps_rollup, partagé vs privé par worker) :
+toutes les MEMORY_REPORT_INTERVAL secondes et sur SIGUSR1.
+
+Usage : WORKERS=4 python serve.py   (ou WORKERS=4 ./start.sh)
+"""
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "2"))
+PRELOAD_WHISPER_MODELS = os.getenv("PRELOAD_WHISPER_MODELS", "base")
+PRELOAD_TTS_MODEL = os.getenv("PRELOAD_TTS_MODEL", "mms")
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "0"))  # 0 : cœurs / workers
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "0"))    # 0 : jamais
+WORKER_MAX_REQUESTS_JITTER = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "0"))
+WORKER_MAX_USS_MB = float(os.getenv("WORKER_MAX_USS_MB", "0"))      # 0 : pas de limite
+GRACEFUL_TIMEOUT = float(os.getenv("GRACEFUL_TIMEOUT", "30"))
+MEMORY_REPORT_INTERVAL = float(os.getenv("MEMORY_REPORT_INTERVAL", "300"))
+
+_SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid: int) -> Optional[Dict[str, float]]:
+    """Compteurs mémoire du process en Mo (None si le process a disparu)."""
+    values: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in _SMAPS_FIELDS:
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        return None
+    values["Shared"] = values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)
+    values["Private"] = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values
+
+
+def memory_report(pids: Dict[int, str]) -> str:
+    """Tableau RSS / PSS / partagé / privé (Mo) pour chaque process."""
+    lines = [f"{'process':14} {'pid':>7} {'rss':>9} {'pss':>9} {'partagé':>9} {'privé':>9}"]
+    total_pss = 0.0
+    for pid, label in pids.items():
+        mem = smaps_rollup(pid)
+        if mem is None:
+            continue
+        total_pss += mem.get("Pss", 0)
+        lines.append(f"{label:14} {pid:7d} {mem.get('Rss', 0):9.1f} {mem.get('Pss', 0):9.1f} "
+                     f"{mem['Shared']:9.1f} {mem['Private']:9.1f}")
+    lines.append(f"{'total (pss)':14} {'':7} {'':9} {total_pss:9.1f}")
+    return "\n".join(lines)
+
+
+def preload_models() -> None:
+    """Importe l'application et charge les modèles partagés avec les workers."""
+    import main  # (bytecode et modules partagés par les workers)
+
+    if not (main.ENABLE_STT or main.ENABLE_TTS):
+        return  # LLM seul : ni torch ni modèle local
+    if main.inference_pool.enabled:
+        return  # INFERENCE_PROCESSES=1 : les modèles vivent dans les process d'inférence
+    import torch
+
+    torch.set_num_threads(1)  # aucun pool OpenMP dans le parent (non compatible fork)
+    if torch.cuda.is_available():
+        print("[SERVE] CUDA détecté : pas de préchargement (fork impossible après init CUDA)")
+        return
+    from stt_service import get_whisper_model
+    from tts_service import get_tts
+
+    if main.ENABLE_STT:
+        for name in filter(None, (n.strip() for n in PRELOAD_WHISPER_MODELS.split(","))):
+            get_whisper_model(name)
+    if main.ENABLE_TTS and PRELOAD_TTS_MODEL:
+        start = time.perf_counter()
+        get_tts(PRELOAD_TTS_MODEL)
+        print(f"[SERVE] TTS '{PRELOAD_TTS_MODEL}' chargé en {time.perf_counter() - start:.1f}s")
+
+
+def run_worker(sock: socket.socket, index: int, torch_threads: int) -> None:
+    """Corps d'un worker (après fork) : ne revient jamais."""
+    import uvicorn
+
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    gc.enable()
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(torch_threads)
+
+    from cpu_budget_service import available_cores, cpu_budget
+    from main import app
+
+    cores = available_cores()
+    if len(cores) >= torch_threads * (index + 1):
+        cores = cores[torch_threads * index:]
+    cpu_budget.configure(torch_threads, cores)
+
+    limit = None
+    if WORKER_MAX_REQUESTS:
+        limit = WORKER_MAX_REQUESTS + random.randint(0, WORKER_MAX_REQUESTS_JITTER)
+    config = uvicorn.Config(
+        app,
+        limit_max_requests=limit,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        log_level=os.getenv("LOG_LEVEL", "info"),
+    )
+    code = 0
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+    except BaseException as err:
+        print(f"[SERVE] Worker {index} arrêté sur erreur : {err}")
+        code = 1
+    finally:
+        os._exit(code)
+
+
+class Arbiter:
+    """Fork, surveillance, recyclage et arrêt des workers."""
+
+    def __init__(self, sock: socket.socket, workers: int, torch_threads: int):
+        self.sock = sock
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.children: Dict[int, int] = {}      # pid -> index du worker
+        self.retiring: Dict[int, float] = {}    # pid -> instant de la demande d'arrêt
+        self.stopping = False
+        self._reload = False
+        self._report = False
+
+    def spawn(self, index: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.sock, index, self.torch_threads)
+        self.children[pid] = index
+        print(f"[SERVE] Worker {index} démarré (pid {pid})")
+        return pid
+
+    def retire(self, pid: int, reason: str) -> None:
+        """Remplace le worker : fork du remplaçant puis arrêt gracieux de l'ancien."""
+        if pid in self.retiring or pid not in self.children:
+            return
+        print(f"[SERVE] Recyclage du worker {self.children[pid]} (pid {pid}) : {reason}")
+        self.retiring[pid] = time.monotonic()
+        if not self.stopping:
+            self.spawn(self.children[pid])
+        os.kill(pid, signal.SIGTERM)
+
+    def _on_signal(self, signum, frame) -> None:
+        if signum in (signal.SIGTERM, signal.SIGINT):
+            self.stopping = True
+        elif signum == signal.SIGHUP:
+            self._reload = True
+        elif signum == signal.SIGUSR1:
+            self._report = True
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.children.pop(pid, None)
+            planned = self.retiring.pop(pid, None) is not None
+            if index is None:
+                continue
+            if not planned and not self.stopping:
+                # Sortie non demandée (limite de requêtes atteinte, plantage) : remplacement
+                print(f"[SERVE] Worker {index} (pid {pid}) terminé (statut {status}), relance")
+                self.spawn(index)
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for pid, since in list(self.retiring.items()):
+            if now - since > GRACEFUL_TIMEOUT + 5:
+                print(f"[SERVE] Worker pid {pid} ne s'arrête pas : SIGKILL")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        if WORKER_MAX_USS_MB:
+            for pid in list(self.children):
+                mem = smaps_rollup(pid)
+                if mem and pid not in self.retiring and mem["Private"] > WORKER_MAX_USS_MB:
+                    self.retire(pid, f"mémoire privée {mem['Private']:.0f} Mo > {WORKER_MAX_USS_MB:.0f} Mo")
+
+    def print_report(self) -> None:
+        pids = {os.getpid(): "parent"}
+        pids.update({pid: f"worker {index}" for pid, index in sorted(self.children.items(), key=lambda kv: kv[1])})
+        print("[SERVE] Mémoire (Mo)\n" + memory_report(pids), flush=True)
+
+    def run(self) -> None:
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(sig, self._on_signal)
+        for index in range(self.workers):
+            self.spawn(index)
+        next_report = time.monotonic() + (MEMORY_REPORT_INTERVAL or float("inf"))
+
+        while not self.stopping:
+            time.sleep(1.0)
+            self._reap()
+            self._check_workers()
+            if self._reload:
+                self._reload = False
+                for pid in list(self.children):
+                    if pid not in self.retiring:
+                        self.retire(pid, "SIGHUP")
+            if self._report or time.monotonic() >= next_report:
+                self._report = False
+                next_report = time.monotonic() + (MEMORY_REPORT_INTERVAL or float("inf"))
+                self.print_report()
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        print(f"[SERVE] Arrêt de {len(self.children)} worker(s)…")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.2)
+        for pid in list(self.children):
+            os.kill(pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def main() -> None:
+    gc.disable()  # pas de collecte pendant le chargement : tout sera gelé avant le fork
+    preload_models()
+    if threading.active_count() > 1:
+        names = ", ".join(t.name for t in threading.enumerate() if t is not threading.current_thread())
+        print(f"[SERVE] ⚠️ Threads actifs avant fork ({names}) : ils n'existeront pas dans les workers")
+
+    sock = socket.socket(socket.AF_INET6 if ":" in HOST else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    torch_threads = WORKER_TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, WORKERS))
+    print(f"[SERVE] {WORKERS} worker(s) sur {HOST}:{PORT}, {torch_threads} thread(s) torch chacun")
+    gc.collect()
+    gc.freeze()
+    arbiter = Arbiter(sock, WORKERS, torch_threads)
+    arbiter.run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
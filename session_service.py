@@ -0,0 +1,238 @@
+"""Sessions de conversation côté serveur pour Ollama.
+
+Le client n'envoie que le nouveau tour ; l'historique reste en mémoire dans le
+serveur. Pour chaque session on conserve le `context` renvoyé par
+`/api/generate` (tokens déjà évalués) : au tour suivant Ollama repart de ce
+préfixe au lieu de ré-évaluer tout l'historique. Le modèle est maintenu en
+mémoire grâce au paramètre `keep_alive`.
+
+Les sessions expirent après SESSION_TTL_SECONDS d'inactivité et l'ensemble est
+borné par SESSION_MAX_SESSIONS et SESSION_MAX_MEMORY_MB (éviction LRU).
+"""
+import asyncio
+import os
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from context_service import context_manager
+from llm_service import Message, OLLAMA_KEEP_ALIVE, get_http_client, ollama_base
+from tracing_service import span
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_MEMORY_MB = float(os.getenv("SESSION_MAX_MEMORY_MB", "64"))
+
+
+class SessionCreateRequest(BaseModel):
+    model: Optional[str] = None
+    system: Optional[str] = None
+    temperature: float = 0.7
+    max_tokens: int = 1000
+    keep_alive: Optional[str] = None
+
+
+class SessionTurnRequest(BaseModel):
+    content: str
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+
+class SessionInfo(BaseModel):
+    session_id: str
+    model: str
+    system: Optional[str] = None
+    turns: int
+    context_tokens: int
+    created_at: str
+    expires_in: float
+    messages: List[Message] = []
+
+
+class SessionTurnResponse(BaseModel):
+    session_id: str
+    response: str
+    timestamp: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class ChatSession:
+    """État d'une conversation : historique + contexte Ollama."""
+
+    def __init__(self, model: str, system: Optional[str], temperature: float,
+                 max_tokens: int, keep_alive: Optional[str]):
+        self.session_id = uuid.uuid4().hex
+        self.model = model
+        self.system = system
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.keep_alive = keep_alive or OLLAMA_KEEP_ALIVE
+        self.messages: List[Message] = []
+        # Tokens du contexte Ollama, stockés en entiers 32 bits (4 octets/token)
+        self.context = array("I")
+        self.created_at = datetime.utcnow()
+        self.last_used = time.monotonic()
+        # Un seul tour à la fois par session (le contexte dépend du tour précédent)
+        self.lock = asyncio.Lock()
+
+    def size_bytes(self) -> int:
+        """Estimation de l'empreinte mémoire de la session."""
+        text = sum(len(m.content) + len(m.role) for m in self.messages)
+        return text + self.context.itemsize * len(self.context) + len(self.system or "")
+
+    def info(self, with_messages: bool = False) -> SessionInfo:
+        return SessionInfo(
+            session_id=self.session_id,
+            model=self.model,
+            system=self.system,
+            turns=sum(1 for m in self.messages if m.role == "user"),
+            context_tokens=len(self.context),
+            created_at=self.created_at.isoformat(),
+            expires_in=max(0.0, SESSION_TTL_SECONDS - (time.monotonic() - self.last_used)),
+            messages=list(self.messages) if with_messages else [],
+        )
+
+
+class SessionStore:
+    """Dictionnaire LRU de sessions avec TTL et plafond mémoire."""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX_SESSIONS,
+                 max_bytes: int = int(SESSION_MAX_MEMORY_MB * 1024 * 1024)):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self, req: SessionCreateRequest) -> ChatSession:
+        session = ChatSession(
+            model=req.model or os.getenv("MODEL_NAME", "mistral"),
+            system=req.system,
+            temperature=req.temperature,
+            max_tokens=req.max_tokens,
+            keep_alive=req.keep_alive,
+        )
+        self._sessions[session.session_id] = session
+        self.evict()
+        return session
+
+    def get(self, session_id: str) -> ChatSession:
+        """Renvoie la session (et la marque comme récente) ou lève KeyError."""
+        self.evict()
+        session = self._sessions[session_id]
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def memory_bytes(self) -> int:
+        return sum(s.size_bytes() for s in self._sessions.values())
+
+    def evict(self) -> int:
+        """Supprime les sessions expirées puis les plus anciennes si un plafond est dépassé."""
+        removed = 0
+        now = time.monotonic()
+        for sid in [sid for sid, s in self._sessions.items() if now - s.last_used > self.ttl]:
+            del self._sessions[sid]
+            removed += 1
+
+        total = self.memory_bytes()
+        while self._sessions and (len(self._sessions) > self.max_sessions or total > self.max_bytes):
+            _, oldest = self._sessions.popitem(last=False)
+            total -= oldest.size_bytes()
+            removed += 1
+        return removed
+
+    async def run_sweeper(self, interval: float = 60.0) -> None:
+        """Boucle de nettoyage périodique (lancée au démarrage de l'application)."""
+        while True:
+            await asyncio.sleep(interval)
+            removed = self.evict()
+            if removed:
+                print(f"[SESSION] {removed} session(s) expirée(s) supprimée(s)")
+
+
+async def chat_turn(session: ChatSession, req: SessionTurnRequest) -> SessionTurnResponse:
+    """Envoie un nouveau tour à Ollama en réutilisant le contexte de la session.
+
+    `/api/generate` accepte le `context` renvoyé au tour précédent : seul le
+    nouveau message est tokenisé et évalué ; le message système, déjà dans ce
+    contexte, n'est envoyé qu'au premier tour. Si le backend ne renvoie pas de
+    contexte (modèle ou version sans support) ou si le contexte ne tient plus
+    dans la fenêtre (Ollama en tronquerait le début, message système compris),
+    on passe à `/api/chat` avec l'historique ramené sous le budget de tokens
+    (voir context_service)."""
+    temperature = req.temperature if req.temperature is not None else session.temperature
+    max_tokens = req.max_tokens if req.max_tokens is not None else session.max_tokens
+    options = {"temperature": temperature, "num_predict": max_tokens}
+    client = get_http_client()
+
+    async with session.lock:
+        if len(session.context) >= context_manager.prompt_budget(max_tokens):
+            print(f"[SESSION] {session.session_id} : contexte de {len(session.context)} tokens hors fenêtre, "
+                  f"passage à /api/chat")
+            session.context = array("I")
+        if session.context or not session.messages:
+            payload = {
+                "model": session.model,
+                "prompt": req.content,
+                "stream": False,
+                "keep_alive": session.keep_alive,
+                "options": options,
+            }
+            if session.context:
+                payload["context"] = session.context.tolist()
+            elif session.system:
+                payload["system"] = session.system
+            with span("ollama.generate", model=session.model):
+                resp = await client.post(f"{ollama_base()}/api/generate", json=payload, timeout=120.0)
+            resp.raise_for_status()
+            data = resp.json()
+            answer = data.get("response", "")
+            session.context = array("I", data.get("context") or [])
+        else:
+            history = [Message(role="system", content=session.system)] if session.system else []
+            history += session.messages
+            history.append(Message(role="user", content=req.content))
+            history, _ = await asyncio.to_thread(context_manager.fit, history, session.model, max_tokens)
+            with span("ollama.chat", model=session.model):
+                resp = await client.post(
+                    f"{ollama_base()}/api/chat",
+                    json={
+                        "model": session.model,
+                        "messages": [{"role": m.role, "content": m.content} for m in history],
+                        "stream": False,
+                        "keep_alive": session.keep_alive,
+                        "options": options,
+                    },
+                    timeout=120.0,
+                )
+            resp.raise_for_status()
+            data = resp.json()
+            answer = data["message"]["content"]
+
+        session.messages.append(Message(role="user", content=req.content))
+        session.messages.append(Message(role="assistant", content=answer))
+        session.last_used = time.monotonic()
+
+    return SessionTurnResponse(
+        session_id=session.session_id,
+        response=answer,
+        timestamp=datetime.utcnow().isoformat(),
+        prompt_tokens=int(data.get("prompt_eval_count") or 0),
+        completion_tokens=int(data.get("eval_count") or 0),
+    )
+
+
+# Instance unique utilisée par l'application
+session_store = SessionStore()
@@ -20,36 +20,17 @@ else
   echo "✅ Modèle Mistral déjà disponible"
 fi
 
-# 4. Pré-charger les modèles TTS si pas déjà fait
-if [ ! -d "/root/.cache/tts" ] || [ -z "$(ls -A /root/.cache/tts 2>/dev/null)" ]; then
-  echo "Pré-téléchargement des modèles TTS..."
-  python3 -c "
-import os
-from TTS.utils.manage import ModelManager
-
-MODELS = [
-    'facebook/mms-tts-fra',
-    'tts_models/fr/css10/vits', 
-    'tts_models/multilingual/multi-dataset/xtts_v2'
-]
-
-mm = ModelManager()
-for model in MODELS:
-    try:
-        print(f'Téléchargement de {model}...')
-        if model.startswith('facebook/'):
-            from huggingface_hub import snapshot_download
-            snapshot_download(repo_id=model, cache_dir=os.path.expanduser('~/.cache/tts'))
-        else:
-            mm.download_model(model)
-        print(f'✅ {model} téléchargé')
-    except Exception as e:
-        print(f'⚠️  Échec pour {model}: {e}')
-"
-else
-  echo "✅ Modèles TTS déjà en cache"
-fi
+# 4. Compléter le magasin de modèles (artefacts manquants seulement ;
+#    hors ligne avec MODEL_STORE_OFFLINE=1 : contrôle du contenu uniquement)
+echo "Magasin de modèles..."
+python3 model_store_service.py fetch || echo "⚠️  Modèles incomplets (voir ci-dessus)"
 
 # 5. Démarrer FastAPI
-echo "Démarrage du service LLM..."
+# WORKERS > 1 : modèles chargés une fois puis fork des workers (voir serve.py)
+WORKERS=${WORKERS:-1}
+echo "Démarrage du service LLM ($WORKERS worker(s))..."
+if [ "$WORKERS" -gt 1 ]; then
+  export WORKERS
+  exec python3 serve.py
+fi
 exec uvicorn main:app --host 0.0.0.0 --port 8000 
\ No newline at end of file
@@ -1,13 +1,19 @@
 import os
 import io
 import base64
+import asyncio
+import threading
+import time
 import numpy as np
 import soundfile as sf
-import torch
-import whisper
-import torchaudio
 from pydantic import BaseModel
 from typing import Optional
+from inference_pool_service import inference_pool
+from metrics_service import acquire, lazy_import, observe_rtf, stage
+from model_store_service import model_store
+
+# Modèles Whisper acceptés par le champ `model`
+WHISPER_MODELS = ("tiny", "base", "small", "medium", "large-v2", "large-v3")
 
 class STTRequest(BaseModel):
     audio: str          # Audio encodé en base64
@@ -19,44 +25,97 @@ class STTResponse(BaseModel):
     language: str
     confidence: float
 
-async def transcribe_audio(
-    audio_base64: str,
-    language: str = "fr",
-    model_name: str = "base"
-) -> STTResponse:
-    # --- décodage base64 ---
-    audio_bytes = base64.b64decode(audio_base64)
+# Modèles Whisper chargés, un par nom (évite un rechargement à chaque requête).
+# Le décodage Whisper pose des hooks de cache KV sur le modèle : une seule
+# transcription à la fois par instance, d'où un verrou par modèle.
+_WHISPER_CACHE: dict = {}
+_WHISPER_LOCKS: dict = {}
+_WHISPER_LOCK = threading.Lock()
+
+def get_whisper_model(model_name: str = "base"):
+    """Charge (une seule fois) et renvoie le modèle Whisper demandé."""
+    model = _WHISPER_CACHE.get(model_name)
+    if model is None:
+        with _WHISPER_LOCK:
+            model = _WHISPER_CACHE.get(model_name)
+            if model is None:
+                # torch et whisper ne sont importés qu'au premier chargement
+                torch = lazy_import("torch")
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                start = time.perf_counter()
+                # Poids projetés depuis le magasin de modèles (téléchargés une seule fois)
+                model = model_store.load_whisper(model_name, device=device)
+                print(f"[STT] Whisper '{model_name}' chargé sur {device} en {time.perf_counter() - start:.1f}s")
+                _WHISPER_LOCKS[model_name] = threading.Lock()
+                _WHISPER_CACHE[model_name] = model
+    return model
+
+def loaded_models() -> list:
+    """Noms des modèles Whisper chargés dans ce process."""
+    return list(_WHISPER_CACHE)
+
+def decode_audio(audio_bytes) -> np.ndarray:
+    """Décode un fichier audio (WAV, FLAC…) en tableau float32 mono à 16 kHz."""
     audio_buffer = io.BytesIO(audio_bytes)
 
     # --- lecture de l'audio ---
-    audio_array, sample_rate = sf.read(audio_buffer)          # float64 par défaut
-    audio_array = audio_array.astype(np.float32)              # → float32 obligatoire
+    with stage("stt", "audio_decode"):
+        audio_array, sample_rate = sf.read(audio_buffer, dtype="float32")
 
-    # passage en mono si stéréo
-    if audio_array.ndim > 1:
-        audio_array = audio_array.mean(axis=1)
+        # passage en mono si stéréo
+        if audio_array.ndim > 1:
+            audio_array = audio_array.mean(axis=1)
 
     # (facultatif) resample à 16 kHz si besoin
     if sample_rate != 16000:
-        resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=16000)
-        audio_tensor = torch.from_numpy(audio_array)
-        audio_array = resampler(audio_tensor).numpy()
-        sample_rate = 16000
+        with stage("stt", "resample"):
+            torch, torchaudio = lazy_import("torch"), lazy_import("torchaudio")
+            resampler = torchaudio.transforms.Resample(orig_freq=sample_rate, new_freq=16000)
+            audio_tensor = torch.from_numpy(audio_array)
+            audio_array = resampler(audio_tensor).numpy()
+    return audio_array
+
+def decode_base64(audio_base64: str) -> bytes:
+    with stage("stt", "base64_decode"):
+        return base64.b64decode(audio_base64)
 
-    # --- chargement du modèle ---
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = whisper.load_model(model_name, device=device)
+def decode_audio_base64(audio_base64: str) -> np.ndarray:
+    """decode_audio d'un fichier audio encodé en base64."""
+    return decode_audio(decode_base64(audio_base64))
+
+def transcribe_array(audio_array: np.ndarray, language: str = "fr", model_name: str = "base") -> STTResponse:
+    """Transcription synchrone d'un tableau float32 mono 16 kHz."""
+    with stage("stt", "model_load"):
+        model = get_whisper_model(model_name)
 
     # --- transcription ---
-    result = model.transcribe(
-        audio_array,
-        language=language,
-        task="transcribe",
-        fp16=False                      # désactive le fp16 si ta carte ne le supporte pas
-    )
+    with acquire("stt", _WHISPER_LOCKS[model_name]):
+        start = time.perf_counter()
+        with stage("stt", "inference"):
+            result = model.transcribe(
+                audio_array,
+                language=language,
+                task="transcribe",
+                fp16=False                  # désactive le fp16 si ta carte ne le supporte pas
+            )
+        observe_rtf("stt", model_name, time.perf_counter() - start, len(audio_array) / 16000)
 
     return STTResponse(
         text=result["text"],
         language=result["language"],
         confidence=result["segments"][0]["avg_logprob"] if result["segments"] else 0.0
-    )
\ No newline at end of file
+    )
+
+def transcribe_bytes(audio_bytes, language: str, model_name: str) -> STTResponse:
+    """Transcription synchrone d'un fichier audio (bytes ou memoryview)."""
+    return transcribe_array(decode_audio(audio_bytes), language, model_name)
+
+async def transcribe_audio(
+    audio_base64: str,
+    language: str = "fr",
+    model_name: str = "base"
+) -> STTResponse:
+    """Transcrit un audio base64 ; le calcul tourne dans un process d'inférence
+    ou sur un créneau CPU « stt » (voir inference_pool_service)."""
+    audio_bytes = await asyncio.to_thread(decode_base64, audio_base64)
+    return await inference_pool.run("stt", transcribe_bytes, audio_bytes, language, model_name, model=model_name)
@@ -0,0 +1,45 @@
+import base64
+import random
+
+import pytest
+
+from base64_stream import decode_chunks, encode_chunks
+
+
+def _split(data, rng):
+    """Découpe *data* en morceaux de tailles aléatoires (éventuellement vides)."""
+    chunks, pos = [], 0
+    while pos < len(data):
+        size = rng.randint(0, 9)
+        chunks.append(data[pos:pos + size])
+        pos += size
+    return chunks
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_round_trip_random_splits(seed):
+    rng = random.Random(seed)
+    payload = rng.randbytes(rng.randint(0, 200))
+    wrap = rng.random() < 0.5
+    text = b"".join(encode_chunks(_split(payload, rng), wrap=wrap))
+    assert text.replace(b"\n", b"") == base64.b64encode(payload)
+    assert b"".join(decode_chunks(_split(text, rng))) == payload
+
+
+@pytest.mark.parametrize("chunks", [
+    [b"QQ==QUJD"],
+    [b"QQ==", b"QUJD"],
+    [b"QQ=", b"=QUJD"],
+    [b"QQ", b"==", b"Q"],
+    [b"Q===", b""],
+    [b"QUJ=D"],
+])
+def test_padding_only_at_end(chunks):
+    with pytest.raises(ValueError):
+        b"".join(decode_chunks(chunks))
+
+
+@pytest.mark.parametrize("chunks", [[b"QQ=="], [b"QQ", b"=", b"="], [b"QUI=", b"\n"], [b"QQ"], [b"QUI"]])
+def test_final_padding_accepted(chunks):
+    expected = {b"QQ": b"A", b"QU": b"AB"}[b"".join(chunks)[:2]]
+    assert b"".join(decode_chunks(chunks)) == expected
@@ -0,0 +1,43 @@
+from context_service import _COMPACT_HEADER, _MESSAGE_OVERHEAD, ContextManager
+from llm_service import Message
+
+
+def _conversation(turns: int, words: int = 60):
+    messages = [Message(role="system", content="Tu es un assistant.")]
+    for i in range(turns):
+        messages.append(Message(role="user", content=f"question {i} " + "mot " * words))
+        messages.append(Message(role="assistant", content=f"réponse {i} " + "mot " * words))
+    messages.append(Message(role="user", content="dernière question"))
+    return messages
+
+
+def test_compact_keeps_excerpts_of_older_turns(monkeypatch):
+    monkeypatch.delenv("HF_TOKEN", raising=False)
+    messages = _conversation(12)
+    sizer = ContextManager()
+    sizes = [sizer.count(sizer.tokenizer_name("mistral"), m.content) + _MESSAGE_OVERHEAD for m in messages]
+    # Les deux derniers échanges remplissent exactement le reste du budget :
+    # sans réserve pour l'extrait, compact se comporterait comme drop
+    manager = ContextManager(budget=sizes[0] + sum(sizes[-5:]), strategy="compact", compact_tokens=16)
+
+    kept, report = manager.fit(messages, "mistral")
+
+    assert kept[0] is messages[0] and kept[-1] is messages[-1]
+    assert kept[1].role == "system" and kept[1].content.startswith(_COMPACT_HEADER)
+    assert "- assistant : réponse" in kept[1].content
+    assert report.compacted >= 1
+    assert report.compacted + report.dropped == len(messages) - len(kept) + 1
+    assert report.tokens_out <= report.budget
+
+
+def test_drop_removes_older_turns(monkeypatch):
+    monkeypatch.delenv("HF_TOKEN", raising=False)
+    manager = ContextManager(budget=400, strategy="drop")
+    messages = _conversation(12)
+
+    kept, report = manager.fit(messages, "mistral")
+
+    assert not any(m.content.startswith(_COMPACT_HEADER) for m in kept)
+    assert kept[1].role == "user"
+    assert report.compacted == 0 and report.dropped == len(messages) - len(kept)
+    assert report.tokens_out <= report.budget
@@ -0,0 +1,25 @@
+import pytest
+
+from cpu_budget_service import CPUBudget
+
+torch = pytest.importorskip("torch")
+
+
+def _threads_after_op():
+    torch.ones(8).sum()  # premier calcul du thread : at::init_num_threads
+    return torch.get_num_threads()
+
+
+def test_each_slot_keeps_its_own_thread_count():
+    budget = CPUBudget(slots={"stt": 1, "tts": 1}, interop_threads=0)
+    budget.configure(5, cores=[0, 1, 2, 3, 4])
+    assert [s["threads"] for s in budget.plan()] == [3, 2]
+    try:
+        # Les deux threads sont initialisés avant le premier calcul de l'un d'eux
+        for family in ("stt", "tts"):
+            budget.slots[family][0].executor().submit(lambda: None).result()
+        assert budget.run_sync("stt", _threads_after_op) == 3
+        assert budget.run_sync("tts", _threads_after_op) == 2
+        assert budget.run_sync("stt", _threads_after_op) == 3
+    finally:
+        budget.configure(1, cores=[0])
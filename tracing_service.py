@@ -0,0 +1,205 @@
+"""Traces par requête : en-tête Server-Timing, propagation W3C et export OTLP/JSON.
+
+Chaque requête HTTP ouvre une trace (reprise de l'en-tête `traceparent`
+entrant s'il existe). Les étapes mesurées (`span`) s'y rattachent via des
+ContextVar, y compris dans les threads lancés par asyncio.to_thread. Les
+appels Ollama reçoivent l'en-tête `traceparent` de l'étape en cours.
+
+En fin de requête, la trace est écrite dans TRACE_FILE (une ligne JSON
+par trace au format OTLP/JSON `ExportTraceServiceRequest`, lisible par un
+collecteur OpenTelemetry ou par scripts/trace-summary.py). TRACE_FILE
+vide : pas d'export, seul l'en-tête Server-Timing est produit.
+"""
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_FILE_MAX_MB = float(os.getenv("TRACE_FILE_MAX_MB", "100"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "ia-bot-core")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], start_ns: Optional[int] = None, **attributes):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Trace:
+    def __init__(self, name: str, traceparent: Optional[str] = None, **attributes):
+        match = _TRACEPARENT.match(traceparent or "")
+        self.trace_id = match.group(1) if match else os.urandom(16).hex()
+        self.root = Span(name, match.group(2) if match else None, **attributes)
+        self.sampled = random.random() < TRACE_SAMPLE_RATE
+        self.spans: List[Span] = []
+
+
+_TRACE: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_SPAN: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes) -> Trace:
+    """Ouvre une trace et en fait le contexte courant."""
+    trace = Trace(name, traceparent, **attributes)
+    _TRACE.set(trace)
+    _SPAN.set(trace.root)
+    return trace
+
+
+def finish_trace(trace: Trace, **attributes) -> None:
+    trace.root.end_ns = time.time_ns()
+    trace.root.attributes.update(attributes)
+    if TRACE_FILE and trace.sampled:
+        _exporter.submit(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Mesure le bloc comme étape de la trace courante (sans effet hors trace)."""
+    trace = _TRACE.get()
+    if trace is None:
+        yield None
+        return
+    parent = _SPAN.get()
+    current = Span(name, parent.span_id if parent else trace.root.span_id, **attributes)
+    _SPAN.set(current)
+    try:
+        yield current
+    finally:
+        current.end_ns = time.time_ns()
+        trace.spans.append(current)
+        # set() plutôt que reset(token) : le bloc peut se terminer dans un
+        # autre contexte (générateur asynchrone consommé par une autre tâche)
+        _SPAN.set(parent)
+
+
+def record_span(name: str, start_ns: int, end_ns: Optional[int] = None, **attributes) -> None:
+    """Ajoute une étape déjà écoulée (de *start_ns* à *end_ns*, défaut : maintenant)."""
+    trace = _TRACE.get()
+    if trace is None:
+        return
+    parent = _SPAN.get()
+    done = Span(name, parent.span_id if parent else trace.root.span_id, start_ns, **attributes)
+    done.end_ns = end_ns or time.time_ns()
+    trace.spans.append(done)
+
+
+def traceparent() -> Optional[str]:
+    """En-tête W3C `traceparent` de l'étape courante, ou None hors trace."""
+    trace = _TRACE.get()
+    if trace is None:
+        return None
+    current = _SPAN.get() or trace.root
+    return f"00-{trace.trace_id}-{current.span_id}-{'01' if trace.sampled else '00'}"
+
+
+async def inject_traceparent(request) -> None:
+    """Hook httpx : propage la trace courante vers le service appelé."""
+    header = traceparent()
+    if header:
+        request.headers["traceparent"] = header
+
+
+def server_timing(trace: Trace) -> str:
+    """Valeur de l'en-tête Server-Timing : durée cumulée par étape + total."""
+    totals: Dict[str, float] = {}
+    for s in list(trace.spans):
+        totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+    parts = [f"{name};dur={ms:.1f}" for name, ms in totals.items()]
+    parts.append(f"total;dur={trace.root.duration_ms:.1f}")
+    return ", ".join(parts)
+
+
+def _attr(key: str, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(trace: Trace, s: Span) -> Dict:
+    out = {
+        "traceId": trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 2 if s is trace.root else 1,  # SERVER / INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+        "attributes": [_attr(k, v) for k, v in s.attributes.items()],
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+def to_otlp(trace: Trace) -> Dict:
+    """Trace au format OTLP/JSON (ExportTraceServiceRequest)."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attr("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "tracing_service"},
+                "spans": [_otlp_span(trace, s) for s in [trace.root] + list(trace.spans)],
+            }],
+        }]
+    }
+
+
+class _FileExporter:
+    """Écriture des traces dans un thread dédié (jamais sur la boucle asyncio)."""
+
+    def __init__(self):
+        self._queue: "queue.SimpleQueue[Trace]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, trace: Trace) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        self._queue.put(trace)
+
+    def _run(self) -> None:
+        path = TRACE_FILE
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        max_bytes = TRACE_FILE_MAX_MB * 1024 * 1024
+        while True:
+            batch = [self._queue.get()]
+            while not self._queue.empty() and len(batch) < 256:
+                batch.append(self._queue.get())
+            try:
+                if os.path.exists(path) and os.path.getsize(path) > max_bytes:
+                    os.replace(path, path + ".1")
+                with open(path, "a", encoding="utf-8") as f:
+                    for trace in batch:
+                        f.write(json.dumps(to_otlp(trace), separators=(",", ":")) + "\n")
+            except OSError as err:
+                print(f"[TRACE] Export impossible vers {path} : {err}")
+
+
+_exporter = _FileExporter()
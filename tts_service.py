@@ -1,11 +1,23 @@
 import os
-import torch
-from TTS.api import TTS
+import asyncio
+import threading
+import time
 from typing import Optional
 from pydantic import BaseModel
 import base64
 import io
+import numpy as np
 import soundfile as sf
+from inference_pool_service import inference_pool
+from metrics_service import acquire, lazy_import, observe_rtf, stage
+from model_store_service import model_store
+
+# Correspondance des codes simples -> noms de modèles Coqui TTS
+TTS_MODELS = {
+    "mms": "facebook/mms-tts-fra",              # modèle MMS VITS 16 kHz (accent neutre)
+    "css10": "tts_models/fr/css10/vits",        # voix féminine adulte (CSS10)
+    "xtts": "tts_models/multilingual/multi-dataset/xtts_v2"  # modèle multilingue + clonage
+}
 
 class TTSRequest(BaseModel):
     text: str
@@ -20,56 +32,92 @@ class TTSResponse(BaseModel):
     format: str = "wav"
     duration: float
 
-async def synthesize_text(text: str, language: str = "fr", model: str = "mms", voice_id: Optional[str] = None, speed: float = 1.0) -> TTSResponse:
-    """Synthétise du texte en audio avec Coqui TTS."""
-    
-    # Correspondance des codes simples -> noms de modèles Coqui TTS
-    param_map = {
-        "mms": "facebook/mms-tts-fra",              # modèle MMS VITS 16 kHz (accent neutre)
-        "css10": "tts_models/fr/css10/vits",        # voix féminine adulte (CSS10)
-        "xtts": "tts_models/multilingual/multi-dataset/xtts_v2"  # modèle multilingue + clonage
-    }
+# Une seule instance de modèle par process, partagée entre threads : le
+# chargement et l'inférence sont sérialisés par ce verrou.
+_TTS_LOCK = threading.Lock()
 
+def get_tts(model: str = "mms"):
+    """Renvoie l'instance Coqui TTS du modèle demandé (chargée si nécessaire)."""
     # Priorité : paramètre explicite > variable d'environnement > défaut
-    model_name_env = param_map.get(model, os.getenv("TTS_MODEL_NAME", "facebook/mms-tts-fra"))
+    model_name_env = TTS_MODELS.get(model, os.getenv("TTS_MODEL_NAME", "facebook/mms-tts-fra"))
 
     # Mise en cache d'une instance par process afin d'éviter un rechargement coûteux
     global _TTS_INSTANCE  # type: ignore
     if "_TTS_INSTANCE" not in globals() or getattr(_TTS_INSTANCE, "model_name", None) != model_name_env:
+        # torch et Coqui TTS ne sont importés qu'au premier chargement
+        torch = lazy_import("torch")
+        TTS = lazy_import("TTS.api").TTS
+        print(f"[TTS] Chargement de {model_name_env} (GPU : {torch.cuda.is_available()})")
         try:
+            # Modèle Coqui récupéré et vérifié dans le magasin (TTS_HOME) avant chargement
+            model_store.ensure_tts(model_name_env)
             _TTS_INSTANCE = TTS(model_name=model_name_env, gpu=torch.cuda.is_available())
         except Exception as err:
             # secours : revenir au modèle CSS10 si le modèle principal échoue
             fallback = "tts_models/fr/css10/vits"
+            model_store.ensure_tts(fallback)
             _TTS_INSTANCE = TTS(model_name=fallback, gpu=torch.cuda.is_available())
+    return _TTS_INSTANCE
 
-    tts = _TTS_INSTANCE
-    
-    # Buffer pour l'audio
-    audio_buffer = io.BytesIO()
-    
-    # Génération audio
-    # pour XTTS, on passe le chemin du wav cloné si voice_id référencé
-    if model == "xtts" and voice_id:
-        from voice_service import _voice_path
-        speaker_wav = str(_voice_path(voice_id)) if os.path.exists(_voice_path(voice_id)) else None
-        wav = tts.tts(text=text, speaker_wav=speaker_wav)
-    else:
-        wav = tts.tts(text=text, speaker=voice_id)
-    
-    # Ajustement de la vitesse si nécessaire
-    if speed != 1.0:
-        wav = tts.adjust_speed(wav, speed)
-    
+def loaded_models() -> list:
+    """Codes (TTS_MODELS) du modèle chargé dans ce process."""
+    name = getattr(globals().get("_TTS_INSTANCE"), "model_name", None)
+    if name is None:
+        return []
+    return [code for code, model_name in TTS_MODELS.items() if model_name == name] or [name]
+
+def synthesize_wav(text: str, language: str = "fr", model: str = "mms", voice_id: Optional[str] = None, speed: float = 1.0):
+    """Synthèse synchrone : renvoie (échantillons, fréquence d'échantillonnage)."""
+    with acquire("tts", _TTS_LOCK):
+        with stage("tts", "model_load"):
+            tts = get_tts(model)
+
+        # Génération audio
+        start = time.perf_counter()
+        with stage("tts", "inference"):
+            # pour XTTS, on passe le chemin du wav cloné si voice_id référencé
+            if model == "xtts" and voice_id:
+                from voice_service import voice_index
+                speaker_path = voice_index.resolve(voice_id)
+                speaker_wav = str(speaker_path) if speaker_path else None
+                wav = tts.tts(text=text, speaker_wav=speaker_wav)
+            else:
+                wav = tts.tts(text=text, speaker=voice_id)
+
+            # Ajustement de la vitesse si nécessaire
+            if speed != 1.0:
+                wav = tts.adjust_speed(wav, speed)
+        sample_rate = tts.synthesizer.output_sample_rate
+        rtf_label = model if model in TTS_MODELS else "default"
+        observe_rtf("tts", rtf_label, time.perf_counter() - start, len(wav) / sample_rate)
+        return wav, sample_rate
+
+def encode_wav_base64(wav, sample_rate: int) -> str:
+    """Encode des échantillons en fichier WAV puis en base64."""
     # Sauvegarde dans le buffer (TTS 0.21.x n'expose plus save_wav)
-    sf.write(audio_buffer, wav, tts.synthesizer.output_sample_rate, format='WAV')
-    audio_buffer.seek(0)
-    
-    # Conversion en base64
-    audio_base64 = base64.b64encode(audio_buffer.getvalue()).decode()
-    
+    with stage("tts", "encode"):
+        audio_buffer = io.BytesIO()
+        sf.write(audio_buffer, wav, sample_rate, format='WAV')
+        return base64.b64encode(audio_buffer.getbuffer()).decode()
+
+def synthesize_array(text: str, language: str = "fr", model: str = "mms", voice_id: Optional[str] = None, speed: float = 1.0):
+    """synthesize_wav en tableau float32 (Coqui renvoie une liste de flottants)."""
+    wav, sample_rate = synthesize_wav(text, language, model, voice_id, speed)
+    return np.asarray(wav, dtype=np.float32), sample_rate
+
+async def synthesize_audio(text: str, language: str = "fr", model: str = "mms", voice_id: Optional[str] = None, speed: float = 1.0):
+    """Synthèse dans un process d'inférence ou sur un créneau CPU « tts » :
+    renvoie (échantillons float32, fréquence d'échantillonnage)."""
+    return await inference_pool.run("tts", synthesize_array, text, language, model, voice_id, speed, model=model)
+
+def _response(wav, sample_rate: int) -> TTSResponse:
     return TTSResponse(
-        audio=audio_base64,
+        audio=encode_wav_base64(wav, sample_rate),
         format="wav",
-        duration=len(wav) / tts.synthesizer.output_sample_rate
-    ) 
\ No newline at end of file
+        duration=len(wav) / sample_rate
+    )
+
+async def synthesize_text(text: str, language: str = "fr", model: str = "mms", voice_id: Optional[str] = None, speed: float = 1.0) -> TTSResponse:
+    """Synthétise du texte en audio avec Coqui TTS."""
+    wav, sample_rate = await synthesize_audio(text, language, model, voice_id, speed)
+    return await asyncio.to_thread(_response, wav, sample_rate)
@@ -1,38 +1,519 @@
 from pathlib import Path
-import base64
+import hashlib
+import re
+import sqlite3
+import tempfile
+import threading
+import time
 import uuid
 import io
+import numpy as np
 import soundfile as sf
-from typing import List, Dict
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from pydantic import BaseModel
 import os
 
+from base64_stream import DECODE_BLOCK, decode_chunks, read_blocks, slices
+
 VOICES_DIR = Path(os.getenv("VOICES_DIR", "voices"))
 VOICES_DIR.mkdir(parents=True, exist_ok=True)
+VOICE_INDEX_PATH = Path(os.getenv("VOICE_INDEX_PATH", str(VOICES_DIR / "index.sqlite3")))
+
+
+# Un upload interrompu (crash du worker) laisse ses fichiers temporaires
+# (.{id}.{hex}.tmp.wav, .tmp.cond.wav) dans VOICES_DIR : sync les supprime
+# au-delà de cet âge, un upload en cours dans un autre worker étant plus récent.
+VOICE_TMP_MAX_AGE = float(os.getenv("VOICE_TMP_MAX_AGE", "3600"))
 
 
 def _voice_path(voice_id: str) -> Path:
     return VOICES_DIR / f"{voice_id}.wav"
 
 
-def list_voices() -> List[str]:
-    """Retourne la liste des identifiants de voix disponibles."""
-    return [p.stem for p in VOICES_DIR.glob("*.wav")]
+def _is_temp_file(path: Path) -> bool:
+    return path.name.startswith(".") or path.name.endswith((".tmp.wav", ".cond.wav"))
+
+
+class VoiceRecord(BaseModel):
+    voice_id: str
+    duration: float
+    sample_rate: int
+    size: int
+    content_hash: str
+    created_at: str
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _describe(voice_id: str, path: Path, created_at: Optional[float] = None,
+              content_hash: Optional[str] = None) -> VoiceRecord:
+    info = sf.info(str(path))
+    return VoiceRecord(
+        voice_id=voice_id,
+        duration=round(info.frames / info.samplerate, 3) if info.samplerate else 0.0,
+        sample_rate=info.samplerate,
+        size=path.stat().st_size,
+        content_hash=content_hash or _file_sha256(path),
+        created_at=datetime.utcfromtimestamp(created_at or time.time()).isoformat(),
+    )
+
+
+class VoiceIndex:
+    """Index persistant (SQLite) des voix, chargé en mémoire.
+
+    Les lectures (résolution sur le chemin TTS, listing) sont servies par le
+    cache, sans accès au système de fichiers : seul `PRAGMA data_version` est
+    lu à chaque appel, et le cache est rechargé si un autre process a modifié
+    la base (plusieurs workers).
+    """
+
+    def __init__(self, db_path: Path = VOICE_INDEX_PATH, voices_dir: Path = VOICES_DIR):
+        self.db_path = db_path
+        self.voices_dir = voices_dir
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._records: Dict[str, VoiceRecord] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._version = None
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connexion du process courant, ouverte au premier accès.
+
+        Une connexion SQLite héritée d'un fork (serve.py importe l'application
+        avant de lancer les workers) ne doit pas être réutilisée : chaque
+        process ouvre la sienne et recharge le cache."""
+        if self._db is None or self._pid != os.getpid():
+            db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA busy_timeout=5000")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS voices ("
+                " voice_id TEXT PRIMARY KEY, duration REAL, sample_rate INTEGER, size INTEGER,"
+                " content_hash TEXT, created_at TEXT)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS voices_hash ON voices(content_hash)")
+            self._db, self._pid = db, os.getpid()
+            self._reload()
+        return self._db
+
+    def _reload(self) -> None:
+        rows = self._conn().execute(
+            "SELECT voice_id, duration, sample_rate, size, content_hash, created_at FROM voices ORDER BY created_at"
+        ).fetchall()
+        fields = VoiceRecord.model_fields.keys()
+        self._records = {r[0]: VoiceRecord(**dict(zip(fields, r))) for r in rows}
+        self._by_hash = {rec.content_hash: vid for vid, rec in self._records.items()}
+        self._version = self._conn().execute("PRAGMA data_version").fetchone()[0]
+
+    def _refresh_if_changed(self) -> None:
+        if self._conn().execute("PRAGMA data_version").fetchone()[0] != self._version:
+            self._reload()
+
+    def sync(self) -> Tuple[int, int]:
+        """Réconcilie l'index avec VOICES_DIR (au démarrage) : renvoie (ajoutées, retirées)."""
+        with self._lock:
+            self._refresh_if_changed()
+            on_disk = {}
+            for p in self.voices_dir.glob("*.wav"):
+                if not _is_temp_file(p):
+                    on_disk[p.stem] = p
+                else:
+                    try:
+                        if time.time() - p.stat().st_mtime > VOICE_TMP_MAX_AGE:
+                            p.unlink()
+                            print(f"[VOICES] Fichier temporaire abandonné supprimé : {p.name}")
+                    except FileNotFoundError:  # upload terminé entre-temps
+                        pass
+            added = [vid for vid in on_disk if vid not in self._records]
+            removed = [vid for vid in self._records if vid not in on_disk]
+            for vid in added:
+                try:
+                    self._upsert(_describe(vid, on_disk[vid], on_disk[vid].stat().st_mtime))
+                except Exception as err:
+                    print(f"[VOICES] Fichier ignoré {on_disk[vid]} : {err}")
+            for vid in removed:
+                self.remove(vid)
+            return len(added), len(removed)
+
+    def _upsert(self, record: VoiceRecord) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO voices VALUES (?, ?, ?, ?, ?, ?)",
+            (record.voice_id, record.duration, record.sample_rate, record.size,
+             record.content_hash, record.created_at),
+        )
+        old = self._records.get(record.voice_id)
+        if old and self._by_hash.get(old.content_hash) == record.voice_id:
+            del self._by_hash[old.content_hash]
+        self._records[record.voice_id] = record
+        self._by_hash.setdefault(record.content_hash, record.voice_id)
+        self._version = self._conn().execute("PRAGMA data_version").fetchone()[0]
+
+    def add(self, voice_id: str, path: Path, content_hash: Optional[str] = None) -> VoiceRecord:
+        with self._lock:
+            record = _describe(voice_id, path, content_hash=content_hash)
+            self._upsert(record)
+            return record
+
+    def find_duplicate(self, content_hash: str, exclude: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            self._refresh_if_changed()
+            vid = self._by_hash.get(content_hash)
+            return vid if vid != exclude else None
 
+    def remove(self, voice_id: str) -> bool:
+        with self._lock:
+            self._conn().execute("DELETE FROM voices WHERE voice_id = ?", (voice_id,))
+            record = self._records.pop(voice_id, None)
+            if record and self._by_hash.get(record.content_hash) == voice_id:
+                del self._by_hash[record.content_hash]
+                # Une autre voix peut partager ce contenu (lien physique)
+                for vid, other in self._records.items():
+                    if other.content_hash == record.content_hash:
+                        self._by_hash[record.content_hash] = vid
+                        break
+            return record is not None
 
-def _decode_and_save(audio_b64: str, voice_id: str) -> str:
-    """Décodage commun et enregistrement du WAV dans VOICES_DIR."""
-    wav_bytes = base64.b64decode(audio_b64)
-    data, sr = sf.read(io.BytesIO(wav_bytes))
-    if sr != 16000:
-        # resample simple fallback
-        import torchaudio, torch
-        res = torchaudio.transforms.Resample(orig_freq=sr, new_freq=16000)
-        data = res(torch.from_numpy(data).float()).numpy()
-        sr = 16000
-    sf.write(_voice_path(voice_id), data, sr)
+    def get(self, voice_id: str) -> Optional[VoiceRecord]:
+        # data_version vérifié même si la voix est en cache : un autre worker
+        # a pu la supprimer ou la remplacer
+        with self._lock:
+            self._refresh_if_changed()
+            return self._records.get(voice_id)
+
+    def resolve(self, voice_id: str) -> Optional[Path]:
+        """Chemin du WAV d'une voix indexée, sans accès au système de fichiers."""
+        return _voice_path(voice_id) if self.get(voice_id) else None
+
+    def query(self, offset: int = 0, limit: int = 100, prefix: Optional[str] = None,
+              min_duration: Optional[float] = None, max_duration: Optional[float] = None) -> Tuple[int, List[VoiceRecord]]:
+        """Listing paginé et filtré : renvoie (total filtré, page)."""
+        with self._lock:
+            self._refresh_if_changed()
+            records = list(self._records.values())
+        if prefix:
+            records = [r for r in records if r.voice_id.startswith(prefix)]
+        if min_duration is not None:
+            records = [r for r in records if r.duration >= min_duration]
+        if max_duration is not None:
+            records = [r for r in records if r.duration <= max_duration]
+        return len(records), records[offset:offset + limit]
+
+
+voice_index = VoiceIndex()
+
+
+def list_voices(offset: int = 0, limit: Optional[int] = None, prefix: Optional[str] = None) -> List[str]:
+    """Retourne la liste des identifiants de voix disponibles (depuis l'index)."""
+    total, records = voice_index.query(offset, limit if limit is not None else 1 << 31, prefix)
+    return [r.voice_id for r in records]
+
+
+def _register(voice_id: str, tmp_path: Path, named: bool = False) -> str:
+    """Publie un WAV fraîchement écrit dans un fichier temporaire.
+
+    Si un contenu identique existe déjà sous un autre identifiant, le fichier
+    temporaire est supprimé : un identifiant généré est remplacé par celui de
+    la voix existante, un identifiant choisi par l'appelant (*named*) est
+    conservé comme lien physique vers le même fichier. Sinon le WAV est
+    renommé atomiquement vers VOICES_DIR/<voice_id>.wav : une requête TTS
+    concurrente ne lit jamais un fichier à moitié écrit."""
+    content_hash = _file_sha256(tmp_path)
+    existing = voice_index.find_duplicate(content_hash, exclude=voice_id)
+    final_path = _voice_path(voice_id)
+    if existing and not named:
+        print(f"[PROCESS] Doublon de la voix {existing}, {voice_id} n'est pas conservée")
+        tmp_path.unlink()
+        return existing
+    if existing:
+        link_path = tmp_path.with_name(f"{tmp_path.name}.link")
+        try:
+            os.link(_voice_path(existing), link_path)
+        except OSError:
+            pass  # système de fichiers sans liens physiques : copie conservée
+        else:
+            print(f"[PROCESS] Doublon de la voix {existing}, {voice_id} partage son fichier")
+            tmp_path.unlink()
+            tmp_path = link_path
+    os.replace(tmp_path, final_path)
+    voice_index.add(voice_id, final_path, content_hash)
     return voice_id
 
 
+VOICE_SAMPLE_RATE = 16000
+VOICE_MAX_UPLOAD_BYTES = int(os.getenv("VOICE_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# Taille des blocs lus/rééchantillonnés (en échantillons) : fixe la mémoire crête
+_BLOCK_FRAMES = 64 * 1024
+_VOICE_ID_RE = re.compile(r"[A-Za-z0-9_][A-Za-z0-9_.-]{0,63}")
+_WAV_FORMATS = {1: "PCM", 3: "FLOAT", 0xFFFE: "EXTENSIBLE"}
+
+
+def check_wav_header(head: bytes) -> Optional[Dict[str, int]]:
+    """Valide l'en-tête d'un WAV à partir de ses premiers octets.
+
+    Renvoie les paramètres du chunk `fmt ` dès qu'ils sont disponibles, None
+    s'il faut plus d'octets, et lève ValueError dès que l'en-tête est invalide
+    (sans attendre la fin de l'upload)."""
+    if len(head) >= 12 and (head[:4] not in (b"RIFF", b"RF64") or head[8:12] != b"WAVE"):
+        raise ValueError("not a WAV file (en-tête RIFF/WAVE absent)")
+    pos = 12
+    while pos + 8 <= len(head):
+        chunk_id = head[pos:pos + 4]
+        chunk_size = int.from_bytes(head[pos + 4:pos + 8], "little")
+        if chunk_id == b"fmt ":
+            if pos + 24 > len(head):
+                return None
+            fmt = int.from_bytes(head[pos + 8:pos + 10], "little")
+            channels = int.from_bytes(head[pos + 10:pos + 12], "little")
+            sample_rate = int.from_bytes(head[pos + 12:pos + 16], "little")
+            bits = int.from_bytes(head[pos + 22:pos + 24], "little")
+            if fmt not in _WAV_FORMATS:
+                raise ValueError(f"Invalid data : format WAV non supporté ({fmt})")
+            if not 1 <= channels <= 8 or not 1000 <= sample_rate <= 384000 or bits not in (8, 16, 24, 32, 64):
+                raise ValueError("Invalid data : paramètres audio incohérents dans l'en-tête WAV")
+            return {"channels": channels, "sample_rate": sample_rate, "bits": bits}
+        pos += 8 + chunk_size + (chunk_size & 1)
+    if len(head) >= 64 * 1024:
+        raise ValueError("not a WAV file (chunk fmt introuvable)")
+    return None
+
+
+async def spool_wav_upload(chunks, max_bytes: int = VOICE_MAX_UPLOAD_BYTES):
+    """Écrit un flux d'upload (itérable asynchrone de bytes) dans un fichier
+    temporaire « spooled » en validant l'en-tête WAV au fil de l'eau."""
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    head = b""
+    header = None
+    total = 0
+    try:
+        async for chunk in chunks:
+            total += len(chunk)
+            if total > max_bytes:
+                raise ValueError(f"Le fichier est trop volumineux (max {max_bytes // (1024 * 1024)}MB)")
+            if header is None:
+                head = (head + chunk)[:64 * 1024]
+                header = check_wav_header(head)
+            spool.write(chunk)
+        if total == 0:
+            raise ValueError("Le fichier est vide")
+        if header is None:
+            raise ValueError("not a WAV file (en-tête incomplet)")
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+def _resample_blocks(blocks, orig_sr: int, new_sr: int = VOICE_SAMPLE_RATE):
+    """Rééchantillonne un flux de blocs mono float32 par morceaux.
+
+    Chaque morceau est traité avec une marge de contexte de part et d'autre
+    (plus large que le noyau sinc de torchaudio) et découpé sur des frontières
+    multiples de orig/pgcd : le résultat est identique à un rééchantillonnage
+    du signal entier, avec une mémoire bornée par la taille des blocs."""
+    if orig_sr == new_sr:
+        yield from blocks
+        return
+    import math
+    import torch
+    import torchaudio
+
+    g = math.gcd(orig_sr, new_sr)
+    step = orig_sr // g
+    context = step * math.ceil(max(2048, 4 * step) / step)
+
+    def segment(buf, buf_start, a, b):
+        y = torchaudio.functional.resample(torch.from_numpy(buf), orig_sr, new_sr).numpy()
+        out_a = (a - buf_start) * new_sr // orig_sr
+        out_b = -(-(b - buf_start) * new_sr // orig_sr)
+        return y[out_a:out_b]
+
+    buf = np.zeros(0, dtype=np.float32)
+    buf_start = 0      # position absolue (échantillons d'entrée) de buf[0]
+    emitted = 0        # entrée déjà convertie, toujours multiple de step
+    for block in blocks:
+        buf = np.concatenate([buf, block])
+        ready = (buf_start + len(buf) - context) // step * step
+        if ready > emitted:
+            yield segment(buf, buf_start, emitted, ready)
+            emitted = ready
+            keep_from = max(0, emitted - context - buf_start)
+            buf = buf[keep_from:]
+            buf_start += keep_from
+    if buf_start + len(buf) > emitted:
+        yield segment(buf, buf_start, emitted, buf_start + len(buf))
+
+
+# --- Conditionnement des échantillons -----------------------------------------
+# Le coût du conditionnement XTTS croît avec la durée de la référence : on ne
+# garde que la parole utile (silences retirés, pauses raccourcies), normalisée
+# en niveau et limitée aux VOICE_TARGET_SECONDS les plus propres.
+
+VOICE_CONDITIONING = os.getenv("VOICE_CONDITIONING", "1") == "1"
+VOICE_KEEP_RAW = os.getenv("VOICE_KEEP_RAW", "0") == "1"
+VOICE_TARGET_SECONDS = float(os.getenv("VOICE_TARGET_SECONDS", "12"))
+VOICE_MAX_PAUSE_MS = float(os.getenv("VOICE_MAX_PAUSE_MS", "300"))
+VOICE_TARGET_DBFS = float(os.getenv("VOICE_TARGET_DBFS", "-20"))
+RAW_VOICES_DIR = VOICES_DIR / "raw"
+
+_FRAME = VOICE_SAMPLE_RATE // 50          # trames d'analyse de 20 ms
+_SPEECH_MARGIN_DB = 10.0                  # seuil parole = bruit de fond + marge
+_PAD_FRAMES = 5                           # 100 ms conservés autour de la parole
+_FADE = VOICE_SAMPLE_RATE // 200          # fondu de 5 ms à chaque coupure
+
+
+def analyze_frames(path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    """Niveau RMS (dBFS) et crête de chaque trame de 20 ms, lus par blocs."""
+    rms_db, peaks = [], []
+    block = _FRAME * 2048
+    with sf.SoundFile(str(path)) as f:
+        for data in f.blocks(blocksize=block, dtype="float32"):
+            if len(data) % _FRAME:
+                data = np.pad(data, (0, _FRAME - len(data) % _FRAME))
+            frames = data.reshape(-1, _FRAME)
+            rms_db.append(10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12))
+            peaks.append(np.abs(frames).max(axis=1))
+    if not rms_db:
+        return np.zeros(0), np.zeros(0)
+    return np.concatenate(rms_db), np.concatenate(peaks)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Débuts et fins (exclues) des plages True d'un masque booléen."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    return edges[::2], edges[1::2]
+
+
+def plan_conditioning(rms_db: np.ndarray, peaks: np.ndarray, target_seconds: float = VOICE_TARGET_SECONDS,
+                      max_pause_ms: float = VOICE_MAX_PAUSE_MS, target_dbfs: float = VOICE_TARGET_DBFS):
+    """Choisit les trames à conserver et le gain à appliquer.
+
+    Renvoie (plages de trames [(début, fin)], gain linéaire, statistiques)."""
+    n = len(rms_db)
+    noise_db = float(np.percentile(rms_db, 10))
+    speech = rms_db > max(noise_db + _SPEECH_MARGIN_DB, -60.0)
+    # Marge autour de la parole (dilatation du masque)
+    padded = np.convolve(speech.astype(np.int8), np.ones(2 * _PAD_FRAMES + 1, dtype=np.int8), "same") > 0
+
+    if not padded.any():
+        keep = np.ones(n, dtype=bool)
+    else:
+        keep = padded.copy()
+        first, last = np.flatnonzero(padded)[[0, -1]]
+        keep[:first] = keep[last + 1:] = False
+        # Pauses internes trop longues : on garde seulement leurs extrémités
+        max_pause = int(max_pause_ms / 20)
+        starts, ends = _runs(~padded)
+        half = max_pause // 2
+        for start, end in zip(starts, ends):
+            if start > first and end <= last and end - start > max_pause:
+                keep[start + half:end - (max_pause - half)] = False
+
+    kept = np.flatnonzero(keep)
+    window = max(1, int(target_seconds * 50))
+    if len(kept) > window:
+        # Fenêtre de parole la plus « propre » : somme du SNR des trames de parole
+        score = np.where(speech[kept], rms_db[kept] - noise_db, 0.0)
+        sums = np.convolve(score, np.ones(window), "valid")
+        best = int(np.argmax(sums))
+        kept = kept[best:best + window]
+
+    # Regroupe les trames consécutives en plages
+    breaks = np.flatnonzero(np.diff(kept) > 1) + 1
+    ranges = [(int(seg[0]), int(seg[-1]) + 1) for seg in np.split(kept, breaks) if len(seg)]
+
+    voiced = kept[speech[kept]] if speech[kept].any() else kept
+    level_db = 10 * np.log10(np.mean(10 ** (rms_db[voiced] / 10)) + 1e-12)
+    gain_db = float(np.clip(target_dbfs - level_db, -20.0, 30.0))
+    peak = float(peaks[kept].max()) if len(kept) else 0.0
+    if peak > 0:
+        gain_db = min(gain_db, 20 * np.log10(10 ** (-1 / 20) / peak))  # crête <= -1 dBFS
+    stats = {
+        "input_seconds": n / 50,
+        "output_seconds": len(kept) / 50,
+        "noise_dbfs": round(noise_db, 1),
+        "gain_db": round(gain_db, 1),
+    }
+    return ranges, 10 ** (gain_db / 20), stats
+
+
+def condition_voice_file(src_path: Path, dst_path: Path, **options) -> Dict[str, float]:
+    """Écrit dans *dst_path* la version conditionnée de *src_path* (WAV 16 kHz mono)."""
+    rms_db, peaks = analyze_frames(src_path)
+    if len(rms_db) == 0:
+        raise ValueError("Fichier audio vide")
+    ranges, gain, stats = plan_conditioning(rms_db, peaks, **options)
+    fade_in = np.linspace(0.0, 1.0, _FADE, dtype=np.float32)
+    with sf.SoundFile(str(src_path)) as src, sf.SoundFile(
+        str(dst_path), "w", samplerate=VOICE_SAMPLE_RATE, channels=1, subtype="PCM_16", format="WAV"
+    ) as dst:
+        for start, end in ranges:
+            src.seek(start * _FRAME)
+            data = src.read(min((end - start) * _FRAME, src.frames - start * _FRAME), dtype="float32") * gain
+            if len(ranges) > 1 and len(data) > 2 * _FADE:
+                data[:_FADE] *= fade_in
+                data[-_FADE:] *= fade_in[::-1]
+            dst.write(data)
+    return stats
+
+
+def _save_voice_stream(fileobj, voice_id: str, condition: bool = VOICE_CONDITIONING,
+                       keep_raw: bool = VOICE_KEEP_RAW, named: bool = False) -> str:
+    """Lit un fichier audio par blocs, le convertit en WAV mono 16 kHz,
+    le conditionne (si demandé) et le publie atomiquement. La mémoire utilisée
+    ne dépend pas de la taille du fichier."""
+    tmp_path = VOICES_DIR / f".{voice_id}.{uuid.uuid4().hex[:8]}.tmp.wav"
+    cond_path = tmp_path.with_suffix(".cond.wav")
+    try:
+        with sf.SoundFile(fileobj) as src:
+            if src.frames == 0:
+                raise ValueError("Fichier audio vide")
+            if src.samplerate <= 0:
+                raise ValueError(f"Sample rate invalide : {src.samplerate}")
+            print(f"[PROCESS] Audio : {src.frames} samples, {src.samplerate}Hz, {src.channels} canal(aux)")
+            mono = (b.mean(axis=1) for b in src.blocks(blocksize=_BLOCK_FRAMES, dtype="float32", always_2d=True))
+            with sf.SoundFile(tmp_path, "w", samplerate=VOICE_SAMPLE_RATE, channels=1,
+                              subtype="PCM_16", format="WAV") as dst:
+                for block in _resample_blocks(mono, src.samplerate):
+                    dst.write(block)
+
+        publish_path = tmp_path
+        if condition:
+            stats = condition_voice_file(tmp_path, cond_path)
+            print(f"[PROCESS] Conditionnement : {stats['input_seconds']:.1f}s -> {stats['output_seconds']:.1f}s, "
+                  f"gain {stats['gain_db']} dB")
+            publish_path = cond_path
+        with open(publish_path, "rb+") as f:
+            os.fsync(f.fileno())
+
+        result = _register(voice_id, publish_path, named)
+        if condition and keep_raw and result == voice_id:
+            RAW_VOICES_DIR.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, RAW_VOICES_DIR / f"{voice_id}.wav")
+        return result
+    finally:
+        for path in (tmp_path, cond_path):
+            if path.exists():
+                path.unlink()
+
+
+def _decode_and_save(chunks, voice_id: str, named: bool = False) -> str:
+    """Décode un flux base64 par blocs et enregistre le WAV dans VOICES_DIR."""
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        for block in decode_chunks(chunks):
+            spool.write(block)
+        spool.seek(0)
+        return _save_voice_stream(spool, voice_id, named=named)
+
+
 def save_voice_sample(audio_b64: str, name: str | None = None) -> str:
     """Enregistre un échantillon (base64) et renvoie l'ID de la voix.
 
@@ -41,7 +522,7 @@ def save_voice_sample(audio_b64: str, name: str | None = None) -> str:
         name: Identifiant facultatif (sinon UUID auto).
     """
     voice_id = name or uuid.uuid4().hex[:12]
-    return _decode_and_save(audio_b64, voice_id)
+    return _decode_and_save(slices(audio_b64), voice_id, named=name is not None)
 
 
 def save_voice_sample_from_file(txt_path: str | Path, name: str | None = None) -> str:
@@ -57,96 +538,66 @@ def save_voice_sample_from_file(txt_path: str | Path, name: str | None = None) -
     txt_path = Path(txt_path)
     if not txt_path.exists():
         raise FileNotFoundError(f"Fichier introuvable : {txt_path}")
-    audio_b64 = txt_path.read_text(encoding="utf-8").replace("\n", "").strip()
     voice_id = name or uuid.uuid4().hex[:12]
-    return _decode_and_save(audio_b64, voice_id)
+    with open(txt_path, "rb") as f:
+        return _decode_and_save(read_blocks(f, DECODE_BLOCK), voice_id, named=name is not None)
 
 
 def delete_voice(voice_id: str) -> None:
     path = _voice_path(voice_id)
     if path.exists():
         path.unlink()
+    raw_path = RAW_VOICES_DIR / f"{voice_id}.wav"
+    if raw_path.exists():
+        raw_path.unlink()
+    voice_index.remove(voice_id)
 
 
-def save_voice_wav_file(content_bytes: bytes, name: str | None = None) -> str:
-    """Enregistre un échantillon audio à partir d'un fichier WAV brut (bytes).
+def save_voice_wav_stream(fileobj, name: str | None = None, condition: bool | None = None,
+                          keep_raw: bool | None = None) -> str:
+    """Enregistre un échantillon audio à partir d'un fichier WAV ouvert (lu par blocs).
 
     Args:
-        content_bytes: Contenu binaire du fichier WAV.
+        fileobj: Objet fichier binaire positionné au début (ex. UploadFile.file).
         name: Identifiant facultatif (sinon UUID auto).
+        condition: Retirer silences/pauses, normaliser et garder les meilleures
+            secondes (défaut : VOICE_CONDITIONING).
+        keep_raw: Conserver aussi la version non conditionnée dans
+            VOICES_DIR/raw (défaut : VOICE_KEEP_RAW).
     Returns:
-        L'identifiant de la voix sauvegardée.
+        L'identifiant de la voix sauvegardée : *name* s'il est fourni, sinon
+        celui de la voix existante si l'échantillon est un doublon.
     """
-    import io
-    import uuid
-    import soundfile as sf
-    import os
-    
     voice_id = name or uuid.uuid4().hex[:12]
+    if not _VOICE_ID_RE.fullmatch(voice_id):
+        raise ValueError(f"Identifiant de voix invalide : {voice_id!r}")
     print(f"[PROCESS] Début traitement voix : voice_id={voice_id}")
-    
     try:
-        # Validation des bytes
-        if not content_bytes or len(content_bytes) == 0:
-            raise ValueError("Contenu audio vide")
-        
-        print(f"[PROCESS] Validation du format WAV...")
-        wav_bytes = content_bytes
-        
-        # Test de lecture avec soundfile pour valider le format
         try:
-            data, sr = sf.read(io.BytesIO(wav_bytes))
-            print(f"[PROCESS] Audio lu : {len(data)} samples, {sr}Hz")
-        except Exception as e:
+            voice_id = _save_voice_stream(
+                fileobj, voice_id,
+                condition=VOICE_CONDITIONING if condition is None else condition,
+                keep_raw=VOICE_KEEP_RAW if keep_raw is None else keep_raw,
+                named=name is not None,
+            )
+        except RuntimeError as e:  # erreurs libsndfile (fichier illisible)
             raise ValueError(f"Format audio invalide : {str(e)}")
-        
-        # Validation des paramètres audio
-        if len(data) == 0:
-            raise ValueError("Fichier audio vide")
-        
-        if sr <= 0:
-            raise ValueError(f"Sample rate invalide : {sr}")
-        
-        # Resampling si nécessaire
-        if sr != 16000:
-            print(f"[PROCESS] Resampling {sr}Hz -> 16000Hz pour voice_id={voice_id}")
-            try:
-                import torchaudio, torch
-                res = torchaudio.transforms.Resample(orig_freq=sr, new_freq=16000)
-                data = res(torch.from_numpy(data).float()).numpy()
-                sr = 16000
-                print(f"[PROCESS] Resampling terminé")
-            except Exception as e:
-                print(f"[PROCESS] Erreur resampling : {e}")
-                raise ValueError(f"Erreur lors du resampling : {str(e)}")
-        
-        # Sauvegarde du fichier
-        output_path = _voice_path(voice_id)
-        print(f"[PROCESS] Sauvegarde vers : {output_path}")
-        
-        # Création du répertoire si nécessaire
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Écriture du fichier
-        sf.write(output_path, data, sr)
-        
-        # Vérification que le fichier a bien été créé
-        if not output_path.exists():
-            raise RuntimeError("Le fichier n'a pas été créé")
-        
-        file_size = output_path.stat().st_size
-        print(f"[PROCESS] Fichier sauvegardé : {file_size} bytes")
-        
         print(f"[PROCESS] Fin traitement voix : voice_id={voice_id}")
         return voice_id
-        
     except Exception as e:
-        print(f"[PROCESS] Erreur dans save_voice_wav_file : {e}")
-        # Nettoyage en cas d'erreur
-        try:
-            if 'output_path' in locals() and output_path.exists():
-                output_path.unlink()
-                print(f"[PROCESS] Fichier temporaire supprimé")
-        except:
-            pass
-        raise e 
\ No newline at end of file
+        print(f"[PROCESS] Erreur dans save_voice_wav_stream : {e}")
+        raise
+
+
+def save_voice_wav_file(content_bytes: bytes, name: str | None = None) -> str:
+    """Enregistre un échantillon audio à partir d'un fichier WAV brut (bytes).
+
+    Args:
+        content_bytes: Contenu binaire du fichier WAV.
+        name: Identifiant facultatif (sinon UUID auto).
+    Returns:
+        L'identifiant de la voix sauvegardée.
+    """
+    if not content_bytes:
+        raise ValueError("Contenu audio vide")
+    return save_voice_wav_stream(io.BytesIO(content_bytes), name)